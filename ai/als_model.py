@@ -0,0 +1,115 @@
+"""
+Serving side of the ALS recommender.
+
+Factor matrices written by ``als_trainer.py`` are opened with
+``np.load(mmap_mode="r")`` so every gunicorn worker on a host shares the same
+page-cache copy, and ``ALSModelStore`` swaps to a new version as soon as the
+trainer moves the ``CURRENT`` pointer, without a restart.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from als_trainer import DEFAULT_MODEL_DIR
+
+logger = logging.getLogger(__name__)
+
+
+class ALSModel:
+    """One trained model version: memory-mapped factors plus id maps."""
+
+    def __init__(self, path):
+        self.path = path
+        self.user_factors = np.load(os.path.join(path, "user_factors.npy"), mmap_mode="r")
+        self.item_factors = np.load(os.path.join(path, "item_factors.npy"), mmap_mode="r")
+        with open(os.path.join(path, "user_ids.json")) as f:
+            self.user_row = {uid: row for row, uid in enumerate(json.load(f))}
+        with open(os.path.join(path, "item_ids.json")) as f:
+            self.item_ids = json.load(f)
+        self.item_row = {pid: row for row, pid in enumerate(self.item_ids)}
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        # Versions trained before purchases were saved have none to exclude.
+        try:
+            self.purchased_indptr = np.load(os.path.join(path, "purchased_indptr.npy"), mmap_mode="r")
+            self.purchased_items = np.load(os.path.join(path, "purchased_items.npy"), mmap_mode="r")
+        except FileNotFoundError:
+            self.purchased_indptr = self.purchased_items = None
+
+    @property
+    def version(self):
+        return self.meta.get("version", os.path.basename(self.path))
+
+    def has_user(self, user_id):
+        return str(user_id) in self.user_row
+
+    def purchased(self, user_id):
+        """Ids of the products ``user_id`` had bought when the model was trained."""
+        row = self.user_row.get(str(user_id))
+        if row is None or self.purchased_indptr is None:
+            return []
+        items = self.purchased_items[self.purchased_indptr[row]:self.purchased_indptr[row + 1]]
+        return [self.item_ids[i] for i in items.tolist()]
+
+    def recommend(self, user_id, k, exclude=()):
+        """Top-``k`` ``[(product_id, score), ...]`` for a known user, else []."""
+        row = self.user_row.get(str(user_id))
+        if row is None or k <= 0:
+            return []
+        scores = np.asarray(self.item_factors @ self.user_factors[row])
+        excluded = list({self.item_row[pid] for pid in exclude if pid in self.item_row})
+        if excluded:
+            scores[excluded] = -np.inf
+        k = min(k, len(scores) - len(excluded))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.item_ids[i], float(scores[i])) for i in top]
+
+
+class ALSModelStore:
+    """Serves the version named in ``<root>/CURRENT`` and hot-swaps on change.
+
+    The pointer file is read at most every ``check_interval`` seconds, so
+    the request path normally costs one attribute read.
+    """
+
+    def __init__(self, root=DEFAULT_MODEL_DIR, check_interval=30):
+        self.root = root
+        self.check_interval = check_interval
+        self.model = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        if time.time() - self._checked_at >= self.check_interval:
+            with self._lock:
+                if time.time() - self._checked_at >= self.check_interval:
+                    self._checked_at = time.time()
+                    self._maybe_swap()
+        return self.model
+
+    def _maybe_swap(self):
+        pointer = os.path.join(self.root, "CURRENT")
+        try:
+            with open(pointer) as f:
+                version = f.read().strip()
+            if self.model is not None and version == self._version:
+                return
+            model = ALSModel(os.path.join(self.root, version))
+        except (OSError, ValueError) as e:
+            if self.model is None:
+                logger.debug("No ALS model available in %s: %s", self.root, e)
+            else:
+                logger.warning("Keeping ALS model %s; could not load new version: %s",
+                               self.model.version, e)
+            return
+        self.model = model
+        self._version = version
+        logger.info("Serving ALS model %s", model.version)
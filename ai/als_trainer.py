@@ -0,0 +1,206 @@
+"""
+Offline implicit-feedback ALS trainer.
+
+Reads purchases from ``orders`` and views from ``users.viewed_products``,
+factorises the user x product confidence matrix with alternating least squares
+(Hu, Koren & Volinsky, 2008) on the CPU, and writes a versioned model
+directory that ``als_model.ALSModelStore`` memory-maps in the services:
+
+    models/als/<version>/user_factors.npy
+    models/als/<version>/item_factors.npy
+    models/als/<version>/user_ids.json
+    models/als/<version>/item_ids.json
+    models/als/<version>/purchased_indptr.npy   <- items each user bought (CSR),
+    models/als/<version>/purchased_items.npy       excluded from their results
+    models/als/<version>/meta.json
+    models/als/CURRENT          <- name of the version to serve
+
+Usage:
+    python als_trainer.py --factors 32 --iterations 10
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_DIR = os.getenv(
+    "ALS_MODEL_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "als"),
+)
+
+# Same relative weights as calculate_user_preferences() in recommendation_model.py.
+PURCHASE_WEIGHT = 2.0
+VIEW_WEIGHT = 1.0
+
+
+def load_interactions(db, batch_size=1000):
+    """Stream orders and views into a CSR user x item matrix of summed weights.
+
+    Returns ``(interactions, user_ids, item_ids, purchased)``; ``purchased``
+    is a boolean CSR matrix of the same shape marking what each user bought.
+    """
+    user_of, item_of = {}, {}
+    rows, cols, values, bought = [], [], [], []
+
+    def add(user, product, weight, purchase):
+        u = user_of.setdefault(str(user), len(user_of))
+        i = item_of.setdefault(str(product), len(item_of))
+        rows.append(u)
+        cols.append(i)
+        values.append(weight)
+        bought.append(purchase)
+
+    orders = db["orders"].find({}, {"user": 1, "orderItems.product": 1}).batch_size(batch_size)
+    for order in orders:
+        if order.get("user") is None:
+            continue
+        for item in order.get("orderItems", []):
+            if item.get("product") is not None:
+                add(order["user"], item["product"], PURCHASE_WEIGHT, True)
+
+    users = db["users"].find(
+        {"viewed_products.0": {"$exists": True}}, {"viewed_products": 1}
+    ).batch_size(batch_size)
+    for user in users:
+        for product in user.get("viewed_products", []):
+            add(user["_id"], product, VIEW_WEIGHT, False)
+
+    shape = (len(user_of), len(item_of))
+    rows, cols, bought = np.asarray(rows), np.asarray(cols), np.asarray(bought, dtype=bool)
+    matrix = sparse.coo_matrix((np.asarray(values, dtype=np.float32), (rows, cols)), shape=shape).tocsr()
+    purchased = sparse.coo_matrix(
+        (np.ones(bought.sum(), dtype=bool), (rows[bought], cols[bought])),
+        shape=shape,
+    ).tocsr()
+    return matrix, list(user_of), list(item_of), purchased
+
+
+def train_als(interactions, factors=32, iterations=10, regularization=0.1, alpha=40.0, seed=0):
+    """Return ``(user_factors, item_factors)`` as float32 arrays."""
+    rng = np.random.default_rng(seed)
+    n_users, n_items = interactions.shape
+    user_factors = (rng.standard_normal((n_users, factors)) * 0.01).astype(np.float64)
+    item_factors = (rng.standard_normal((n_items, factors)) * 0.01).astype(np.float64)
+    by_item = interactions.T.tocsr()
+
+    for iteration in range(iterations):
+        started = time.perf_counter()
+        user_factors = _least_squares(interactions, item_factors, regularization, alpha)
+        item_factors = _least_squares(by_item, user_factors, regularization, alpha)
+        logger.info("ALS iteration %d/%d in %.2fs", iteration + 1, iterations,
+                    time.perf_counter() - started)
+
+    return user_factors.astype(np.float32), item_factors.astype(np.float32)
+
+
+def _least_squares(confidence_rows, fixed, regularization, alpha):
+    """Solve every row's factors against the fixed side.
+
+    Uses the YtY precomputation so each row only pays for its own non-zeros.
+    """
+    n_rows, factors = confidence_rows.shape[0], fixed.shape[1]
+    gram = fixed.T @ fixed + regularization * np.eye(factors)
+    solved = np.zeros((n_rows, factors))
+    indptr, indices, data = confidence_rows.indptr, confidence_rows.indices, confidence_rows.data
+    for row in range(n_rows):
+        start, stop = indptr[row], indptr[row + 1]
+        if start == stop:
+            continue
+        local = fixed[indices[start:stop]]
+        confidence = 1.0 + alpha * data[start:stop]
+        a = gram + (local.T * (confidence - 1.0)) @ local
+        b = local.T @ confidence
+        solved[row] = np.linalg.solve(a, b)
+    return solved
+
+
+def save_model(root, version, user_factors, item_factors, user_ids, item_ids, meta, purchased=None):
+    """Write a version directory and then point CURRENT at it atomically.
+
+    Retraining under an existing version name replaces that directory.
+    """
+    os.makedirs(root, exist_ok=True)
+    final_dir = os.path.join(root, version)
+    tmp_dir = f"{final_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    np.save(os.path.join(tmp_dir, "user_factors.npy"), user_factors)
+    np.save(os.path.join(tmp_dir, "item_factors.npy"), item_factors)
+    for name, payload in (("user_ids.json", user_ids), ("item_ids.json", item_ids), ("meta.json", meta)):
+        with open(os.path.join(tmp_dir, name), "w") as f:
+            json.dump(payload, f)
+    if purchased is not None:
+        purchased = purchased.tocsr()
+        np.save(os.path.join(tmp_dir, "purchased_indptr.npy"), purchased.indptr.astype(np.int64))
+        np.save(os.path.join(tmp_dir, "purchased_items.npy"), purchased.indices.astype(np.int32))
+
+    if os.path.exists(final_dir):
+        # os.replace() cannot overwrite a non-empty directory. Workers still
+        # mapping the old files keep reading them after they are unlinked.
+        old_dir = f"{final_dir}.old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        os.replace(final_dir, old_dir)
+        os.replace(tmp_dir, final_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.replace(tmp_dir, final_dir)
+
+    pointer_tmp = os.path.join(root, "CURRENT.tmp")
+    with open(pointer_tmp, "w") as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(root, "CURRENT"))
+    return final_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train implicit ALS factors from orders and views")
+    parser.add_argument("--factors", type=int, default=32)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--regularization", type=float, default=0.1)
+    parser.add_argument("--alpha", type=float, default=40.0)
+    parser.add_argument("--output", default=DEFAULT_MODEL_DIR)
+    parser.add_argument("--version", default=datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S"))
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+    db = MongoClient(os.getenv("MONGODB_URI", ""))["test"]
+
+    started = time.perf_counter()
+    interactions, user_ids, item_ids, purchased = load_interactions(db)
+    logger.info("Loaded %d users x %d products (%d interactions)",
+                len(user_ids), len(item_ids), interactions.nnz)
+
+    user_factors, item_factors = train_als(
+        interactions, args.factors, args.iterations, args.regularization, args.alpha
+    )
+    meta = {
+        "version": args.version,
+        "factors": args.factors,
+        "iterations": args.iterations,
+        "regularization": args.regularization,
+        "alpha": args.alpha,
+        "users": len(user_ids),
+        "items": len(item_ids),
+        "interactions": int(interactions.nnz),
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+    }
+    path = save_model(args.output, args.version, user_factors, item_factors, user_ids, item_ids, meta,
+                      purchased)
+    print(f"Wrote ALS model {args.version} to {path} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
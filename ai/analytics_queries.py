@@ -0,0 +1,49 @@
+"""
+Server-side aggregations shared by the analytics endpoints.
+
+Category sales used to be computed by fetching every order in the window and
+calling ``find_one()`` on the products collection for each item. Here the same
+numbers come from a single pipeline that unwinds the items, joins them to
+their product with ``$lookup`` and groups by category inside MongoDB.
+"""
+
+
+def category_sales_pipeline(start_date, end_date, products_collection="products"):
+    return [
+        {"$match": {"createdAt": {"$gte": start_date, "$lte": end_date}}},
+        {"$project": {"orderItems.product": 1, "orderItems.price": 1, "orderItems.qty": 1}},
+        {"$unwind": "$orderItems"},
+        {"$lookup": {
+            "from": products_collection,
+            "localField": "orderItems.product",
+            "foreignField": "_id",
+            "as": "product",
+        }},
+        # Items whose product was deleted are dropped here, as before.
+        {"$unwind": "$product"},
+        {"$group": {
+            "_id": "$product.category",
+            # price x qty, as sales_rollup.order_cells counts revenue.
+            "sales": {"$sum": {"$multiply": [
+                {"$ifNull": ["$orderItems.price", 0]},
+                {"$ifNull": ["$orderItems.qty", 1]},
+            ]}},
+        }},
+    ]
+
+
+def category_sales(orders_collection, start_date, end_date, products_collection="products"):
+    """``{category: revenue}`` (item price x qty) for orders created in the window (one query)."""
+    pipeline = category_sales_pipeline(start_date, end_date, products_collection)
+    return {row["_id"]: row["sales"] for row in orders_collection.aggregate(pipeline)}
+
+
+def popular_categories(sales_by_category, limit=5):
+    """Top categories with their share of sales, as the analytics responses list them."""
+    total = sum(sales_by_category.values())
+    if not total:
+        return []
+    return [
+        {"name": category, "percentage": round((sales / total) * 100)}
+        for category, sales in sorted(sales_by_category.items(), key=lambda x: x[1], reverse=True)
+    ][:limit]
@@ -0,0 +1,153 @@
+"""
+Nearest-neighbour search engines over the product TF-IDF matrix.
+
+``ExactSearch`` scores the whole catalog; ``LSHSearch`` is a random-hyperplane
+(SimHash) locality-sensitive hash that only re-scores the products sharing a
+bucket with the query. Both expose the same ``search()`` so the recommendation
+service can switch engines with ``RECOMMENDER_ENGINE``.
+"""
+import os
+
+import numpy as np
+
+
+class ExactSearch:
+    """Brute-force cosine search; the reference the approximate engines are measured against."""
+
+    name = "exact"
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+
+    def search(self, query, k, exclude=None):
+        """Return ``(rows, scores)`` of the ``k`` best products for a 1 x terms query row."""
+        scores = (self.matrix @ query.T).toarray().ravel()
+        return _top_k(np.arange(len(scores)), scores, k, exclude)
+
+
+class LSHSearch:
+    """Random-hyperplane LSH with multi-probe lookup and exact re-ranking.
+
+    Recall/latency knobs:
+
+    * ``n_tables``  - more tables raise recall and memory linearly.
+    * ``n_bits``    - more bits per table mean smaller buckets (faster, lower recall).
+    * ``n_probes``  - buckets visited per table; extra probes flip the query's
+      least certain bits, trading latency for recall without more memory.
+    * ``max_candidates`` - cap on re-scored rows, keeping those that collide
+      with the query in the most tables.
+    """
+
+    name = "lsh"
+
+    def __init__(self, matrix, n_tables=16, n_bits=10, n_probes=8, max_candidates=2000,
+                 seed=0, block_size=65536):
+        if not 0 < n_bits <= 63:
+            raise ValueError("n_bits must be between 1 and 63")
+        self.matrix = matrix
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.n_probes = max(1, n_probes)
+        self.max_candidates = max_candidates
+
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal(
+            (matrix.shape[1], n_tables * n_bits)
+        ).astype(np.float32)
+        self._weights = np.left_shift(np.uint64(1), np.arange(n_bits, dtype=np.uint64))
+
+        n = matrix.shape[0]
+        codes = np.empty((n, n_tables), dtype=np.uint64)
+        for start in range(0, n, block_size):
+            stop = min(start + block_size, n)
+            codes[start:stop] = self._codes(self._project(matrix[start:stop]))
+
+        # One sorted code array per table; a bucket is a searchsorted range.
+        self._order = np.argsort(codes, axis=0, kind="stable").astype(np.int32)
+        self._sorted_codes = np.take_along_axis(codes, self._order.astype(np.intp), axis=0)
+
+    def _project(self, rows):
+        projected = rows @ self.planes
+        return np.asarray(projected).reshape(rows.shape[0], self.n_tables, self.n_bits)
+
+    def _codes(self, projected):
+        return (projected > 0).astype(np.uint64) @ self._weights
+
+    def _probe_codes(self, projected):
+        """Bucket codes to visit per table, closest bucket first."""
+        base = self._codes(projected[None])[0]
+        probes = [base]
+        if self.n_probes > 1:
+            uncertain = np.argsort(np.abs(projected), axis=1)[:, :self.n_probes - 1]
+            for i in range(uncertain.shape[1]):
+                probes.append(base ^ self._weights[uncertain[:, i]])
+        return np.stack(probes, axis=1)
+
+    def candidates(self, query):
+        """Rows sharing at least one probed bucket with the query."""
+        probes = self._probe_codes(self._project(query)[0])
+        hits = []
+        for table in range(self.n_tables):
+            sorted_codes = self._sorted_codes[:, table]
+            codes = probes[table]
+            lo = np.searchsorted(sorted_codes, codes, side="left")
+            hi = np.searchsorted(sorted_codes, codes, side="right")
+            for a, b in zip(lo, hi):
+                if b > a:
+                    hits.append(self._order[a:b, table])
+        if not hits:
+            return np.empty(0, dtype=np.int32)
+
+        rows, counts = np.unique(np.concatenate(hits), return_counts=True)
+        if len(rows) > self.max_candidates:
+            keep = np.argpartition(-counts, self.max_candidates - 1)[:self.max_candidates]
+            rows = rows[keep]
+        return rows
+
+    def search(self, query, k, exclude=None):
+        rows = self.candidates(query)
+        if len(rows) == 0:
+            return rows, np.empty(0, dtype=np.float64)
+        scores = (self.matrix[rows] @ query.T).toarray().ravel()
+        return _top_k(rows, scores, k, exclude)
+
+
+ENGINES = {
+    ExactSearch.name: ExactSearch,
+    LSHSearch.name: LSHSearch,
+}
+
+
+def make_engine(matrix, name=None, **params):
+    """Build the engine named by ``name`` or ``RECOMMENDER_ENGINE`` (default exact).
+
+    LSH parameters fall back to ``LSH_TABLES``, ``LSH_BITS``, ``LSH_PROBES`` and
+    ``LSH_MAX_CANDIDATES`` from the environment.
+    """
+    name = name or os.getenv("RECOMMENDER_ENGINE", ExactSearch.name)
+    if name not in ENGINES:
+        raise ValueError(f"Unknown search engine: {name}")
+    if name == LSHSearch.name:
+        env_params = {
+            "n_tables": os.getenv("LSH_TABLES"),
+            "n_bits": os.getenv("LSH_BITS"),
+            "n_probes": os.getenv("LSH_PROBES"),
+            "max_candidates": os.getenv("LSH_MAX_CANDIDATES"),
+        }
+        for key, value in env_params.items():
+            if value is not None:
+                params.setdefault(key, int(value))
+    return ENGINES[name](matrix, **params)
+
+
+def _top_k(rows, scores, k, exclude):
+    if k <= 0:
+        return rows[:0], scores[:0]
+    if exclude is not None:
+        keep = rows != exclude
+        rows, scores = rows[keep], scores[keep]
+    if len(scores) > k:
+        part = np.argpartition(-scores, k - 1)[:k]
+        rows, scores = rows[part], scores[part]
+    order = np.argsort(-scores, kind="stable")
+    return rows[order], scores[order]
@@ -1,31 +1,46 @@
+from startup import StartupReport, install_startup, readiness_response
+startup_report = StartupReport("app")
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from pymongo import MongoClient
 from bson import ObjectId
-import traceback
 import random
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import re
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
-import pandas as pd
 import os
 from dotenv import load_dotenv
-import requests # Import requests to fetch exchange rates
 from recommendation_model import get_recommendations as get_personalized_recommendations_python
-from sklearn.preprocessing import StandardScaler
-from sklearn.ensemble import RandomForestClassifier
+from recommendation_model import get_als_recommendations, fetch_products_in_order
+from recommendation_model import get_popular_products as get_ranked_popular_products, popularity, catalog
+from recommendation_model import WARMUP_STEPS as RECOMMENDATION_WARMUP_STEPS
+from catalog import SUPPORTED_CURRENCIES
+from materialized_recommendations import MaterializedRecommendations
+from product_lookup import ProductResolver, category_price_profile, collect_product_ids
+from exchange_rates import ExchangeRateCache
+from user_listing import users_response
+from sales_rollup import SalesRollup
+from analytics_queries import category_sales as get_category_sales, popular_categories as get_popular_categories
+from response_encoding import install_json_provider, format_product_cards, PRODUCT_CARD_PROJECTION
+from metrics import install_metrics, register_cache
+from query_profiler import install_query_profiler
 import logging
 
 # Import the actual prediction function
 from predictive_analytics import predict_next_purchase
+startup_report.mark("imports")
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
+install_json_provider(app)
+install_metrics(app, "app")
+install_query_profiler(app)
+
+logger = logging.getLogger(__name__)
 
 # MongoDB Atlas connection
 try:
@@ -34,35 +49,46 @@ try:
     products_collection = db["products"]
     orders_collection = db["orders"]
     users_collection = db["users"]
-    print("✅ MongoDB connection successful")
+    product_resolver = ProductResolver(products_collection, {"category": 1, "price": 1})
+    sales_rollup = SalesRollup(db)
+    materialized_recommendations = MaterializedRecommendations(db)
+    logger.info("MongoDB connection successful")
 except Exception as e:
-    print(f"❌ MongoDB connection error: {str(e)}")
+    logger.error("MongoDB connection error: %s", e)
     raise
 
-# Function to fetch exchange rates
-def get_exchange_rate(from_currency, to_currency):
-    try:
-        # Using the same API as frontend, relative to PKR
-        response = requests.get('https://open.er-api.com/v6/latest/PKR')
-        data = response.json()
-        if data['result'] == 'success' and to_currency in data['rates'] and from_currency in data['rates']:
-            # Convert from_currency to PKR, then PKR to to_currency
-            # To convert from USD to PKR, we need 1 / rate_for_USD_in_PKR
-            if data['rates'].get(from_currency, 0) == 0:
-                 print(f"Warning: Exchange rate for {from_currency} is 0.")
-                 return None # Cannot divide by zero
-            rate_from_pkr = data['rates'][from_currency]
-            # Conversion rate from FROM to TO currency is (Rate of TO relative to PKR) / (Rate of FROM relative to PKR)
-            # We need FROM=USD, TO=PKR. So Rate is 1 / Rate of USD relative to PKR
-            conversion_rate = 1 / rate_from_pkr
-            print(f"Fetched exchange rate: 1 {from_currency} = {conversion_rate} {to_currency}")
-            return conversion_rate
-        else:
-            print(f"Error fetching exchange rates or currencies not found: {data}")
-            return None
-    except Exception as e:
-        print(f"Error fetching exchange rates: {e}")
-        return None
+# Exchange rates are cached (and snapshotted to disk); requests never wait on the API
+# once rates are known, stale rates are served while a background fetch replaces them.
+exchange_rates = ExchangeRateCache(ttl=3600, timeout=3.0)
+register_cache("exchange_rates", exchange_rates)
+register_cache("materialized_recommendations", materialized_recommendations)
+startup_report.mark("clients and caches")
+
+# Recommendation prices default to PKR; clients may ask for any supported currency.
+DEFAULT_CURRENCY = "PKR"
+
+def parse_currency(value):
+    """Upper-cased currency code, or None if it is not one the frontend offers."""
+    currency = (value or DEFAULT_CURRENCY).upper()
+    return currency if currency in SUPPORTED_CURRENCIES else None
+
+def format_recommendations(products, currency, **card_defaults):
+    """Cards priced in ``currency`` from the catalog's converted price columns.
+
+    Falls back to the stored USD prices when no rate for ``currency`` is known.
+    """
+    products = list(products)
+    prices = catalog.get().convert_prices(products, currency, exchange_rates.get_rates())
+    if prices is None:
+        logger.warning("No USD to %s rate available; returning prices in USD", currency)
+    return format_product_cards(products, prices, currency, **card_defaults)
+
+def get_precomputed_recommendations(user_id, order_history=None):
+    """Materialized per-user list first, then the ALS model; None means use the live path."""
+    product_ids = materialized_recommendations.get(user_id, 8, order_history)
+    if product_ids:
+        return fetch_products_in_order(product_ids)
+    return get_als_recommendations(user_id, exclude=collect_product_ids(order_history))
 
 # Chatbot patterns and responses
 PATTERNS = {
@@ -141,24 +167,15 @@ def get_recommendations(recent_orders):
         if not recent_orders:
             return get_popular_products()
         
-        categories = set()
-        price_ranges = []
-        
-        for order in recent_orders:
-            for item in order.get("orderItems", []):
-                product = products_collection.find_one({"_id": ObjectId(item.get("product"))})
-                if product:
-                    categories.add(product.get("category"))
-                    price_ranges.append(product.get("price", 0))
+        categories, price_ranges = category_price_profile(recent_orders, product_resolver)
         
         avg_price = sum(price_ranges) / len(price_ranges) if price_ranges else 0
         price_min = avg_price * 0.7
         price_max = avg_price * 1.3
         
-        recommendations = list(products_collection.find({
-            "category": {"$in": list(categories)},
-            "price": {"$gte": price_min, "$lte": price_max}
-        }).limit(8))
+        snapshot = catalog.get()
+        rows = snapshot.price_band_rows(snapshot.codes_for(categories), price_min, price_max, limit=8)
+        recommendations = snapshot.get_records(rows)
         
         if len(recommendations) < 8:
             popular_products = get_popular_products()
@@ -166,23 +183,62 @@ def get_recommendations(recent_orders):
         
         return recommendations
         
-    except Exception as e:
-        print(f"Error in get_recommendations: {str(e)}")
+    except Exception:
+        logger.exception("Error in get_recommendations")
         return get_popular_products()
 
 def get_popular_products():
-    """Get popular products based on ratings."""
+    """Get popular products from the shared popularity ranking."""
     try:
-        # Modified to return the first 8 products found
-        print("Fetching first 8 products as popular fallback...")
-        return list(products_collection.find().limit(8))
-    except Exception as e:
-        print(f"Error in get_popular_products: {str(e)}")
+        return get_ranked_popular_products(8)
+    except Exception:
+        logger.exception("Error in get_popular_products")
         # Fallback to an empty list if even this fails
         return []
 
-def get_analytics(time_range):
-    """Generate analytics data for the specified time range."""
+# Fields /api/users returns unless the client asks for others.
+APP_USER_FIELDS = ("name", "username", "email", "isAdmin", "createdAt")
+
+# Days covered by each analytics view.
+ANALYTICS_DAYS = {"week": 7, "month": 30, "year": 365}
+
+# Each day's predicted sales are the mean of this many preceding days.
+FORECAST_WINDOW = 7
+
+def get_rollup_sales(time_range):
+    """Daily actual/predicted sales for the view plus its trend, from the sales rollups.
+
+    The rollup is loaded at warmup and kept current by its refresher; until
+    then (while /ready answers 503) the series are zeros.
+    """
+    days = ANALYTICS_DAYS.get(time_range, 365)
+    end_day = datetime.now(timezone.utc).date()
+    start_day = end_day - timedelta(days=days - 1)
+    lookback = max(days, FORECAST_WINDOW)
+    series = sales_rollup.daily_revenue(start_day - timedelta(days=lookback), end_day)
+
+    actual = series[lookback:]
+    previous_total = series[lookback - days:lookback].sum()
+    cumulative = np.concatenate([[0.0], np.cumsum(series)])
+    positions = np.arange(lookback, len(series))
+    predicted = (cumulative[positions] - cumulative[positions - FORECAST_WINDOW]) / FORECAST_WINDOW
+    trend = (actual.sum() - previous_total) / previous_total * 100 if previous_total else 0.0
+
+    dates = [(start_day + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+    return {
+        "salesData": [
+            {"date": date, "actual": round(a, 2), "predicted": round(p, 2)}
+            for date, a, p in zip(dates, actual.tolist(), predicted.tolist())
+        ],
+        "predictedSales": round(float(predicted.sum()), 2),
+        "salesTrend": round(float(trend), 2),
+    }
+
+def get_analytics(time_range, sales=None):
+    """Generate analytics data for the specified time range.
+
+    ``sales`` is ``get_rollup_sales(time_range)`` when the caller already has it.
+    """
     try:
         end_date = datetime.now()
         if time_range == "week":
@@ -194,7 +250,7 @@ def get_analytics(time_range):
         
         orders = list(orders_collection.find({
             "createdAt": {"$gte": start_date, "$lte": end_date}
-        }))
+        }, {"totalPrice": 1, "user": 1}))
         
         total_sales = sum(order.get("totalPrice", 0) for order in orders)
         
@@ -205,7 +261,7 @@ def get_analytics(time_range):
                     "$gte": start_date - (end_date - start_date),
                     "$lt": start_date
                 }
-            })
+            }, {"user": 1})
         ))
         
         customer_growth = (
@@ -213,31 +269,20 @@ def get_analytics(time_range):
             if previous_period_customers > 0 else 0
         )
         
-        category_sales = {}
-        for order in orders:
-            for item in order.get("orderItems", []):
-                product = products_collection.find_one({"_id": item.get("product")})
-                if product:
-                    category = product.get("category")
-                    category_sales[category] = category_sales.get(category, 0) + item.get("price", 0)
+        category_sales = get_category_sales(orders_collection, start_date, end_date)
+        popular_categories = get_popular_categories(category_sales)
         
-        total_category_sales = sum(category_sales.values())
-        popular_categories = [
-            {"name": category, "percentage": round((sales / total_category_sales) * 100)}
-            for category, sales in sorted(category_sales.items(), key=lambda x: x[1], reverse=True)
-        ][:5]
-        
-        sales_trend = random.uniform(-10, 20)
+        sales_trend = (sales or get_rollup_sales(time_range))["salesTrend"]
         
         return {
             "totalSales": total_sales,
             "customerGrowth": round(customer_growth, 2),
-            "salesTrend": round(sales_trend, 2),
+            "salesTrend": sales_trend,
             "popularCategories": popular_categories
         }
         
-    except Exception as e:
-        print(f"Error in get_analytics: {str(e)}")
+    except Exception:
+        logger.exception("Error in get_analytics")
         return {
             "totalSales": 0,
             "customerGrowth": 0,
@@ -259,304 +304,121 @@ def chatbot():
         return jsonify({"response": response})
 
     except Exception as e:
-        print("🔥 ERROR during chatbot response:")
-        traceback.print_exc()
+        logger.exception("Error during chatbot response")
         return jsonify({"error": str(e)}), 500
 
 @app.route("/api/recommendations", methods=["GET"])
 def get_product_recommendations():
+    currency = parse_currency(request.args.get("currency"))
+    if currency is None:
+        return jsonify({"error": f"Unsupported currency. Use one of {', '.join(SUPPORTED_CURRENCIES)}"}), 400
     try:
         # This endpoint can remain for default recommendations if needed elsewhere
-        # It will now return prices in PKR
-        recent_orders = list(orders_collection.find().limit(5)) # Example: maybe use some criteria for default?
         recommendations_usd = get_personalized_recommendations_python([]) # Assuming this returns prices in USD
-        
-        # Convert prices from USD to PKR
-        usd_to_pkr_rate = get_exchange_rate('USD', 'PKR')
-        
-        formatted_recommendations = []
-        for product in recommendations_usd:
-            # Ensure product has an _id and price before attempting to convert
-            if "_id" in product and "price" in product and usd_to_pkr_rate is not None:
-                price_pkr = product['price'] * usd_to_pkr_rate
-                formatted_recommendations.append({
-                    "id": str(product["_id"]),
-                    "name": product["name"],
-                    "description": product["description"],
-                    "price": round(price_pkr, 2), # Round to 2 decimal places
-                    "image": product["image"],
-                    "rating": product.get("rating", 4.5),
-                    "reviews": product.get("numReviews", random.randint(10, 100)),
-                    "currency": 'PKR' # Indicate currency is now PKR
-                })
-            elif "_id" in product:
-                 # If conversion fails, still include product but log warning
-                 print(f"Warning: Could not convert price for product {product.get('name', '')}. Returning original price in USD.")
-                 formatted_recommendations.append({
-                    "id": str(product["_id"]),
-                    "name": product["name"],
-                    "description": product["description"],
-                    "price": product.get('price', 0), # Return original price
-                    "image": product["image"],
-                    "rating": product.get("rating", 4.5),
-                    "reviews": product.get("numReviews", random.randint(10, 100)),
-                    "currency": 'USD' # Indicate original currency
-                 })
-            else:
-                 print("Skipping product without _id:", product);
-
-
-        print('Returning recommendations from /api/recommendations (likely default) in PKR:', len(formatted_recommendations));
+
+        formatted_recommendations = format_recommendations(
+            recommendations_usd, currency,
+            default_rating=4.5, default_reviews=lambda: random.randint(10, 100),
+        )
+
+        logger.info("Default recommendations", extra={"fields": {
+            "currency": currency, "returned": len(formatted_recommendations)}})
         return jsonify({ "recommendations": formatted_recommendations });
 
     except Exception as e:
-        print("🔥 ERROR during default recommendations:")
-        traceback.print_exc()
-        # Fallback to simpler default on error, returning prices in USD if conversion fails
+        logger.exception("Error during default recommendations")
+        # Fallback to simpler default on error, returning prices in USD
         try:
-            simple_default = list(products_collection.find().limit(8))
-            formatted_default = []
-            for product in simple_default:
-                 if "_id" in product:
-                    formatted_default.append({
-                        "id": str(product["_id"]),
-                        "name": product["name"],
-                        "description": product["description"],
-                        "price": product.get('price', 0), # Assume original is USD
-                        "image": product["image"],
-                        "rating": product.get("rating", 4.0),
-                        "reviews": product.get("numReviews", 5),
-                        "currency": 'USD' # Indicate original currency is USD
-                    })
-                 else:
-                    print("Skipping fallback product without _id:", product);
-
+            simple_default = list(products_collection.find({}, PRODUCT_CARD_PROJECTION).limit(8))
+            formatted_default = format_product_cards(simple_default)
             return jsonify({ "error": str(e), "recommendations": formatted_default }), 500
-        except Exception as e:
-            print("🔥 ERROR during simple default fallback:", e)
+        except Exception:
+            logger.exception("Error during simple default fallback")
             return jsonify({ "error": "Failed to fetch recommendations" }), 500
 
 # New endpoint for personalized recommendations called by Node.js backend
 @app.route("/get-personalized-recommendations", methods=["POST"])
 def get_personalized_recommendations_endpoint():
+    data = request.get_json() or {}
+    currency = parse_currency(data.get("currency"))
+    if currency is None:
+        return jsonify({"error": f"Unsupported currency. Use one of {', '.join(SUPPORTED_CURRENCIES)}"}), 400
     try:
-        data = request.get_json()
         user_id = data.get("userId")
         order_history = data.get("orderHistory")
 
-        # Get exchange rate for USD to PKR
-        usd_to_pkr_rate = get_exchange_rate('USD', 'PKR')
+        # Users covered by the materialized table or the ALS model skip the live path
+        precomputed_recommendations = get_precomputed_recommendations(user_id, order_history)
 
-        if not user_id or not order_history:
-            print("Missing userId or orderHistory for personalized recommendations. Falling back to popular products.")
+        if not precomputed_recommendations and (not user_id or not order_history):
             # Fallback to getting popular products if user data is missing
             # These popular products are assumed to have prices in USD from the database
-            popular_products_usd = get_popular_products() # Use the imported function with empty data
-            print(f"Number of popular products returned by get_popular_products: {len(popular_products_usd)}")
-
-            formatted_recommendations = []
-            for product in popular_products_usd:
-                 # Ensure product has an _id before processing
-                if "_id" in product:
-                    # Convert prices from USD to PKR if rate is available
-                    if "price" in product and usd_to_pkr_rate is not None:
-                        price_pkr = product['price'] * usd_to_pkr_rate
-                        formatted_recommendations.append({
-                            "id": str(product["_id"]),
-                            "name": product["name"],
-                            "description": product["description"],
-                            "price": round(price_pkr, 2), # Round to 2 decimal places
-                            "image": product["image"],
-                            "rating": product.get("rating", 4.0),
-                            "reviews": product.get("numReviews", 5),
-                            "currency": 'PKR' # Indicate currency is now PKR
-                        })
-                    # If conversion fails but _id exists, return original price
-                    elif "price" in product:
-                         print(f"Warning: Could not convert price for fallback product {product.get('name', '')}. Returning original price in USD.")
-                         formatted_recommendations.append({
-                            "id": str(product["_id"]),
-                            "name": product["name"],
-                            "description": product["description"],
-                            "price": product.get('price', 0), # Return original price
-                            "image": product["image"],
-                            "rating": product.get("rating", 4.0),
-                            "reviews": product.get("numReviews", 5),
-                            "currency": 'USD' # Indicate original currency
-                        })
-                    else:
-                         print("Skipping fallback product without price but with _id:", product);
-                else:
-                    print("Skipping fallback product without _id:", product);
-
-            print(f"Number of formatted recommendations after fallback: {len(formatted_recommendations)}")
-            print('Returning popular products from /get-personalized-recommendations (due to missing user data) in PKR (if converted):', len(formatted_recommendations))
+            formatted_recommendations = format_recommendations(get_popular_products(), currency)
+            logger.info("Missing userId or orderHistory; returning popular products", extra={"fields": {
+                "currency": currency, "returned": len(formatted_recommendations)}})
             return jsonify({ "recommendations": formatted_recommendations });
 
 
-        print(f"Received personalized recommendations request for user: {user_id}");
         # Assuming orderHistory is already processed by Node.js backend
-        recommendations_usd = get_personalized_recommendations_python(order_history) # Call the imported function (assuming it returns USD)
-        print(f"Number of personalized recommendations returned by get_personalized_recommendations_python: {len(recommendations_usd)}")
-
-        formatted_recommendations = []
-        for product in recommendations_usd:
-            # Ensure product has an _id before processing
-            if "_id" in product:
-                # Attempt to convert price if rate is available
-                if "price" in product and usd_to_pkr_rate is not None:
-                    price_pkr = product['price'] * usd_to_pkr_rate
-                    formatted_recommendations.append({
-                        "id": str(product["_id"]),
-                        "name": product["name"],
-                        "description": product["description"],
-                        "price": round(price_pkr, 2), # Round to 2 decimal places
-                        "image": product["image"],
-                        "rating": product.get("rating", 4.5),
-                        "reviews": product.get("numReviews", random.randint(10, 100)),
-                        "currency": 'PKR' # Indicate currency is now PKR
-                    })
-                # If conversion fails but _id exists, return original price
-                elif "price" in product:
-                    print(f"Warning: Could not convert price for product {product.get('name', '')}. Returning original price in USD.")
-                    formatted_recommendations.append({
-                        "id": str(product["_id"]),
-                        "name": product["name"],
-                        "description": product["description"],
-                        "price": product.get('price', 0), # Return original price
-                        "image": product["image"],
-                        "rating": product.get("rating", 4.5),
-                        "reviews": product.get("numReviews", random.randint(10, 100)),
-                        "currency": 'USD' # Indicate original currency
-                    })
-                else:
-                    print("Skipping product without price but with _id:", product);
-            else:
-                print("Skipping product without _id:", product);
-
-        print(f"Number of formatted personalized recommendations: {len(formatted_recommendations)}")
-        print('Returning personalized recommendations in PKR (if converted):', len(formatted_recommendations))
+        recommendations_usd = precomputed_recommendations or get_personalized_recommendations_python(order_history) # Call the imported function (assuming it returns USD)
+
+        formatted_recommendations = format_recommendations(
+            recommendations_usd, currency,
+            default_rating=4.5, default_reviews=lambda: random.randint(10, 100),
+        )
+        logger.info("Personalized recommendations", extra={"fields": {
+            "userId": user_id, "precomputed": bool(precomputed_recommendations),
+            "currency": currency, "returned": len(formatted_recommendations)}})
         return jsonify({ "recommendations": formatted_recommendations });
 
     except Exception as e:
-        print("🔥 ERROR during personalized recommendations:")
-        traceback.print_exc()
+        logger.exception("Error during personalized recommendations")
         # Fallback to returning popular products on error
         try:
-            popular_products_usd = get_popular_products() # Use the imported function for fallback (assuming it returns USD)
-
-            formatted_recommendations = []
-            for product in popular_products_usd:
-                # Ensure product has an _id before processing
-                if "_id" in product:
-                    # Convert prices from USD to PKR if rate is available
-                    if "price" in product and usd_to_pkr_rate is not None:
-                        price_pkr = product['price'] * usd_to_pkr_rate
-                        formatted_recommendations.append({
-                            "id": str(product["_id"]),
-                            "name": product["name"],
-                            "description": product["description"],
-                            "price": round(price_pkr, 2), # Round to 2 decimal places
-                            "image": product["image"],
-                            "rating": product.get("rating", 4.0),
-                            "reviews": product.get("numReviews", 5),
-                            "currency": 'PKR' # Indicate currency is now PKR
-                        })
-                    # If conversion fails but _id exists, return original price
-                    elif "price" in product:
-                        print(f"Warning: Could not convert price for fallback product {product.get('name', '')}. Returning original price in USD.")
-                        formatted_recommendations.append({
-                            "id": str(product["_id"]),
-                            "name": product["name"],
-                            "description": product["description"],
-                            "price": product.get('price', 0), # Return original price
-                            "image": product["image"],
-                            "rating": product.get("rating", 4.0),
-                            "reviews": product.get("reviews", 5),
-                            "currency": 'USD' # Indicate original currency
-                        })
-                    else:
-                         print("Skipping fallback product without price but with _id:", product);
-                else:
-                    print("Skipping fallback product without _id:", product);
-
+            formatted_recommendations = format_recommendations(get_popular_products(), currency)
             return jsonify({ "error": str(e), "recommendations": formatted_recommendations }), 500
-        except Exception as e:
-            print("🔥 ERROR during personalized recommendations fallback:", e)
+        except Exception:
+            logger.exception("Error during personalized recommendations fallback")
             return jsonify({ "error": "Failed to fetch personalized recommendations" }), 500
 
 @app.route("/api/analytics", methods=["GET"])
 def get_predictive_analytics():
     try:
         time_range = request.args.get("timeRange", "week")
-        analytics_data = get_analytics(time_range)
-        
-        dates = []
-        actual_sales = []
-        predicted_sales = []
-        
-        if time_range == "week":
-            days = 7
-        elif time_range == "month":
-            days = 30
-        else:  # year
-            days = 365
-            
-        base_date = datetime.now()
-        for i in range(days):
-            date = base_date - timedelta(days=days-i-1)
-            dates.append(date.strftime("%Y-%m-%d"))
-            actual = random.randint(1000, 5000)
-            predicted = actual + random.randint(-500, 500)
-            actual_sales.append(actual)
-            predicted_sales.append(predicted)
-            
-        sales_data = [
-            {"date": date, "actual": actual, "predicted": predicted}
-            for date, actual, predicted in zip(dates, actual_sales, predicted_sales)
-        ]
+        sales = get_rollup_sales(time_range)
+        analytics_data = get_analytics(time_range, sales)
         
         response = {
-            "predictedSales": sum(predicted_sales),
-            "salesTrend": analytics_data["salesTrend"],
+            "predictedSales": sales["predictedSales"],
+            "salesTrend": sales["salesTrend"],
             "customerGrowth": analytics_data["customerGrowth"],
             "popularCategories": analytics_data["popularCategories"],
-            "salesData": sales_data
+            "salesData": sales["salesData"]
         }
         
         return jsonify(response)
 
     except Exception as e:
-        print("🔥 ERROR during analytics:")
-        traceback.print_exc()
+        logger.exception("Error during analytics")
         return jsonify({"error": str(e)}), 500
 
 @app.route("/api/users", methods=["GET"])
 def list_users():
+    """Users, keyset-paginated on _id; ?format=ndjson streams them instead."""
     try:
-        users = list(users_collection.find())
-        for user in users:
-            user['id'] = str(user['_id'])
-            del user['_id']
-        print("Returning users from /api/users:", users)
-        return jsonify(users)
+        return users_response(users_collection, request.args, request.headers, APP_USER_FIELDS)
     except Exception as e:
-        print("🔥 ERROR during listing users:")
-        traceback.print_exc()
+        logger.exception("Error listing users")
         return jsonify({"error": str(e)}), 500
 
 @app.route("/api/debug-users", methods=["GET"])
 def debug_users():
     try:
-        users = list(users_collection.find().limit(5))
-        # Convert ObjectId to string for JSON serialization
-        for user in users:
-            user['_id'] = str(user['_id'])
-        print("Debug users endpoint hit. Returning:", users)
+        users = list(users_collection.find({}, {"password": 0}).limit(5))
+        logger.info("Debug users", extra={"fields": {"returned": len(users)}})
         return jsonify(users)
     except Exception as e:
-        print("🔥 ERROR during debug user listing:", e)
-        traceback.print_exc()
+        logger.exception("Error during debug user listing")
         return jsonify({"error": str(e)}), 500
 
 # Predictive Analytics Endpoint
@@ -581,16 +443,42 @@ def predict_next_purchase_endpoint():
             if not prediction_result:
                  return jsonify({"error": "Could not generate prediction, insufficient data"}), 400
 
-            print("Returning prediction data:", prediction_result)
             return jsonify(prediction_result)
 
         except Exception as e:
-            print("🔥 ERROR during prediction POST request processing:")
-            traceback.print_exc()
+            logger.exception("Error during prediction request")
             return jsonify({"error": str(e)}), 500
 
     # If not OPTIONS or POST, return Method Not Allowed
     return jsonify({"error": "Method not allowed"}), 405
 
+@app.route("/ready", methods=["GET"])
+def ready():
+    """503 until warm_up() has succeeded; the startup report either way."""
+    return readiness_response(startup_report)
+
+# The recommendation caches this service serves from (not the TF-IDF index,
+# search engine or co-purchase matrix, which only /recommend uses), then its own.
+WARMUP_STEPS = [
+    step for step in RECOMMENDATION_WARMUP_STEPS if step[0] in ("catalog", "popularity", "als_model")
+] + [
+    ("sales_rollup", sales_rollup.ensure_loaded),
+    ("exchange_rates", exchange_rates.get_rates),
+]
+
+def warm_up():
+    """Build the recommendation caches, sales rollup and rates before serving traffic."""
+    return startup_report.warm_up(WARMUP_STEPS)
+
+def start_background_refresh():
+    popularity.start_background_refresh()
+    exchange_rates.start_background_refresh()
+    sales_rollup.start_background_refresh()
+
+# Warmup and refreshers for every process serving ``app``: called by
+# gunicorn.conf.py in each worker, and by __main__ below.
+start = install_startup(app, startup_report, WARMUP_STEPS, on_ready=start_background_refresh)
+
 if __name__ == '__main__':
+    start(wait=True)
     app.run(debug=True, port=5004)
@@ -0,0 +1,306 @@
+"""
+ASGI serving mode for the AI services.
+
+    uvicorn --factory async_service:create_description_app --port 5002
+    uvicorn --factory async_service:create_main_app --port 5004
+
+The routes listed below run natively on the event loop: Mongo goes through
+motor and outbound HTTP (Gemini, the exchange rate feed) through one pooled
+``httpx.AsyncClient``, so a worker holds many slow requests at once instead
+of one per thread. Every other route falls through to the existing Flask
+app, which a2wsgi runs in a thread pool, so URLs and response bodies are the
+same in both modes and ``python app.py`` keeps working as before.
+
+Natively async routes:
+
+    description app   POST /generate-description
+                      POST /batch-generate-descriptions  (Gemini calls run concurrently)
+    main app          GET  /api/users
+                      exchange rate refresh (a loop task instead of a thread)
+
+Not covered: the main app's other routes, including /api/recommendations
+and /api/analytics, still run synchronously in the thread pool, and each
+one holds a thread while it waits on pymongo. /recommend is served from
+in-memory indexes and is CPU-bound, so an event loop would not help it.
+predictive_analytics (/predict) and chatbot_engine have no ASGI app. For
+those, scale with gunicorn threads or workers.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from bson import ObjectId
+from bson.errors import InvalidId
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import metrics
+import structured_logging
+from metrics import outbound_http
+from response_encoding import dumps_bytes, loads
+from user_listing import NDJSON_MIMETYPE, parse_listing_args, split_page, user_cursor, format_user
+
+logger = logging.getLogger(__name__)
+
+# Concurrent Gemini calls per batch request.
+DESCRIPTION_CONCURRENCY = int(os.getenv("DESCRIPTION_CONCURRENCY", "8"))
+HTTP_TIMEOUT = float(os.getenv("ASYNC_HTTP_TIMEOUT", "30"))
+# Threads a2wsgi runs the mounted Flask app on.
+WSGI_WORKERS = int(os.getenv("WSGI_WORKERS", "10"))
+
+
+def json_response(data, status=200, headers=None):
+    return Response(dumps_bytes(data), status_code=status, headers=headers, media_type="application/json")
+
+
+def _cors():
+    # The Flask apps answer with flask_cors defaults; native routes match them.
+    return [Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"],
+                       expose_headers=["X-Next-Cursor"])]
+
+
+def _motor_db():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    return AsyncIOMotorClient(os.getenv("MONGODB_URI"))["test"]
+
+
+class RequestMetrics:
+    """metrics.install_metrics() for the native routes; mounted Flask routes record their own.
+
+    Motor runs commands on its own threads, so Mongo time is not attributed
+    to these requests; it still shows in mongo_command_duration_seconds.
+    """
+
+    def __init__(self, app, service, paths):
+        self.app = app
+        self.service = service
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+        token = metrics.start_request()
+        log_token = structured_logging.start_request()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.finish_request(token, self.service, scope["path"], scope["method"], status)
+            structured_logging.finish_request(log_token)
+
+
+async def _read_json(request):
+    body = await request.body()
+    return loads(body) if body else None
+
+
+# --- product descriptions ------------------------------------------------
+
+async def generate_description_async(http, product):
+    """``generate_product_description()`` through ``http``; None on any failure."""
+    from product_description_generator import gemini_request, parse_gemini_response
+
+    response_data = None
+    try:
+        url, payload = gemini_request(product)
+        with outbound_http("gemini"):
+            response = await http.post(url, json=payload)
+            response.raise_for_status()
+        response_data = response.json()
+        return parse_gemini_response(response_data)
+    except httpx.HTTPError as e:
+        logger.error(f"Error calling Gemini API: {e}")
+    except (KeyError, IndexError) as e:
+        logger.error(f"Error parsing Gemini API response (missing key): {e}")
+        logger.error(f"Full response: {response_data}")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {str(e)}")
+    return None
+
+
+async def describe_product(products, http, product_id):
+    """One product's result entry for the batch endpoint."""
+    try:
+        product_obj_id = ObjectId(product_id)
+    except (InvalidId, TypeError):
+        return {"product_id": str(product_id), "success": False, "error": "Invalid Product ID format"}
+    product = await products.find_one({"_id": product_obj_id})
+    if not product:
+        return {"product_id": str(product_id), "success": False, "error": "Product not found in database"}
+    new_description = await generate_description_async(http, product)
+    if not new_description:
+        return {"product_id": str(product_id), "success": False, "error": "Failed to generate description using AI"}
+    await products.update_one({"_id": product_obj_id}, {"$set": {"ai_enhanced_description": new_description}})
+    return {"product_id": str(product_id), "success": True, "new_description": new_description}
+
+
+def create_description_app(products_collection=None, http=None, flask_app=None):
+    """ASGI app for product_description_generator; arguments override the defaults for tests."""
+    if flask_app is None:
+        from product_description_generator import app as flask_app
+        structured_logging.configure_logging("product_description_generator")
+
+    state = {"products": products_collection, "http": http}
+
+    @asynccontextmanager
+    async def lifespan(app):
+        owned = state["http"] is None
+        if state["products"] is None:
+            state["products"] = _motor_db()["products"]
+        if owned:
+            state["http"] = httpx.AsyncClient(timeout=HTTP_TIMEOUT)
+        try:
+            yield
+        finally:
+            if owned:
+                await state["http"].aclose()
+
+    async def generate_description(request):
+        try:
+            data = await _read_json(request) or {}
+            product_id = data.get("productId")
+            if not product_id:
+                return json_response({"error": "Product ID is required"}, 400)
+            product = await state["products"].find_one({"_id": ObjectId(product_id)})
+            if not product:
+                return json_response({"error": "Product not found"}, 404)
+            new_description = await generate_description_async(state["http"], product)
+            if not new_description:
+                return json_response({"error": "Failed to generate description"}, 500)
+            await state["products"].update_one(
+                {"_id": ObjectId(product_id)},
+                {"$set": {"ai_enhanced_description": new_description}},
+            )
+            return json_response({"success": True, "product_id": str(product_id),
+                                  "new_description": new_description})
+        except Exception as e:
+            logger.error(f"Error in generate_description endpoint: {str(e)}")
+            return json_response({"error": str(e)}, 500)
+
+    async def batch_generate_descriptions(request):
+        try:
+            data = await _read_json(request) or {}
+            product_ids = data.get("productIds", [])
+            if not product_ids:
+                return json_response({"error": "Product IDs are required"}, 400)
+            limit = asyncio.Semaphore(DESCRIPTION_CONCURRENCY)
+
+            async def one(product_id):
+                async with limit:
+                    return await describe_product(state["products"], state["http"], product_id)
+
+            # gather keeps the request's order in the results.
+            results = await asyncio.gather(*(one(pid) for pid in product_ids))
+            return json_response({"success": True, "results": list(results)})
+        except Exception as e:
+            logger.error(f"Error in batch_generate_descriptions endpoint: {str(e)}")
+            return json_response({"error": str(e)}, 500)
+
+    return Starlette(
+        routes=[
+            Route("/generate-description", generate_description, methods=["POST", "OPTIONS"],
+                  middleware=_cors()),
+            Route("/batch-generate-descriptions", batch_generate_descriptions, methods=["POST", "OPTIONS"],
+                  middleware=_cors()),
+            Mount("/", app=WSGIMiddleware(flask_app, workers=WSGI_WORKERS)),
+        ],
+        middleware=[Middleware(RequestMetrics, service="product_description_generator",
+                               paths=["/generate-description", "/batch-generate-descriptions"])],
+        lifespan=lifespan,
+    )
+
+
+# --- main app ------------------------------------------------------------
+
+async def users_response_async(collection, request, default_fields, missing=None):
+    """``user_listing.users_response()`` over a motor collection."""
+    try:
+        listing = parse_listing_args(request.query_params, request.headers, default_fields)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    if listing.stream:
+        async def lines():
+            cursor = user_cursor(collection, listing.after, listing.fields, listing.limit).batch_size(500)
+            async for user in cursor:
+                yield dumps_bytes(format_user(user, listing.fields, missing)) + b"\n"
+
+        return StreamingResponse(lines(), media_type=NDJSON_MIMETYPE)
+    cursor = user_cursor(collection, listing.after, listing.fields, listing.limit + 1)
+    rows, next_cursor = split_page(await cursor.to_list(length=listing.limit + 1), listing, missing)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return json_response(rows, headers=headers)
+
+
+async def refresh_rates_forever(exchange_rates, http, interval=None):
+    """The event-loop version of ``ExchangeRateCache.start_background_refresh()``."""
+    interval = interval or exchange_rates.ttl / 2
+    while True:
+        if time.time() - exchange_rates.fetched_at >= interval:
+            await exchange_rates.fetch_async(http)
+        await asyncio.sleep(interval)
+
+
+def create_main_app(users_collection=None, http=None, warm=True):
+    """ASGI app for app.py; ``warm`` starts its warmup and refreshers in a background thread.
+
+    Only /api/users and the rate refresh are native; everything else is app.py
+    through a2wsgi.
+    """
+    import app as main
+
+    structured_logging.configure_logging("app")
+    state = {"users": users_collection, "http": http}
+
+    def start_background_refresh():
+        # Rates are refreshed on the event loop instead (refresh_rates_forever).
+        main.popularity.start_background_refresh()
+        main.sales_rollup.start_background_refresh()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        owned = state["http"] is None
+        if state["users"] is None:
+            state["users"] = _motor_db()["users"]
+        if owned:
+            state["http"] = httpx.AsyncClient(timeout=HTTP_TIMEOUT)
+        if warm:
+            # Warms up (and retries failed steps) in a thread; /ready answers 503 until done.
+            main.startup_report.start(main.WARMUP_STEPS, on_ready=start_background_refresh)
+        rates = asyncio.create_task(refresh_rates_forever(main.exchange_rates, state["http"]))
+        try:
+            yield
+        finally:
+            rates.cancel()
+            if owned:
+                await state["http"].aclose()
+
+    async def list_users(request):
+        try:
+            return await users_response_async(state["users"], request, main.APP_USER_FIELDS)
+        except Exception as e:
+            logger.exception("Error listing users")
+            return json_response({"error": str(e)}, 500)
+
+    return Starlette(
+        routes=[
+            Route("/api/users", list_users, methods=["GET", "OPTIONS"], middleware=_cors()),
+            Mount("/", app=WSGIMiddleware(main.app, workers=WSGI_WORKERS)),
+        ],
+        middleware=[Middleware(RequestMetrics, service="app", paths=["/api/users"])],
+        lifespan=lifespan,
+    )
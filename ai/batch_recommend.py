@@ -0,0 +1,72 @@
+"""
+Request parsing and scoring for ``/recommend/batch``.
+
+A batch is answered with one sparse matrix product per block of query rows
+(``batch_top_k``) instead of one ``/recommend`` round trip per product.
+``parse_batch_request`` validates the body the same way ``user_listing``
+validates a query string: a ValueError carries the client-facing message.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+# Upper bound on productIds per /recommend/batch call.
+MAX_BATCH_SIZE = 100
+
+DEFAULT_LIMIT = 6
+
+# Cap on the dense (batch x catalog) score block scored at once.
+BATCH_BLOCK_ELEMENTS = 8_000_000
+
+
+BatchRequest = namedtuple("BatchRequest", ["product_ids", "user_id", "limit"])
+
+
+def parse_batch_request(data):
+    """Validate a batch body; product ids come back as strings, deduplicated in order."""
+    if not isinstance(data, dict):
+        raise ValueError("Missing productIds")
+    product_ids = data.get("productIds")
+    if not product_ids or not isinstance(product_ids, list):
+        raise ValueError("Missing productIds")
+    if len(product_ids) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} productIds per request")
+
+    limit = data.get("limit", DEFAULT_LIMIT)
+    # JSON true/false and 2.5 would otherwise pass through int().
+    if isinstance(limit, (bool, float)):
+        raise ValueError("limit must be an integer")
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+
+    product_ids = list(dict.fromkeys(str(pid) for pid in product_ids))
+    return BatchRequest(product_ids, data.get("userId"), limit)
+
+
+def batch_top_k(matrix, rows, k, bias=None, block_elements=BATCH_BLOCK_ELEMENTS):
+    """Top-``k`` neighbour rows for many query rows with one sparse matrix product per block.
+
+    ``bias`` is an optional per-product score added to every query row (the
+    collaborative part); each query's own row is always excluded.
+    """
+    n = matrix.shape[0]
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.zeros((len(rows), 0), dtype=np.intp)
+    matrix_t = matrix.T.tocsc()
+    block = max(1, block_elements // max(n, 1))
+    results = []
+    for start in range(0, len(rows), block):
+        block_rows = rows[start:start + block]
+        scores = (matrix[block_rows] @ matrix_t).toarray()
+        if bias is not None:
+            scores = 0.7 * scores + 0.3 * bias
+        scores[np.arange(len(block_rows)), block_rows] = -np.inf
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable")
+        results.append(np.take_along_axis(top, order, axis=1))
+    return np.vstack(results)
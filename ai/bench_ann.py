@@ -0,0 +1,119 @@
+"""
+Recall/latency benchmark for the nearest-neighbour engines in ann_index.py.
+
+Builds a synthetic product corpus (or uses the live catalog with --mongo),
+runs the same queries through ExactSearch and a grid of LSHSearch settings,
+and reports recall@K against the exact results plus per-query latency.
+
+    python bench_ann.py --products 200000 --queries 200 --k 10
+    python bench_ann.py --mongo --json results.json
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from ann_index import ExactSearch, LSHSearch
+
+LSH_GRID = [
+    {"n_tables": 4, "n_bits": 14, "n_probes": 1},
+    {"n_tables": 8, "n_bits": 12, "n_probes": 1},
+    {"n_tables": 8, "n_bits": 12, "n_probes": 4},
+    {"n_tables": 16, "n_bits": 12, "n_probes": 4},
+    {"n_tables": 16, "n_bits": 10, "n_probes": 8},
+    {"n_tables": 32, "n_bits": 10, "n_probes": 8},
+]
+
+
+def synthetic_descriptions(n_products, vocabulary=20000, words=24, seed=0):
+    """Topic-clustered descriptions so that true neighbours exist."""
+    rng = np.random.default_rng(seed)
+    topics = max(n_products // 100, 1)
+    topic_terms = rng.integers(0, vocabulary, size=(topics, 40))
+    topic_of = rng.integers(0, topics, size=n_products)
+    descriptions = []
+    for topic in topic_of:
+        on_topic = rng.choice(topic_terms[topic], size=words * 3 // 4)
+        background = rng.zipf(1.3, size=words - len(on_topic)) % vocabulary
+        descriptions.append(" ".join(f"w{t}" for t in np.concatenate([on_topic, background])))
+    return descriptions
+
+
+def mongo_descriptions():
+    import os
+
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+    products = MongoClient(os.getenv("MONGODB_URI", ""))["test"]["products"]
+    return [p.get("description") or "" for p in products.find({}, {"description": 1})]
+
+
+def run_queries(engine, matrix, query_rows, k):
+    results, latencies = [], []
+    for row in query_rows:
+        started = time.perf_counter()
+        rows, _ = engine.search(matrix[row], k, exclude=row)
+        latencies.append(time.perf_counter() - started)
+        results.append(set(rows.tolist()))
+    return results, np.array(latencies) * 1000
+
+
+def summarize(name, params, build_s, latencies_ms, recall):
+    return {
+        "engine": name,
+        "params": params,
+        "build_s": round(build_s, 3),
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "recall_at_k": round(recall, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--mongo", action="store_true", help="use the live products collection")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    descriptions = mongo_descriptions() if args.mongo else synthetic_descriptions(args.products)
+    matrix = TfidfVectorizer().fit_transform(descriptions).tocsr()
+    rng = np.random.default_rng(1)
+    query_rows = rng.choice(matrix.shape[0], size=min(args.queries, matrix.shape[0]), replace=False)
+    print(f"Catalog: {matrix.shape[0]} products, {matrix.shape[1]} terms, "
+          f"{len(query_rows)} queries, k={args.k}")
+
+    started = time.perf_counter()
+    exact = ExactSearch(matrix)
+    exact_build = time.perf_counter() - started
+    truth, latencies = run_queries(exact, matrix, query_rows, args.k)
+    results = [summarize("exact", {}, exact_build, latencies, 1.0)]
+
+    for params in LSH_GRID:
+        started = time.perf_counter()
+        engine = LSHSearch(matrix, **params)
+        build = time.perf_counter() - started
+        found, latencies = run_queries(engine, matrix, query_rows, args.k)
+        recall = np.mean([len(f & t) / max(len(t), 1) for f, t in zip(found, truth)])
+        results.append(summarize("lsh", params, build, latencies, float(recall)))
+
+    print(f"{'engine':<8}{'params':<44}{'build s':>9}{'mean ms':>9}{'p99 ms':>9}{'recall':>8}")
+    for r in results:
+        params = ", ".join(f"{k}={v}" for k, v in r["params"].items())
+        print(f"{r['engine']:<8}{params:<44}{r['build_s']:>9.2f}{r['mean_ms']:>9.2f}"
+              f"{r['p99_ms']:>9.2f}{r['recall_at_k']:>8.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"k": args.k, "products": matrix.shape[0], "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Requests/sec and p99 latency of the description service, sync Flask vs ASGI.
+
+Both servers get the same number of worker processes (so roughly the same
+memory; the peak RSS of each server's process tree is reported next to the
+throughput) and talk to the same Mongo and to a local stand-in for Gemini
+that answers after ``--upstream-latency`` seconds:
+
+    sync   gunicorn -w W --threads T product_description_generator:app
+    async  uvicorn --factory async_service:create_description_app --workers W
+
+Only the description service is measured: it is the one whose routes are
+mostly native (see async_service.py). The main app only moves /api/users
+and the rate refresh onto the loop, so it has no comparable pair to time.
+
+MONGODB_URI must point at a scratch database: ``--products`` tagged products
+are inserted into its ``test.products`` collection and removed afterwards.
+
+    MONGODB_URI=mongodb://localhost:27017 python bench_async.py --concurrency 64 --duration 20
+
+Last run (64 clients, 2 workers, 20 s per server). The host had one CPU core
+shared by the load generator, both servers and the stubs. No mongod was
+available, so Mongo was a wire-protocol stand-in (mockupdb answering from
+mongomock):
+
+    upstream  server              req/s   p50 ms   p99 ms  peak RSS MB
+    200 ms    sync, 4 threads      31.7     1200     3832          114
+    200 ms    sync, 32 threads     49.6      653     5679          118
+    200 ms    async                50.2      434     5916          164
+    1 s       sync, 4 threads       6.5     5266    13431          114
+    1 s       sync, 32 threads     52.9     1105     2430          118
+    1 s       async                54.7     1079     2320          164
+
+Async beats gunicorn with its default thread count. A gunicorn with as many
+threads as clients keeps up with it, on about 70% of the memory, because the
+single core is the limit by then. Re-run against a real mongod on a
+multi-core host before choosing one mode over the other.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import numpy as np
+from pymongo import MongoClient
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def start_gemini_stub(port, latency):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency)
+            body = json.dumps({"candidates": [{"content": {"parts": [{"text": "Benchmark copy"}]}}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer.daemon_threads = True
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def tree_rss_kb(pid):
+    """Resident memory of ``pid`` and all of its descendants (Linux /proc)."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/status") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        except (OSError, StopIteration):
+            pass
+    return total
+
+
+def server_command(mode, port, workers, threads):
+    if mode == "sync":
+        return [sys.executable, "-m", "gunicorn", "-w", str(workers), "--threads", str(threads),
+                "-b", f"127.0.0.1:{port}", "product_description_generator:app"]
+    return [sys.executable, "-m", "uvicorn", "--factory", "async_service:create_description_app",
+            "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+
+
+async def wait_until_up(url, timeout=30):
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.time() < deadline:
+            try:
+                if (await client.get(f"{url}/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not come up")
+
+
+async def run_load(url, product_ids, concurrency, duration, sample_rss):
+    latencies, errors, peak_rss = [], 0, 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(f"{url}/generate-description",
+                                                 json={"productId": random.choice(product_ids)})
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        async def sampler():
+            nonlocal peak_rss
+            while time.perf_counter() < deadline:
+                peak_rss = max(peak_rss, sample_rss())
+                await asyncio.sleep(0.5)
+
+        started = time.perf_counter()
+        await asyncio.gather(sampler(), *(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed, peak_rss
+
+
+def bench(mode, args, product_ids, gemini_url):
+    env = dict(os.environ, GEMINI_API_URL=gemini_url)
+    port = args.port + (0 if mode == "sync" else 1)
+    url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(server_command(mode, port, args.workers, args.threads), cwd=HERE, env=env)
+    try:
+        asyncio.run(wait_until_up(url))
+        latencies, errors, elapsed, peak_rss = asyncio.run(
+            run_load(url, product_ids, args.concurrency, args.duration, lambda: tree_rss_kb(server.pid)))
+    finally:
+        server.terminate()
+        server.wait()
+    latencies = np.array(latencies) * 1000
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+        "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+        "peak_rss_mb": peak_rss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=64, help="simultaneous clients")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of load per server")
+    parser.add_argument("--workers", type=int, default=2, help="worker processes for both servers")
+    parser.add_argument("--threads", type=int, default=4, help="threads per gunicorn worker")
+    parser.add_argument("--upstream-latency", type=float, default=0.2, help="seconds the Gemini stand-in takes")
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--port", type=int, default=5600, help="sync server port; async uses port + 1")
+    parser.add_argument("--modes", default="sync,async")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    if not os.getenv("MONGODB_URI"):
+        parser.error("MONGODB_URI must point at a scratch MongoDB")
+    products = MongoClient(os.getenv("MONGODB_URI"))["test"]["products"]
+    inserted = products.insert_many([
+        {"name": f"Bench product {i}", "category": "Benchmark", "description": "Plain copy",
+         "price": 10 + i, "benchmark": True}
+        for i in range(args.products)
+    ]).inserted_ids
+    product_ids = [str(pid) for pid in inserted]
+
+    stub = start_gemini_stub(args.port + 2, args.upstream_latency)
+    gemini_url = f"http://127.0.0.1:{args.port + 2}/generate"
+    try:
+        results = [bench(mode, args, product_ids, gemini_url) for mode in args.modes.split(",")]
+    finally:
+        stub.shutdown()
+        products.delete_many({"_id": {"$in": inserted}})
+
+    print(f"{args.concurrency} clients, {args.workers} workers, upstream {args.upstream_latency * 1000:.0f} ms")
+    print(f"{'mode':<8}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}{'peak RSS MB':>13}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['rps']:>9.1f}{r['p50_ms'] or 0:>9.1f}{r['p99_ms'] or 0:>9.1f}"
+              f"{r['errors']:>8}{r['peak_rss_mb']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
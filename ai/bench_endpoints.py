@@ -0,0 +1,263 @@
+"""
+Throughput and latency percentiles of the hot endpoints on synthetic data.
+
+The services run in-process (Flask test clients, no sockets) against
+synthetic_data.py's users, products and orders. By default everything is
+loaded into one in-memory mongomock that every service's ``MongoClient``
+resolves to; ``--mongo-uri`` points them all at a real (scratch!) mongod
+instead, which also reports Mongo queries per request.
+
+    python bench_endpoints.py --scale 10k --requests 300 --output results/HEAD.json
+    python bench_endpoints.py --compare results/base.json results/HEAD.json --tolerance 0.2
+
+Results are JSON with the git commit they were taken at; ``--compare``
+prints the per-endpoint change and exits 1 when a p50 or p99 got more than
+``--tolerance`` slower, so two commits can be compared in CI. mongomock
+answers much slower than mongod and scales worse, so only compare runs
+taken with the same backend and scale; use a real mongod from 100k up.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+from synthetic_data import SCALES, SyntheticData, load
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+CHAT_MESSAGES = [
+    "hello", "where is my order", "how long does shipping take", "can I return this",
+    "thanks", "what can you do", "do you have wireless headphones",
+]
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=HERE, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=HERE,
+                                    capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def start_services(client):
+    """Import the services with every ``MongoClient`` resolving to ``client``."""
+    import pymongo
+
+    scratch = tempfile.mkdtemp(prefix="bench_endpoints_")
+    # No trained artefacts or network: the services fall back to their live paths.
+    os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+    os.environ["NEIGHBOR_TABLE_PATH"] = os.path.join(scratch, "neighbors.npz")
+    os.environ["ALS_MODEL_DIR"] = os.path.join(scratch, "als")
+    os.environ["EXCHANGE_RATE_URL"] = "http://127.0.0.1:9/rates"
+    os.environ["EXCHANGE_RATE_SNAPSHOT"] = os.path.join(scratch, "rates.json")
+    pymongo.MongoClient = lambda *args, **kwargs: client
+
+    import app as main
+    import chatbot_engine
+    import predictive_analytics
+    import recommendation_model
+
+    # The chatbot reads the "fyp" database; the others read "test".
+    chatbot_engine.orders_collection = client["test"]["orders"]
+    chatbot_engine.products_collection = client["test"]["products"]
+    main.exchange_rates._set({"USD": 1.0, "PKR": 278.0, "EUR": 0.92, "GBP": 0.79}, time.time())
+    for service in (main, recommendation_model):
+        if not service.warm_up():
+            raise RuntimeError(f"Warmup failed: {service.startup_report.as_dict()}")
+    return {
+        "main": main.app.test_client(),
+        "recommendation": recommendation_model.app.test_client(),
+        "analytics": predictive_analytics.app.test_client(),
+        "chatbot": chatbot_engine.app.test_client(),
+    }
+
+
+def endpoint_requests(db, rng, count):
+    """``{name: [(service, method, path, json)]}`` with ids drawn from the loaded data."""
+    product_ids = [str(p["_id"]) for p in db.products.find({}, {"_id": 1}).limit(5000)]
+    seller_ids = [str(s) for s in db.products.distinct("seller")]
+    orders = list(db.orders.find({}, {"user": 1, "orderItems.product": 1}).limit(5000))
+    order_ids = [str(o["_id"]) for o in orders]
+    by_user = {}
+    for order in orders:
+        by_user.setdefault(str(order["user"]), []).append(
+            {"orderItems": [{"product": str(item["product"])} for item in order["orderItems"]]})
+    buyers = list(by_user)
+
+    def pick(values):
+        return values[int(rng.integers(0, len(values)))]
+
+    def personalized():
+        user_id = pick(buyers)
+        return ("main", "POST", "/get-personalized-recommendations",
+                {"userId": user_id, "orderHistory": by_user[user_id][-10:], "currency": pick(["USD", "PKR", "EUR"])})
+
+    def chat():
+        message = pick(CHAT_MESSAGES)
+        return ("chatbot", "POST", "/chat", {"message": message, "context": {"order_id": pick(order_ids)}})
+
+    makers = {
+        "recommend": lambda: ("recommendation", "POST", "/recommend",
+                              {"productId": pick(product_ids), "userId": pick(buyers)}),
+        "personalized": personalized,
+        "predict": lambda: ("main", "POST", "/predict", {"userId": pick(buyers)}),
+        "analytics_predict": lambda: ("analytics", "POST", "/predict", {"userId": pick(buyers)}),
+        "seller_analytics": lambda: ("analytics", "GET", f"/analytics/seller/{pick(seller_ids)}", None),
+        "api_analytics": lambda: ("main", "GET", f"/api/analytics?timeRange={pick(['week', 'month', 'year'])}",
+                                  None),
+        "chat": chat,
+    }
+    return {name: [make() for _ in range(count)] for name, make in makers.items()}
+
+
+def run_endpoint(clients, requests, warmup, concurrency, count_queries):
+    from query_profiler import profile_queries
+
+    def call(spec):
+        service, method, path, body = spec
+        with profile_queries() as profile:
+            started = time.perf_counter()
+            response = clients[service].open(path, method=method, json=body)
+            elapsed = time.perf_counter() - started
+        return elapsed, response.status_code, profile.count
+
+    for spec in requests[:warmup]:
+        call(spec)
+    requests = requests[warmup:]
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(call, requests))
+    else:
+        results = [call(spec) for spec in requests]
+    wall = time.perf_counter() - started
+
+    latencies = np.array([r[0] for r in results]) * 1000
+    statuses = {}
+    for _, status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "requests": len(results),
+        "rps": round(len(results) / wall, 2),
+        "mean_ms": round(float(latencies.mean()), 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p90_ms": round(float(np.percentile(latencies, 90)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "max_ms": round(float(latencies.max()), 3),
+        "errors": sum(1 for r in results if r[1] >= 500),
+        "statuses": statuses,
+        "mongo_queries_mean": round(float(np.mean([r[2] for r in results])), 2) if count_queries else None,
+    }
+
+
+def compare(old_path, new_path, tolerance):
+    """Print the change per endpoint; returns the endpoints that regressed."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    for key in ("scale", "mongo"):
+        if old["meta"].get(key) != new["meta"].get(key):
+            print(f"warning: {key} differs ({old['meta'].get(key)} vs {new['meta'].get(key)})")
+    print(f"{(old['meta'].get('commit') or '?')[:10]} -> {(new['meta'].get('commit') or '?')[:10]}")
+    print(f"{'endpoint':<20}{'p50 ms':>18}{'p99 ms':>18}{'req/s':>18}")
+    regressed = []
+    for name, after in new["endpoints"].items():
+        before = old["endpoints"].get(name)
+        if before is None:
+            print(f"{name:<20}{'(new)':>18}")
+            continue
+        cells = []
+        for metric in ("p50_ms", "p99_ms", "rps"):
+            change = after[metric] / before[metric] - 1 if before[metric] else 0.0
+            cells.append(f"{after[metric]:.1f} ({change:+.0%})")
+            if metric != "rps" and change > tolerance:
+                regressed.append(name)
+        print(f"{name:<20}" + "".join(f"{cell:>18}" for cell in cells))
+    regressed = sorted(set(regressed))
+    if regressed:
+        print(f"Slower than {tolerance:.0%}: {', '.join(regressed)}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", choices=SCALES, default="1k", help="orders to generate")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests per endpoint first")
+    parser.add_argument("--concurrency", type=int, default=1, help="threads issuing requests")
+    parser.add_argument("--endpoints", help="comma-separated subset of the endpoints")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo-uri", help="real mongod to use instead of mongomock (its test db is replaced)")
+    parser.add_argument("--no-load", action="store_true", help="use the data already in --mongo-uri")
+    parser.add_argument("--output", help="write the results as JSON here")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown for --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.tolerance) else 0)
+
+    # The services log every request; keep the table readable.
+    logging.basicConfig(level=logging.WARNING)
+    logging.disable(logging.INFO)
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        client = MongoClient(args.mongo_uri)
+    else:
+        import mongomock
+        client = mongomock.MongoClient()
+
+    db = client["test"]
+    data = SyntheticData(SCALES[args.scale], seed=args.seed)
+    started = time.perf_counter()
+    counts = {name: db[name].estimated_document_count() for name in ("users", "products", "orders")} \
+        if args.no_load else load(db, data)
+    print(f"{args.scale}: {counts} ready in {time.perf_counter() - started:.1f}s")
+
+    clients = start_services(client)
+    rng = np.random.default_rng(args.seed)
+    plan = endpoint_requests(db, rng, args.warmup + args.requests)
+    if args.endpoints:
+        plan = {name: plan[name] for name in args.endpoints.split(",")}
+
+    commit, dirty = git_commit()
+    results = {
+        "meta": {
+            "commit": commit, "dirty": dirty,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(), "scale": args.scale, "counts": counts,
+            "mongo": "mongodb" if args.mongo_uri else "mongomock",
+            "requests": args.requests, "concurrency": args.concurrency, "seed": args.seed,
+        },
+        "endpoints": {},
+    }
+    print(f"{'endpoint':<20}{'req/s':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'errors':>8}{'queries':>9}")
+    for name, requests in plan.items():
+        stats = run_endpoint(clients, requests, args.warmup, args.concurrency, bool(args.mongo_uri))
+        results["endpoints"][name] = stats
+        queries = "-" if stats["mongo_queries_mean"] is None else f"{stats['mongo_queries_mean']:.1f}"
+        print(f"{name:<20}{stats['rps']:>9.1f}{stats['p50_ms']:>9.1f}{stats['p90_ms']:>9.1f}"
+              f"{stats['p99_ms']:>9.1f}{stats['errors']:>8}{queries:>9}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
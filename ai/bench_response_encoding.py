@@ -0,0 +1,106 @@
+"""
+Bytes and microseconds per recommendation payload, old vs new encoding path.
+
+The old path fetched whole product documents (embedded reviews included),
+walked them with ``serialize_objectids`` and encoded with the stdlib ``json``
+module. The new path fetches ``PRODUCT_CARD_PROJECTION`` fields only and
+encodes with ``response_encoding.dumps_bytes`` (orjson when installed).
+
+    python bench_response_encoding.py --items 8 --reviews 20 --rounds 2000
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from bson import ObjectId
+
+from response_encoding import PRODUCT_CARD_PROJECTION, dumps_bytes, orjson
+
+
+def serialize_objectids(data):
+    """The recursive walk recommendation_model.py used before the JSON provider."""
+    if isinstance(data, dict):
+        return {key: serialize_objectids(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [serialize_objectids(element) for element in data]
+    if isinstance(data, ObjectId):
+        return str(data)
+    return data
+
+
+def synthetic_product(rng, reviews):
+    created = datetime(2024, 1, 1) + timedelta(minutes=int(rng.integers(0, 500000)))
+    return {
+        "_id": ObjectId(),
+        "user": ObjectId(),
+        "name": f"Product {rng.integers(1e6)}",
+        "image": "/uploads/image-1700000000000.jpg",
+        "brand": "Brand",
+        "quantity": int(rng.integers(1, 50)),
+        "category": ObjectId(),
+        "description": " ".join(f"word{w}" for w in rng.integers(0, 5000, size=40)),
+        "reviews": [
+            {
+                "_id": ObjectId(),
+                "name": "Reviewer",
+                "rating": int(rng.integers(1, 6)),
+                "comment": " ".join(f"c{w}" for w in rng.integers(0, 5000, size=25)),
+                "user": ObjectId(),
+                "createdAt": created,
+                "updatedAt": created,
+            }
+            for _ in range(reviews)
+        ],
+        "rating": float(rng.integers(10, 50)) / 10,
+        "numReviews": reviews,
+        "price": float(rng.integers(100, 100000)) / 100,
+        "countInStock": int(rng.integers(0, 100)),
+        "createdAt": created,
+        "updatedAt": created,
+    }
+
+
+def project(product):
+    return {key: product[key] for key in ("_id", *PRODUCT_CARD_PROJECTION) if key in product}
+
+
+def old_encode(products):
+    # Flask's default provider: stdlib json with a datetime-aware default.
+    return json.dumps(serialize_objectids(products), default=str).encode()
+
+
+def measure(encode, payload, rounds):
+    encode(payload)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        body = encode(payload)
+    return len(body), (time.perf_counter() - started) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=8, help="products per payload")
+    parser.add_argument("--reviews", type=int, default=20, help="embedded reviews per product")
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    full = [synthetic_product(rng, args.reviews) for _ in range(args.items)]
+    projected = [project(p) for p in full]
+
+    rows = [
+        ("full docs, serialize_objectids + json", old_encode, full),
+        ("projection, serialize_objectids + json", old_encode, projected),
+        (f"projection, {'orjson' if orjson else 'json'} provider", dumps_bytes, projected),
+    ]
+    print(f"{args.items} products/payload, {args.reviews} reviews/product, {args.rounds} rounds")
+    print(f"{'path':<44}{'bytes':>9}{'us/payload':>12}")
+    for label, encode, payload in rows:
+        size, micros = measure(encode, payload, args.rounds)
+        print(f"{label:<44}{size:>9}{micros:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Milliseconds per /predict for a user with many orders, old vs single-pass path.
+
+The old path is predictive_analytics.py as it was before order_history.py.
+It looked the user up, fetched full order documents twice, and counted
+payment methods with ``list(...).count()`` inside ``max()``. The new path is
+``predictive_analytics.predict_next_purchase`` as it stands: one projected
+fetch, read once into ``OrderHistory``. Both read the same synthetic orders
+from an in-memory mongomock, so the "fetch" column includes decoding full
+documents versus projected ones. The "compute" rows time the feature code
+alone, on documents that are already in memory.
+
+    python bench_user_features.py --orders 10000 50000 --rounds 5
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+import mongomock
+from bson import ObjectId
+
+from order_history import ORDER_HISTORY_PROJECTION, OrderHistory
+from synthetic_data import SyntheticData
+
+
+def old_get_user_features(users_collection, orders_collection, user_id):
+    user = users_collection.find_one({"_id": ObjectId(user_id)})
+    if not user:
+        return None
+    orders = list(orders_collection.find({"user": ObjectId(user_id)}))
+    return old_features(orders)
+
+
+def old_features(orders):
+    return {
+        'total_orders': len(orders),
+        'total_spent': sum(order.get('totalPrice', 0) for order in orders),
+        'avg_order_value': sum(order.get('totalPrice', 0) for order in orders) / len(orders) if orders else 0,
+        'days_since_last_order': (datetime.now() - orders[-1]['createdAt']).days if orders else 365,
+        'unique_categories': len(set(item.get('category') for order in orders for item in order.get('orderItems', []))),
+        'preferred_payment_method': max(set(order.get('paymentMethod') for order in orders), key=lambda x: list(order.get('paymentMethod') for order in orders).count(x)) if orders else None
+    }
+
+
+def old_prediction(orders):
+    order_dates = [order['createdAt'] for order in orders]
+    order_dates.sort()
+    time_diffs = [(order_dates[i] - order_dates[i-1]).days for i in range(1, len(order_dates))]
+    avg_purchase_frequency = sum(time_diffs) / len(time_diffs) if time_diffs else 30
+    predicted_next_purchase = order_dates[-1] + timedelta(days=avg_purchase_frequency)
+    category_counts = {}
+    for order in orders:
+        for item in order.get('orderItems', []):
+            category = item.get('category')
+            if category:
+                category_counts[category] = category_counts.get(category, 0) + 1
+    predicted_category = max(category_counts.items(), key=lambda x: x[1])[0] if category_counts else None
+    return {
+        'predicted_next_purchase_date': predicted_next_purchase.isoformat(),
+        'predicted_category': predicted_category,
+        'confidence_score': 0.8 if len(orders) > 5 else 0.6,
+        'purchase_history': [{'date': order['createdAt'].isoformat(), 'total': order.get('totalPrice', 0)}
+                             for order in orders],
+    }
+
+
+def old_predict_next_purchase(users_collection, orders_collection, user_id):
+    features = old_get_user_features(users_collection, orders_collection, user_id)
+    if not features:
+        return None
+    orders = list(orders_collection.find({"user": ObjectId(user_id)}))
+    return old_prediction(orders) if orders else None
+
+
+def new_compute(orders):
+    history = OrderHistory(orders)
+    history.features()
+    return history.predicted_next_purchase(), history.top_category(), history.purchase_history()
+
+
+def best_ms(fn, rounds):
+    fn()
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, nargs="+", default=[10_000, 50_000], help="orders of the one user")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    # predictive_analytics connects at import; its collections are replaced below.
+    os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+    import predictive_analytics
+
+    print(f"{'orders':>8}{'path':>18}{'old ms':>11}{'new ms':>11}{'speedup':>9}")
+    for n in args.orders:
+        db = mongomock.MongoClient().db
+        data = SyntheticData(n, users=1)
+        for batch in data.users():
+            db.users.insert_many(batch)
+        for batch in data.orders():
+            db.orders.insert_many(batch)
+        user_id = str(data.user_ids[0])
+        predictive_analytics.users_collection = db.users
+        predictive_analytics.orders_collection = db.orders
+
+        full = list(db.orders.find({"user": data.user_ids[0]}))
+        projected = list(db.orders.find({"user": data.user_ids[0]}, ORDER_HISTORY_PROJECTION))
+        rows = [
+            ("compute", lambda: (old_features(full), old_prediction(full)), lambda: new_compute(projected)),
+            ("fetch + compute", lambda: old_predict_next_purchase(db.users, db.orders, user_id),
+             lambda: predictive_analytics.predict_next_purchase(user_id)),
+        ]
+        for name, old, new in rows:
+            old_ms, new_ms = best_ms(old, args.rounds), best_ms(new, args.rounds)
+            print(f"{n:>8}{name:>18}{old_ms:>11.1f}{new_ms:>11.1f}{old_ms / new_ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
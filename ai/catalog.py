@@ -0,0 +1,250 @@
+"""
+Columnar in-memory snapshot of the product catalog.
+
+The recommendation helpers filter products by category, price band, rating and
+review count. Holding those fields as NumPy columns lets the filters run as
+vectorised masks, and the pre-serialised product records (without the embedded
+reviews) are returned straight from memory instead of another Mongo query.
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+# Everything the responses use; the embedded reviews never leave Mongo.
+CATALOG_PROJECTION = {"reviews": 0}
+
+# Currencies the frontend offers (currencySlice / Navigation); catalog prices are in USD.
+SUPPORTED_CURRENCIES = ("PKR", "USD", "EUR", "GBP", "AUD")
+BASE_CURRENCY = "USD"
+
+
+class CatalogSnapshot:
+    """Immutable view of the catalog: NumPy columns plus an id -> row map."""
+
+    def __init__(self, products):
+        self.records = [_serialize(p) for p in products]
+        self.product_ids = [p["_id"] for p in self.records]
+        self.row_of = {pid: row for row, pid in enumerate(self.product_ids)}
+        self.loaded_at = time.time()
+
+        self.price = np.array([_number(p.get("price")) for p in products], dtype=np.float64)
+        self.rating = np.array([_number(p.get("rating")) for p in products], dtype=np.float32)
+        self.num_reviews = np.array([_number(p.get("numReviews")) for p in products], dtype=np.int32)
+        self.count_in_stock = np.array([_number(p.get("countInStock")) for p in products], dtype=np.int32)
+
+        # Category codes index into self.categories; -1 means no category.
+        self.categories = []
+        self.category_code = {}
+        codes = np.empty(len(products), dtype=np.int32)
+        for row, product in enumerate(products):
+            category = product.get("category")
+            if category is None:
+                codes[row] = -1
+                continue
+            key = str(category)
+            if key not in self.category_code:
+                self.category_code[key] = len(self.categories)
+                self.categories.append(key)
+            codes[row] = self.category_code[key]
+        self.category_codes = codes
+        self._converted = None  # (rates dict, {currency: price column})
+
+        # Price index: rows sorted by (category, price), with each category's
+        # slice bounds, so a price band is two binary searches per category.
+        # Uncategorised products (-1) get a slice too, at offset 0: they are
+        # similar to each other, as the equality mask has always made them.
+        self._price_order = np.lexsort((self.price, codes)).astype(np.intp)
+        self._sorted_price = self.price[self._price_order]
+        sorted_codes = codes[self._price_order]
+        category_range = np.arange(-1, len(self.categories))
+        self._category_start = np.searchsorted(sorted_codes, category_range, side="left")
+        self._category_end = np.searchsorted(sorted_codes, category_range, side="right")
+
+    @classmethod
+    def load(cls, collection):
+        return cls(list(collection.find({}, CATALOG_PROJECTION)))
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def rows(self, product_ids):
+        """Rows of the given ids, skipping ids that are not in the catalog."""
+        return np.array(
+            [self.row_of[str(pid)] for pid in product_ids if str(pid) in self.row_of],
+            dtype=np.intp,
+        )
+
+    def codes_for(self, categories):
+        return np.array(
+            [self.category_code[str(c)] for c in categories if str(c) in self.category_code],
+            dtype=np.int32,
+        )
+
+    def category_mask(self, categories):
+        return np.isin(self.category_codes, self.codes_for(categories))
+
+    def price_mask(self, price_min, price_max):
+        return (self.price >= price_min) & (self.price <= price_max)
+
+    def popular_mask(self, min_rating=4.0, min_reviews=10):
+        return (self.rating >= min_rating) & (self.num_reviews >= min_reviews)
+
+    def in_stock_mask(self):
+        return self.count_in_stock > 0
+
+    def price_band_rows(self, codes, price_min, price_max, limit=None):
+        """Rows in any of the category ``codes`` priced within [price_min, price_max].
+
+        Uses the sorted per-category price index; rows come back in catalog
+        order, the same order ``top_rows()`` gives for the equivalent mask,
+        truncated to the first ``limit``.
+        """
+        parts = []
+        for code in set(np.asarray(codes).tolist()):
+            start, end = self._category_start[code + 1], self._category_end[code + 1]
+            prices = self._sorted_price[start:end]
+            low = start + np.searchsorted(prices, price_min, side="left")
+            high = start + np.searchsorted(prices, price_max, side="right")
+            parts.append(self._price_order[low:high])
+        if not parts:
+            return np.empty(0, dtype=np.intp)
+        rows = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        if limit is not None and len(rows) > limit:
+            rows = np.partition(rows, limit - 1)[:limit]
+        return np.sort(rows)
+
+    def similar_rows(self, row, limit=8, band=0.2):
+        """Like ``top_rows(similar_mask(row, band), limit)``, via the price index."""
+        price = self.price[row]
+        rows = self.price_band_rows(
+            self.category_codes[row:row + 1], price * (1 - band), price * (1 + band), limit + 1
+        )
+        return rows[rows != row][:limit]
+
+    def similar_mask(self, row, band=0.2):
+        """Same category as ``row`` and price within +/- ``band``, excluding ``row``."""
+        price = self.price[row]
+        mask = (self.category_codes == self.category_codes[row]) & self.price_mask(
+            price * (1 - band), price * (1 + band)
+        )
+        mask[row] = False
+        return mask
+
+    def top_rows(self, mask, limit, order_by=None):
+        """First ``limit`` matching rows, optionally by ``order_by`` descending."""
+        rows = np.flatnonzero(mask)
+        if order_by is not None:
+            rows = rows[np.argsort(-order_by[rows], kind="stable")]
+        return rows[:limit]
+
+    def history_rows(self, product_ids, limit=8, band=0.3):
+        """Rows to recommend for an order history, same rules as ``get_recommendations()``.
+
+        Products in the history's categories within +/- ``band`` of its average
+        price, topped up with popular products.
+        """
+        rows = self.rows(product_ids)
+        chosen = np.empty(0, dtype=np.intp)
+        if len(rows):
+            avg_price = self.price[rows].mean()
+            chosen = self.price_band_rows(
+                self.category_codes[rows], avg_price * (1 - band), avg_price * (1 + band), limit
+            )
+        if len(chosen) < limit:
+            popular = self.top_rows(self.popular_mask(), limit, order_by=self.rating)
+            popular = popular[~np.isin(popular, chosen)]
+            chosen = np.concatenate([chosen, popular[:limit - len(chosen)]])
+        return chosen
+
+    def price_columns(self, rates):
+        """``{currency: prices}`` for every supported currency ``rates`` can convert to.
+
+        ``rates`` maps currency codes to units per unit of a common base (the
+        exchange-rate feed's ``rates``). Columns are rounded to cents and
+        computed once per rates dict: a refreshed feed replaces the dict, which
+        triggers a single recomputation on the next call.
+        """
+        converted = self._converted
+        if converted is not None and converted[0] is rates:
+            return converted[1]
+        columns = {}
+        base_rate = rates.get(BASE_CURRENCY) if rates else None
+        if base_rate:
+            for currency in SUPPORTED_CURRENCIES:
+                if rates.get(currency):
+                    columns[currency] = np.round(self.price * (rates[currency] / base_rate), 2)
+        self._converted = (rates, columns)
+        return columns
+
+    def convert_prices(self, products, currency, rates):
+        """Prices of ``products`` in ``currency``, or None if ``rates`` cannot convert to it.
+
+        Catalog products are gathered from the converted column by row index;
+        products newer than the snapshot are converted one by one.
+        """
+        column = self.price_columns(rates).get(currency)
+        if column is None:
+            return None
+        rows = np.array(
+            [self.row_of.get(str(p.get("_id")), -1) for p in products], dtype=np.intp
+        )
+        known = rows >= 0
+        prices = np.zeros(len(rows), dtype=np.float64)
+        prices[known] = column[rows[known]]
+        if not known.all():
+            rate = rates[currency] / rates[BASE_CURRENCY]
+            for i in np.flatnonzero(~known):
+                prices[i] = round(_number(products[i].get("price")) * rate, 2)
+        return prices.tolist()
+
+    def get_records(self, rows):
+        """Product dicts for ``rows`` (shallow copies, safe for callers to modify)."""
+        return [dict(self.records[row]) for row in rows]
+
+
+class CatalogCache:
+    """Holds the current snapshot and reloads it once it is older than ``ttl`` seconds."""
+
+    def __init__(self, collection, ttl=300):
+        self.collection = collection
+        self.ttl = ttl
+        self.hits = 0    # served the current snapshot
+        self.misses = 0  # had to load one
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is None or time.time() - snapshot.loaded_at > self.ttl:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is None or time.time() - snapshot.loaded_at > self.ttl:
+                    self.misses += 1
+                    return self.reload()
+        self.hits += 1
+        return snapshot
+
+    def reload(self):
+        snapshot = CatalogSnapshot.load(self.collection)
+        self._snapshot = snapshot
+        logger.info("Catalog snapshot loaded: %d products", len(snapshot))
+        return snapshot
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+
+
+def _serialize(value):
+    if isinstance(value, dict):
+        return {key: _serialize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_serialize(item) for item in value]
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
@@ -1,5 +1,9 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from response_encoding import install_json_provider
+from metrics import install_metrics
+from query_profiler import install_query_profiler
+from startup import StartupReport, install_startup
 from pymongo import MongoClient
 from bson import ObjectId
 import re
@@ -10,6 +14,9 @@ import random
 
 app = Flask(__name__)
 CORS(app)
+install_json_provider(app)
+install_metrics(app, "chatbot_engine")
+install_query_profiler(app)
 
 # MongoDB connection
 client = MongoClient("")
@@ -184,5 +191,11 @@ def health():
         "message": "Chatbot service is running"
     }), 200
 
+# Logging for every process serving ``app``: called by gunicorn.conf.py in
+# each worker, and by __main__ below.
+startup_report = StartupReport("chatbot_engine")
+start = install_startup(app, startup_report)
+
 if __name__ == '__main__':
+    start(wait=True)
     app.run(host='0.0.0.0', port=5003)
@@ -0,0 +1,172 @@
+"""
+Item-item co-purchase matrix built from ``orders.orderItems``.
+
+Entry ``(i, j)`` counts the orders that contained both product ``i`` and
+product ``j``. The matrix is built by streaming the orders collection once and
+then grows incrementally from orders newer than the last one it has seen, so a
+user's history can be scored against everything other customers bought with a
+single sparse dot product.
+"""
+import logging
+import threading
+
+import numpy as np
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+ORDER_PROJECTION = {"orderItems.product": 1}
+
+
+class CoPurchaseMatrix:
+    """Symmetric CSR matrix of co-purchase counts with a product id -> column map."""
+
+    def __init__(self, orders_collection, batch_size=1000, flush_pairs=1_000_000):
+        self.orders_collection = orders_collection
+        self.batch_size = batch_size
+        self.flush_pairs = flush_pairs
+        self.product_ids = []
+        self.col_of = {}
+        self.matrix = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.last_order_id = None
+        self._lock = threading.Lock()
+        self._building = threading.Lock()  # so concurrent ensure_built() calls build once
+        self._stop = threading.Event()
+        self._thread = None
+        self.ready = False
+
+    def build(self):
+        """Stream every order and rebuild the matrix from scratch."""
+        with self._lock:
+            self.product_ids = []
+            self.col_of = {}
+            self.matrix = sparse.csr_matrix((0, 0), dtype=np.float32)
+            self.last_order_id = None
+            cursor = self.orders_collection.find({}, ORDER_PROJECTION).sort("_id", 1)
+            count = self._consume(cursor.batch_size(self.batch_size))
+            self.ready = True
+        logger.info("Co-purchase matrix built from %d orders: %d products, %d pairs",
+                    count, len(self.product_ids), self.matrix.nnz)
+        return count
+
+    def ensure_built(self):
+        if not self.ready:
+            with self._building:
+                if not self.ready:
+                    self.build()
+
+    def refresh(self):
+        """Fold in orders created since the last build or refresh."""
+        if not self.ready:
+            return self.build()
+        query = {"_id": {"$gt": self.last_order_id}} if self.last_order_id is not None else {}
+        with self._lock:
+            cursor = self.orders_collection.find(query, ORDER_PROJECTION).sort("_id", 1)
+            return self._consume(cursor.batch_size(self.batch_size))
+
+    def add_orders(self, orders):
+        """Fold in order documents pushed by a caller (e.g. an order-created hook)."""
+        with self._lock:
+            return self._consume(orders)
+
+    def _consume(self, orders):
+        rows, cols = [], []
+        pending = []
+        count = pairs = 0
+        for order in orders:
+            count += 1
+            if self.last_order_id is None or order["_id"] > self.last_order_id:
+                self.last_order_id = order["_id"]
+            items = {
+                self._column(str(item["product"]))
+                for item in order.get("orderItems", [])
+                if item.get("product") is not None
+            }
+            if len(items) < 2:
+                continue
+            items = np.fromiter(items, dtype=np.int32, count=len(items))
+            a, b = np.meshgrid(items, items)
+            off_diagonal = a != b
+            rows.append(a[off_diagonal])
+            cols.append(b[off_diagonal])
+            pairs += len(rows[-1])
+            if pairs >= self.flush_pairs:
+                pending.append(self._pairs_to_matrix(rows, cols))
+                rows, cols = [], []
+                pairs = 0
+        if rows:
+            pending.append(self._pairs_to_matrix(rows, cols))
+
+        n = len(self.product_ids)
+        matrix = _resize(self.matrix, n)
+        for delta in pending:
+            matrix = matrix + _resize(delta, n)
+        self.matrix = matrix.tocsr()
+        return count
+
+    def _column(self, product_id):
+        col = self.col_of.get(product_id)
+        if col is None:
+            col = self.col_of[product_id] = len(self.product_ids)
+            self.product_ids.append(product_id)
+        return col
+
+    def _pairs_to_matrix(self, rows, cols):
+        rows = np.concatenate(rows)
+        cols = np.concatenate(cols)
+        n = len(self.product_ids)
+        data = np.ones(len(rows), dtype=np.float32)
+        # COO -> CSR sums the duplicate (row, col) pairs into counts.
+        return sparse.coo_matrix((data, (rows, cols)), shape=(n, n)).tocsr()
+
+    def score(self, weights):
+        """Score products against a ``{product_id: weight}`` history.
+
+        Returns ``{product_id: score}`` for every product co-purchased with the
+        history, computed as one sparse vector-matrix product.
+        """
+        matrix, col_of, product_ids = self.matrix, self.col_of, self.product_ids
+        n = matrix.shape[0]
+        # Columns registered by an in-flight refresh are not in ``matrix`` yet.
+        known = [
+            (col_of[pid], weight)
+            for pid, weight in weights.items()
+            if pid in col_of and col_of[pid] < n
+        ]
+        if not known:
+            return {}
+        cols, values = zip(*known)
+        history = sparse.csr_matrix(
+            (np.asarray(values, dtype=np.float32), (np.zeros(len(cols), dtype=np.int32), cols)),
+            shape=(1, n),
+        )
+        scores = (history @ matrix).tocoo()
+        return {product_ids[col]: float(value) for col, value in zip(scores.col, scores.data)}
+
+    def start_background_refresh(self, interval=60):
+        """Poll for new orders every ``interval`` seconds."""
+        if self._thread and self._thread.is_alive():
+            return self._thread
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception:
+                    logger.exception("Co-purchase refresh failed")
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name="copurchase-refresh", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop_background_refresh(self):
+        self._stop.set()
+
+
+def _resize(matrix, n):
+    if matrix.shape == (n, n):
+        return matrix
+    matrix = matrix.tocsr().copy()
+    matrix.resize((n, n))
+    return matrix
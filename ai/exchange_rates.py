@@ -0,0 +1,189 @@
+"""
+Cached currency exchange rates with stale-while-revalidate.
+
+Rates come from the same open.er-api.com feed the frontend uses (quoted
+against PKR). ``ExchangeRateCache.get_rate()`` never waits on the network
+once it holds any rates: a value older than ``ttl`` is still returned while a
+single background fetch replaces it. Every successful fetch is written to a
+last-known-good snapshot on disk, which seeds the cache at startup so an API
+outage does not take conversions down with it.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import requests
+
+from metrics import outbound_http
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_URL = os.getenv("EXCHANGE_RATE_URL", "https://open.er-api.com/v6/latest/PKR")
+
+DEFAULT_SNAPSHOT_PATH = os.getenv(
+    "EXCHANGE_RATE_SNAPSHOT",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "exchange_rates.json"),
+)
+
+
+class ExchangeRateCache:
+    """Rates relative to the feed's base currency, refreshed every ``ttl`` seconds."""
+
+    def __init__(self, url=DEFAULT_URL, ttl=3600, timeout=3.0, snapshot_path=DEFAULT_SNAPSHOT_PATH,
+                 retry_interval=30):
+        self.url = url
+        self.ttl = ttl
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._last_attempt = 0.0
+        self.snapshot_path = snapshot_path
+        self.rates = None
+        self.fetched_at = 0.0
+        self.hits = 0    # rates served from the cache, fresh or stale
+        self.misses = 0  # cold cache: nothing to serve without fetching
+        self._refreshing = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if snapshot_path:
+            self.load_snapshot()
+
+    def is_stale(self):
+        return time.time() - self.fetched_at > self.ttl
+
+    def fetch(self):
+        """Fetch fresh rates; returns True on success. Failures keep the old rates."""
+        self._last_attempt = time.time()
+        try:
+            with outbound_http("exchange_rates"):
+                response = requests.get(self.url, timeout=self.timeout)
+                response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.warning("Exchange rate fetch failed: %s", e)
+            return False
+        return self._accept(data)
+
+    async def fetch_async(self, client):
+        """``fetch()`` on an event loop, through a shared ``httpx.AsyncClient``."""
+        import httpx
+
+        self._last_attempt = time.time()
+        try:
+            with outbound_http("exchange_rates"):
+                response = await client.get(self.url, timeout=self.timeout)
+                response.raise_for_status()
+            data = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning("Exchange rate fetch failed: %s", e)
+            return False
+        return self._accept(data)
+
+    def _accept(self, data):
+        rates = data.get("rates") if data.get("result") == "success" else None
+        if not rates:
+            logger.warning("Exchange rate feed returned no rates: %s", data.get("result"))
+            return False
+        self._set(rates, time.time())
+        if self.snapshot_path:
+            self.save_snapshot()
+        logger.info("Fetched exchange rates for %d currencies", len(rates))
+        return True
+
+    def _set(self, rates, fetched_at):
+        # Swapped together, so readers see either the old or the new rates.
+        self.rates, self.fetched_at = dict(rates), fetched_at
+
+    def save_snapshot(self):
+        # Every worker refreshes rates, so each write goes through its own temp file.
+        directory = os.path.dirname(self.snapshot_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".json")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"rates": self.rates, "fetchedAt": self.fetched_at}, f)
+            os.replace(tmp_path, self.snapshot_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load_snapshot(self):
+        """Seed the cache from the last good fetch; returns True if one was loaded."""
+        try:
+            with open(self.snapshot_path) as f:
+                data = json.load(f)
+            self._set(data["rates"], float(data["fetchedAt"]))
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        logger.info("Loaded exchange rate snapshot from %s", self.snapshot_path)
+        return True
+
+    def revalidate(self):
+        """Start a background fetch unless one is running.
+
+        Skipped while the last attempt is under ``retry_interval`` old, so a
+        feed that is down is not hit again by every request for stale rates.
+        """
+        if time.time() - self._last_attempt < self.retry_interval:
+            return False
+        if not self._refreshing.acquire(blocking=False):
+            return False
+
+        def run():
+            try:
+                self.fetch()
+            finally:
+                self._refreshing.release()
+
+        threading.Thread(target=run, name="exchange-rate-revalidate", daemon=True).start()
+        return True
+
+    def get_rates(self):
+        """Current rates, stale or not; fetches synchronously only on a cold cache.
+
+        After a failed fetch, cold or stale, callers get None or the stale
+        rates without another attempt until ``retry_interval`` has passed.
+        """
+        if self.rates is None:
+            self.misses += 1
+            if time.time() - self._last_attempt < self.retry_interval:
+                return None
+            with self._refreshing:
+                if self.rates is None and time.time() - self._last_attempt >= self.retry_interval:
+                    self.fetch()
+        else:
+            self.hits += 1
+            if self.is_stale():
+                self.revalidate()
+        return self.rates
+
+    def get_rate(self, from_currency, to_currency):
+        """Units of ``to_currency`` per unit of ``from_currency``, or None if unknown."""
+        rates = self.get_rates()
+        if not rates or not rates.get(from_currency) or to_currency not in rates:
+            return None
+        return rates[to_currency] / rates[from_currency]
+
+    def start_background_refresh(self, interval=None):
+        """Fetch every ``interval`` seconds (default ``ttl / 2``) so requests rarely see stale rates."""
+        if self._thread and self._thread.is_alive():
+            return self._thread
+        interval = interval or self.ttl / 2
+
+        def run():
+            while True:
+                if time.time() - self.fetched_at >= interval:
+                    with self._refreshing:
+                        self.fetch()
+                if self._stop.wait(interval):
+                    break
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name="exchange-rate-refresh", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop_background_refresh(self):
+        self._stop.set()
@@ -0,0 +1,14 @@
+"""
+gunicorn settings for the AI services, picked up when gunicorn runs from ai/.
+
+Each service registers its startup function with ``startup.install_startup()``;
+calling it in ``post_worker_init`` configures every worker's logging, warms
+it up (retrying failed steps) and starts its background refreshers, which
+``__main__`` would otherwise do only for the development server.
+"""
+
+
+def post_worker_init(worker):
+    start = getattr(worker.wsgi, "extensions", {}).get("startup")
+    if start is not None:
+        start()
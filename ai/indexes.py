@@ -0,0 +1,163 @@
+"""
+Indexes the AI services' queries depend on, and a check that they are used.
+
+``ensure_indexes(db)`` creates every index in ``INDEXES`` (a no-op for the
+ones that exist). It is a deploy step, run from this CLI, not part of the
+services' warmup: an index build on a large collection, or a clash with an
+index created by hand under another name, should not hold every worker's
+readiness back. ``verify_query_plans(db)`` runs ``explain()`` on each of
+``QUERY_SHAPES`` - the filters and sorts the services (and the shop's
+product filter) actually send - and reports any that would scan the whole
+collection:
+
+    python indexes.py            # create the indexes
+    python indexes.py --verify   # ... then exit 1 if any shape plans a COLLSCAN
+
+Without an index the planner picks a COLLSCAN whatever the collection's
+size, so a staging copy shows the same plans as production. On an empty or
+missing collection the plan is EOF and the shape is reported as unverified.
+"""
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from analytics_queries import category_sales_pipeline
+
+logger = logging.getLogger(__name__)
+
+INDEXES = {
+    "orders": [
+        # Also serves plain {"user": ...} lookups.
+        IndexModel([("user", ASCENDING), ("createdAt", DESCENDING)], name="user_1_createdAt_-1"),
+        IndexModel([("createdAt", ASCENDING)], name="createdAt_1"),
+        IndexModel([("orderItems.product", ASCENDING)], name="orderItems.product_1"),
+    ],
+    "products": [
+        IndexModel([("category", ASCENDING), ("price", ASCENDING)], name="category_1_price_1"),
+        IndexModel([("rating", DESCENDING), ("numReviews", DESCENDING)], name="rating_-1_numReviews_-1"),
+        IndexModel([("seller", ASCENDING)], name="seller_1"),
+        # The product index's incremental refresh, every minute in every worker.
+        IndexModel([("updatedAt", ASCENDING)], name="updatedAt_1"),
+    ],
+}
+
+
+class QueryShape:
+    """A canonical query: ``filter``/``sort`` for find, or an aggregation ``pipeline``."""
+
+    def __init__(self, name, collection, filter=None, sort=None, limit=0, pipeline=None):
+        self.name = name
+        self.collection = collection
+        self.filter = filter or {}
+        self.sort = sort
+        self.limit = limit
+        self.pipeline = pipeline
+
+    def explain(self, db):
+        if self.pipeline is not None:
+            return db.command("aggregate", self.collection, pipeline=self.pipeline, explain=True)
+        return db[self.collection].find(self.filter, sort=self.sort, limit=self.limit).explain()
+
+
+def _query_shapes():
+    # Placeholder values; only the shape of each query matters to the planner.
+    some_id, other_id = ObjectId(), ObjectId()
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=30)
+    return [
+        QueryShape("orders by user", "orders", {"user": some_id}),
+        QueryShape("latest order of user", "orders", {"user": some_id}, sort=[("createdAt", DESCENDING)], limit=1),
+        QueryShape("orders in window", "orders", {"createdAt": {"$gte": start, "$lte": end}}),
+        QueryShape("orders containing products", "orders", {"orderItems.product": {"$in": [some_id, other_id]}}),
+        QueryShape("category sales", "orders", pipeline=category_sales_pipeline(start, end)),
+        QueryShape("products by seller", "products", {"seller": some_id}),
+        QueryShape("products updated since", "products", {"updatedAt": {"$gt": start}}),
+        QueryShape("shop filter", "products", {"category": {"$in": ["electronics"]}, "price": {"$gte": 0, "$lte": 100}}),
+        QueryShape("top rated products", "products", sort=[("rating", DESCENDING), ("numReviews", DESCENDING)],
+                   limit=8),
+    ]
+
+
+QUERY_SHAPES = _query_shapes()
+
+
+def ensure_indexes(db):
+    """Create the missing ``INDEXES``; returns the names of all of them."""
+    names = []
+    for collection, indexes in INDEXES.items():
+        names += db[collection].create_indexes(indexes)
+    logger.info("Indexes ensured", extra={"fields": {"indexes": names}})
+    return names
+
+
+def plan_stages(explain_output):
+    """Stage names of every winning plan in an explain document (find, aggregate, sharded, SBE)."""
+    stages = []
+
+    def walk(node, in_plan):
+        if isinstance(node, dict):
+            if in_plan and isinstance(node.get("stage"), str):
+                stages.append(node["stage"])
+            for key, value in node.items():
+                walk(value, in_plan or key == "winningPlan")
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, in_plan)
+
+    walk(explain_output, False)
+    return stages
+
+
+def verify_query_plans(db, shapes=None):
+    """``{shape name: (verdict, stages)}`` with verdict ``"ok"``, ``"COLLSCAN"`` or ``"unverified"``."""
+    results = {}
+    for shape in QUERY_SHAPES if shapes is None else shapes:
+        stages = plan_stages(shape.explain(db))
+        if "COLLSCAN" in stages:
+            verdict = "COLLSCAN"
+        elif not stages or set(stages) == {"EOF"}:
+            verdict = "unverified"
+        else:
+            verdict = "ok"
+        results[shape.name] = (verdict, stages)
+    return results
+
+
+class CollectionScanError(RuntimeError):
+    pass
+
+
+def assert_no_collection_scans(db, shapes=None):
+    """Raise ``CollectionScanError`` naming every shape that plans a COLLSCAN."""
+    results = verify_query_plans(db, shapes)
+    scans = [f"{name}: {' > '.join(stages)}" for name, (verdict, stages) in results.items() if verdict == "COLLSCAN"]
+    if scans:
+        raise CollectionScanError("Queries without a usable index:\n" + "\n".join(scans))
+    return results
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description="Create the AI services' MongoDB indexes")
+    parser.add_argument("--mongo-uri", default=None, help="defaults to MONGODB_URI")
+    parser.add_argument("--db", default="test")
+    parser.add_argument("--verify", action="store_true", help="explain every query shape; exit 1 on a COLLSCAN")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+    db = MongoClient(args.mongo_uri or os.getenv("MONGODB_URI"))[args.db]
+    print("Indexes:", ", ".join(ensure_indexes(db)))
+    if args.verify:
+        results = verify_query_plans(db)
+        for name, (verdict, stages) in results.items():
+            print(f"{verdict:<11}{name:<30}{' > '.join(stages)}")
+        if any(verdict == "COLLSCAN" for verdict, _ in results.values()):
+            sys.exit(1)
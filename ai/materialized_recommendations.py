@@ -0,0 +1,198 @@
+"""
+Materialised per-user top-N recommendations.
+
+``python materialized_recommendations.py`` computes the top-N list for every
+user with an order in the last ``--days`` days. Users are split into chunks
+that a process pool scores against one catalog snapshot, and every chunk is
+upserted into the ``user_recommendations`` collection stamped with the run's
+generation. When the run completes, the generation is published in
+``recommendation_generations``.
+
+``MaterializedRecommendations`` is the serving side: one ``_id`` lookup per
+request, returning None for users who are missing or stale so the caller can
+fall back to the live path. Each entry keeps the product ids of the history
+it was computed from, so a request whose own order history has moved on
+since then is sent to the live path as well.
+"""
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import MongoClient, ReplaceOne
+
+from catalog import CatalogSnapshot
+from product_lookup import collect_product_ids
+
+logger = logging.getLogger(__name__)
+
+RESULTS_COLLECTION = "user_recommendations"
+GENERATIONS_COLLECTION = "recommendation_generations"
+
+# Same window the Node backend sends to /get-personalized-recommendations.
+RECENT_ORDERS_PER_USER = 10
+
+
+def utcnow():
+    """Naive UTC now, comparable with the naive UTC datetimes pymongo reads back."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class MaterializedRecommendations:
+    """Reads the precomputed table.
+
+    Entries older than the last completed generation (users who dropped out of
+    the active set) or than ``max_age`` count as stale, and so do entries
+    behind the order history the client sent: one with an order dated after
+    ``computedAt``, or a product the entry's history did not contain.
+    """
+
+    def __init__(self, db, max_age=timedelta(days=2), generation_ttl=60):
+        self.results = db[RESULTS_COLLECTION]
+        self.generations = db[GENERATIONS_COLLECTION]
+        self.max_age = max_age
+        self.generation_ttl = generation_ttl
+        self._generation = None
+        self._generation_checked = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def current_generation(self):
+        if time.time() - self._generation_checked > self.generation_ttl:
+            doc = self.generations.find_one({"_id": "current"})
+            self._generation = doc["generation"] if doc else None
+            self._generation_checked = time.time()
+        return self._generation
+
+    def get(self, user_id, limit=None, order_history=None):
+        """Product ids for ``user_id``, or None if missing or stale."""
+        if not user_id:
+            return None
+        generation = self.current_generation()
+        if generation is None:
+            return None
+        entry = self.results.find_one({"_id": str(user_id)})
+        if (
+            not entry
+            or entry.get("generation", 0) < generation
+            or utcnow() - entry["computedAt"] > self.max_age
+            or (order_history and not _covers(entry, order_history))
+        ):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["productIds"][:limit]
+
+
+def _covers(entry, order_history):
+    """Whether ``entry`` was computed with everything in ``order_history``."""
+    for order in order_history:
+        created_at = order.get("createdAt")
+        if isinstance(created_at, str):
+            created_at = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+            if created_at.tzinfo is not None:
+                created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+        if isinstance(created_at, datetime) and created_at > entry["computedAt"]:
+            return False
+    # Entries written before historyProductIds was stored cannot be checked.
+    known = entry.get("historyProductIds")
+    return known is not None and set(collect_product_ids(order_history)) <= set(known)
+
+
+# --- batch job -----------------------------------------------------------
+
+_worker_db = None
+_worker_snapshot = None
+
+
+def _init_worker(mongo_uri, db_name, snapshot):
+    # Each process opens its own client; MongoClient is not fork-safe.
+    global _worker_db, _worker_snapshot
+    _worker_db = MongoClient(mongo_uri)[db_name]
+    _worker_snapshot = snapshot
+
+
+def compute_chunk(db, snapshot, user_ids, generation, limit):
+    """Score one chunk of users with a single orders query and one bulk write."""
+    recent = {uid: [] for uid in user_ids}
+    orders = db["orders"].find(
+        {"user": {"$in": [ObjectId(uid) for uid in user_ids]}},
+        {"user": 1, "orderItems.product": 1, "createdAt": 1},
+    ).sort("createdAt", -1)
+    for order in orders:
+        history = recent[str(order["user"])]
+        if len(history) < RECENT_ORDERS_PER_USER:
+            history.append(order)
+
+    computed_at = utcnow()
+    ops = []
+    for uid, history in recent.items():
+        history_ids = collect_product_ids(history)
+        rows = snapshot.history_rows(history_ids, limit)
+        ops.append(ReplaceOne({"_id": uid}, {
+            "productIds": [snapshot.product_ids[row] for row in rows],
+            "historyProductIds": sorted(set(history_ids)),
+            "generation": generation,
+            "computedAt": computed_at,
+        }, upsert=True))
+    if ops:
+        db[RESULTS_COLLECTION].bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def _compute_chunk_in_worker(user_ids, generation, limit):
+    return compute_chunk(_worker_db, _worker_snapshot, user_ids, generation, limit)
+
+
+def active_users(db, days):
+    since = utcnow() - timedelta(days=days)
+    return [str(uid) for uid in db["orders"].distinct("user", {"createdAt": {"$gte": since}})]
+
+
+def run(mongo_uri, db_name="test", days=90, limit=8, chunk_size=500, workers=None):
+    db = MongoClient(mongo_uri)[db_name]
+    generation = int(time.time())
+    snapshot = CatalogSnapshot.load(db["products"])
+    users = active_users(db, days)
+    chunks = [users[i:i + chunk_size] for i in range(0, len(users), chunk_size)]
+    logger.info("Generation %d: %d active users in %d chunks", generation, len(users), len(chunks))
+
+    done = 0
+    with ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        initializer=_init_worker,
+        initargs=(mongo_uri, db_name, snapshot),
+    ) as pool:
+        futures = [pool.submit(_compute_chunk_in_worker, chunk, generation, limit) for chunk in chunks]
+        for future in as_completed(futures):
+            done += future.result()
+
+    db[GENERATIONS_COLLECTION].replace_one(
+        {"_id": "current"},
+        {"generation": generation, "users": done, "completedAt": utcnow()},
+        upsert=True,
+    )
+    return generation, done
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Precompute top-N recommendations per active user")
+    parser.add_argument("--days", type=int, default=90, help="users with an order in this window")
+    parser.add_argument("--limit", type=int, default=8)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+    started = time.perf_counter()
+    generation, users = run(
+        os.getenv("MONGODB_URI", ""), days=args.days, limit=args.limit,
+        chunk_size=args.chunk_size, workers=args.workers,
+    )
+    print(f"Generation {generation}: wrote {users} users in {time.perf_counter() - started:.1f}s")
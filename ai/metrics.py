@@ -0,0 +1,269 @@
+"""
+Per-request performance metrics, exposed Prometheus-style on ``/metrics``.
+
+    install_metrics(app, "app")          # request hooks + GET /metrics
+    register_cache("catalog", catalog)   # anything with ``hits``/``misses`` counters
+    with outbound_http("gemini"):        # time a call to another service
+        requests.post(...)
+
+Every request records its latency per endpoint, plus the Mongo commands it
+issued, the time they took and the time spent waiting on outbound HTTP. Mongo
+commands are seen by a pymongo ``CommandListener`` registered when this module
+is imported, so the services import it before creating any ``MongoClient``.
+
+The per-request totals also go on the sampled request log line (see
+structured_logging.py). Metrics live in the process: with several gunicorn
+workers each one reports its own and Prometheus sums them.
+"""
+import contextvars
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+import structured_logging
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, labels, value) for labels, value in sorted(self._values.items())]
+
+    kind = "counter"
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, list(entry)) for labels, entry in self._values.items())
+        samples = []
+        for labels, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), entry[:-1]):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", labels + (_format_bound(bound),), cumulative))
+            samples.append((f"{self.name}_count", labels, cumulative))
+            samples.append((f"{self.name}_sum", labels, entry[-1]))
+        return samples
+
+    kind = "histogram"
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by endpoint.",
+    ("service", "endpoint", "method", "status"))
+REQUEST_MONGO_QUERIES = Histogram(
+    "http_request_mongo_queries", "Mongo commands issued per request.",
+    ("service", "endpoint"), COUNT_BUCKETS)
+REQUEST_MONGO_SECONDS = Histogram(
+    "http_request_mongo_seconds", "Time per request spent in Mongo commands.", ("service", "endpoint"))
+REQUEST_OUTBOUND_SECONDS = Histogram(
+    "http_request_outbound_seconds", "Time per request spent waiting on outbound HTTP.", ("service", "endpoint"))
+MONGO_COMMAND_SECONDS = Histogram(
+    "mongo_command_duration_seconds", "Mongo command latency, in or out of a request.", ("command",))
+MONGO_COMMAND_FAILURES = Counter(
+    "mongo_command_failures_total", "Mongo commands that returned an error.", ("command",))
+OUTBOUND_SECONDS = Histogram(
+    "outbound_http_duration_seconds", "Outbound HTTP call latency.", ("target", "outcome"))
+
+METRICS = [REQUEST_LATENCY, REQUEST_MONGO_QUERIES, REQUEST_MONGO_SECONDS, REQUEST_OUTBOUND_SECONDS,
+           MONGO_COMMAND_SECONDS, MONGO_COMMAND_FAILURES, OUTBOUND_SECONDS]
+
+# name -> object exposing ``hits`` and ``misses``; read at scrape time.
+_caches = {}
+
+
+def register_cache(name, cache):
+    _caches[name] = cache
+
+
+# --- per-request totals --------------------------------------------------
+
+class RequestStats:
+    __slots__ = ("started", "mongo_queries", "mongo_seconds", "outbound_seconds")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.mongo_queries = 0
+        self.mongo_seconds = 0.0
+        self.outbound_seconds = 0.0
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+def current_stats():
+    """Totals for the request being served in this context, or None."""
+    return _current.get()
+
+
+def start_request():
+    """Begin collecting totals; returns a token for ``finish_request``."""
+    return _current.set(RequestStats())
+
+
+def finish_request(token, service, endpoint, method, status):
+    """Record the request's latency and totals, log it (sampled) and stop collecting."""
+    stats = _current.get()
+    _current.reset(token)
+    if stats is None:
+        return None
+    elapsed = time.perf_counter() - stats.started
+    REQUEST_LATENCY.observe(elapsed, service, endpoint, method, str(status))
+    REQUEST_MONGO_QUERIES.observe(stats.mongo_queries, service, endpoint)
+    REQUEST_MONGO_SECONDS.observe(stats.mongo_seconds, service, endpoint)
+    REQUEST_OUTBOUND_SECONDS.observe(stats.outbound_seconds, service, endpoint)
+    logger.info("request", extra={"fields": {
+        "endpoint": endpoint, "method": method, "status": status,
+        "ms": round(elapsed * 1000, 2),
+        "mongoQueries": stats.mongo_queries,
+        "mongoMs": round(stats.mongo_seconds * 1000, 2),
+        "outboundMs": round(stats.outbound_seconds * 1000, 2),
+    }})
+    return stats
+
+
+class _MongoCommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        MONGO_COMMAND_FAILURES.inc(event.command_name)
+        self._record(event)
+
+    def _record(self, event):
+        seconds = event.duration_micros / 1e6
+        MONGO_COMMAND_SECONDS.observe(seconds, event.command_name)
+        stats = _current.get()
+        if stats is not None:
+            stats.mongo_queries += 1
+            stats.mongo_seconds += seconds
+
+
+mongo_listener = _MongoCommandMetrics()
+monitoring.register(mongo_listener)
+
+
+@contextmanager
+def outbound_http(target):
+    """Time one outbound call; counts towards the current request's outbound time."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        seconds = time.perf_counter() - started
+        OUTBOUND_SECONDS.observe(seconds, target, outcome)
+        stats = _current.get()
+        if stats is not None:
+            stats.outbound_seconds += seconds
+
+
+# --- exposition ----------------------------------------------------------
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        labelnames = metric.labelnames + (("le",) if metric.kind == "histogram" else ())
+        for name, labels, value in metric.samples():
+            names = labelnames if name.endswith("_bucket") else metric.labelnames
+            lines.append(f"{name}{_format_labels(names, labels)} {_format_value(value)}")
+    for kind in ("hits", "misses"):
+        lines.append(f"# HELP cache_{kind}_total Cache {kind} by cache.")
+        lines.append(f"# TYPE cache_{kind}_total counter")
+        for name, cache in sorted(_caches.items()):
+            lines.append(f'cache_{kind}_total{{cache="{name}"}} {getattr(cache, kind, 0)}')
+    return "\n".join(lines) + "\n"
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# --- Flask ---------------------------------------------------------------
+
+def install_metrics(app, service):
+    """Time every request of ``app`` and serve ``GET /metrics``."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_metrics():
+        g._metrics_token = start_request()
+        g._log_token = structured_logging.start_request()
+
+    @app.after_request
+    def _finish_metrics(response):
+        token = g.pop("_metrics_token", None)
+        if token is not None:
+            endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            finish_request(token, service, endpoint, request.method, response.status_code)
+        log_token = g.pop("_log_token", None)
+        if log_token is not None:
+            structured_logging.finish_request(log_token)
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics_endpoint():
+        return Response(render(), mimetype="text/plain", content_type=CONTENT_TYPE)
+
+    return app
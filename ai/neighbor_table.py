@@ -0,0 +1,210 @@
+"""
+Precomputed top-K content neighbours for every product.
+
+The table is built offline from the TF-IDF index (``python neighbor_table.py``,
+e.g. hourly from cron on one host), persisted as a compressed ``.npz`` file,
+and lets content-only ``/recommend`` calls be answered with a row lookup
+instead of scoring the whole catalog. The build is O(catalog²), so serving
+workers never run it: each one only reloads the file, through
+``NeighborTableStore``, when a new build replaces it.
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+import zipfile
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_K = 20
+
+# Scores held at once while building. Each costs 4 bytes, 4 more for the
+# negated copy and 8 for its argpartition index, so 2**22 of them stay near
+# 64 MB whatever the catalog size; bigger catalogs are scored in
+# proportionally fewer rows.
+BLOCK_ELEMENTS = 2 ** 22
+DEFAULT_PATH = os.getenv(
+    "NEIGHBOR_TABLE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "neighbors.npz"),
+)
+
+
+class NeighborTable:
+    """Top-K neighbour rows (int32, -1 for empty slots) and cosine scores (float32) per product."""
+
+    def __init__(self, product_ids, neighbors, scores, built_at=None):
+        self.product_ids = list(product_ids)
+        self.neighbors = neighbors
+        self.scores = scores
+        self.built_at = built_at if built_at is not None else time.time()
+        self.row_of = {pid: row for row, pid in enumerate(self.product_ids)}
+
+    @property
+    def k(self):
+        return self.neighbors.shape[1]
+
+    def __contains__(self, product_id):
+        return product_id in self.row_of
+
+    def lookup(self, product_id, limit=None):
+        """Return ``[(product_id, score), ...]`` or None for unknown products."""
+        row = self.row_of.get(product_id)
+        if row is None:
+            return None
+        limit = self.k if limit is None else min(limit, self.k)
+        return [
+            (self.product_ids[n], float(s))
+            for n, s in zip(self.neighbors[row, :limit], self.scores[row, :limit])
+            if n >= 0
+        ]
+
+    @classmethod
+    def build(cls, snapshot, k=DEFAULT_K, block_size=None, engine=None):
+        """Compute the table from a ``ProductTextIndex`` snapshot.
+
+        Rows are scored in float32 blocks of ``block_size`` rows (by default
+        as many as fit in ``BLOCK_ELEMENTS``), so peak memory stays the same
+        however large the catalog grows, and ``argpartition`` keeps each
+        block at O(catalog) instead of a full sort. An approximate engine
+        from ``ann_index`` (anything but exact search) is queried row by row
+        instead.
+        """
+        matrix = snapshot.matrix
+        n = matrix.shape[0]
+        k = max(0, min(k, n - 1))
+        neighbors = np.zeros((n, k), dtype=np.int32)
+        scores = np.zeros((n, k), dtype=np.float32)
+        if k == 0:
+            return cls(snapshot.product_ids, neighbors, scores)
+
+        if engine is not None and engine.name != "exact":
+            for row in range(n):
+                rows, row_scores = engine.search(matrix[row], k, exclude=row)
+                # Buckets may hold fewer than k products; -1 marks an empty slot.
+                neighbors[row] = -1
+                neighbors[row, :len(rows)] = rows
+                scores[row, :len(rows)] = row_scores
+            return cls(snapshot.product_ids, neighbors, scores)
+
+        # float32 operands give a float32 product, densified without a float64 copy.
+        matrix = matrix.astype(np.float32)
+        matrix_t = matrix.T.tocsc()
+        block_size = block_size or max(1, BLOCK_ELEMENTS // n)
+        for start in range(0, n, block_size):
+            stop = min(start + block_size, n)
+            block = (matrix[start:stop] @ matrix_t).toarray()
+            local = np.arange(stop - start)
+            block[local, local + start] = -np.inf  # never recommend the product itself
+
+            top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(block, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            neighbors[start:stop] = np.take_along_axis(top, order, axis=1)
+            scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
+
+        return cls(snapshot.product_ids, neighbors, scores)
+
+    def save(self, path=DEFAULT_PATH):
+        """Write the table atomically so readers never see a partial file.
+
+        Each writer gets its own temporary file, so concurrent saves cannot
+        interleave; the last ``os.replace`` wins.
+        """
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    product_ids=np.array(self.product_ids, dtype="U24"),
+                    neighbors=self.neighbors,
+                    scores=self.scores,
+                    built_at=np.array(self.built_at),
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        with np.load(path) as data:
+            return cls(
+                data["product_ids"].tolist(),
+                data["neighbors"],
+                data["scores"],
+                float(data["built_at"]),
+            )
+
+
+class NeighborTableStore:
+    """Serves the table at ``path`` and reloads it when the file's mtime changes.
+
+    The file is stat'ed at most every ``check_interval`` seconds, so the
+    request path normally costs one attribute read. Only the CLI writes the
+    file; serving processes never build a table themselves.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, check_interval=60):
+        self.path = path
+        self.check_interval = check_interval
+        self.table = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        if time.time() - self._checked_at >= self.check_interval:
+            with self._lock:
+                if time.time() - self._checked_at >= self.check_interval:
+                    self._checked_at = time.time()
+                    self._maybe_reload()
+        return self.table
+
+    def _maybe_reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if self.table is not None and mtime == self._mtime:
+                return
+            table = NeighborTable.load(self.path)
+        except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile) as e:
+            if self.table is None:
+                logger.info("No neighbour table loaded from %s: %s", self.path, e)
+            else:
+                logger.warning("Keeping neighbour table built at %s; could not reload %s: %s",
+                               self.table.built_at, self.path, e)
+            return
+        self.table, self._mtime = table, mtime
+        logger.info("Loaded %d x %d neighbour table from %s", len(table.product_ids), table.k, self.path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    from ann_index import make_engine
+    from product_index import ProductTextIndex
+
+    parser = argparse.ArgumentParser(description="Precompute top-K similar products")
+    parser.add_argument("--k", type=int, default=DEFAULT_K)
+    parser.add_argument("--output", default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGODB_URI", ""))
+    index = ProductTextIndex(client["test"]["products"])
+    index.build()
+
+    started = time.perf_counter()
+    snapshot = index.snapshot()
+    table = NeighborTable.build(snapshot, k=args.k, engine=make_engine(snapshot.matrix))
+    table.save(args.output)
+    print(f"Wrote {len(table.product_ids)} x {table.k} neighbours to {args.output} "
+          f"in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,98 @@
+"""
+One user's order history as arrays, for the predictive analytics features.
+
+``get_user_features()`` and ``predict_next_purchase()`` used to fetch the
+user's full order documents twice. The preferred payment method came from a
+``list(...).count()`` inside ``max()``, and recency was read from
+``orders[-1]``, which assumed the orders came back sorted. ``OrderHistory``
+reads one projected cursor once. Dates and totals go into NumPy arrays,
+sorted by date, and category and payment-method counts are taken in the
+same pass. Frequency, recency, monetary value and the prediction inputs are
+then derived from those arrays.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+ORDER_HISTORY_PROJECTION = {"_id": 0, "createdAt": 1, "totalPrice": 1, "paymentMethod": 1, "orderItems.category": 1}
+
+# Used when there is no order, or only one, to measure from.
+DEFAULT_DAYS_SINCE_LAST_ORDER = 365
+DEFAULT_PURCHASE_INTERVAL_DAYS = 30
+
+_DAY = np.timedelta64(1, "D")
+# Dates are kept as epoch milliseconds (BSON's precision); subtracting the epoch
+# is several times faster than letting NumPy convert each datetime.
+_EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+
+def _most_common(counts):
+    # Ties go to the value seen first.
+    return max(counts.items(), key=lambda x: x[1])[0] if counts else None
+
+
+class OrderHistory:
+    """A user's orders, sorted by date, with category and payment counts."""
+
+    def __init__(self, orders):
+        dates, totals = [], []
+        self.category_counts = {}
+        self.payment_counts = {}
+        for order in orders:
+            dates.append((order["createdAt"] - _EPOCH) // _MILLISECOND)
+            totals.append(order.get("totalPrice") or 0)
+            method = order.get("paymentMethod")
+            if method is not None:
+                self.payment_counts[method] = self.payment_counts.get(method, 0) + 1
+            for item in order.get("orderItems", []):
+                category = item.get("category")
+                if category:
+                    self.category_counts[category] = self.category_counts.get(category, 0) + 1
+        dates = np.array(dates, dtype=np.int64).view("datetime64[ms]")
+        chronological = np.argsort(dates, kind="stable")
+        self.dates = dates[chronological]
+        self.totals = np.array(totals, dtype=np.float64)[chronological]
+
+    def __len__(self):
+        return len(self.dates)
+
+    def purchase_interval_days(self):
+        """Mean gap between consecutive orders, in whole days per gap."""
+        if len(self) < 2:
+            return DEFAULT_PURCHASE_INTERVAL_DAYS
+        return float((np.diff(self.dates) // _DAY).mean())
+
+    def last_order_date(self):
+        return self.dates[-1].item() if len(self) else None
+
+    def top_category(self):
+        return _most_common(self.category_counts)
+
+    def features(self, now=None):
+        """Frequency, recency, monetary and category/payment features."""
+        now = now or datetime.now()
+        total_spent = float(self.totals.sum())
+        last_order = self.last_order_date()
+        return {
+            "total_orders": len(self),
+            "total_spent": total_spent,
+            "avg_order_value": total_spent / len(self) if len(self) else 0,
+            "days_since_last_order": (now - last_order).days if last_order else DEFAULT_DAYS_SINCE_LAST_ORDER,
+            "avg_days_between_orders": self.purchase_interval_days(),
+            "unique_categories": len(self.category_counts),
+            "top_category": self.top_category(),
+            "preferred_payment_method": _most_common(self.payment_counts),
+        }
+
+    def predicted_next_purchase(self):
+        return self.last_order_date() + timedelta(days=self.purchase_interval_days())
+
+    def purchase_history(self):
+        """``[{"date": iso, "total": ...}]`` oldest first."""
+        # Formatted as datetime.isoformat() would: no fraction unless there is one.
+        dates = np.datetime_as_string(self.dates, unit="s")
+        fractional = self.dates != self.dates.astype("datetime64[s]")
+        if fractional.any():
+            dates = np.where(fractional, np.datetime_as_string(self.dates, unit="us"), dates)
+        return [{"date": date, "total": total} for date, total in zip(dates.tolist(), self.totals.tolist())]
@@ -0,0 +1,222 @@
+"""
+In-memory popularity ranking with per-category top lists.
+
+Each product is scored with a Bayesian average of its ratings - shrunk towards
+the catalog-wide mean rating by ``prior_weight`` virtual reviews, so a single
+5-star review does not outrank hundreds of 4.5s - plus a log bonus for units
+sold. Products are kept in score-sorted lists (one overall, one per category)
+so serving the top N is a slice, with no Mongo query on the request path.
+
+The Mongo query this replaces only listed products rated at least 4 with at
+least 10 reviews. The prior now does the work of the review cut-off and the
+score replaces the rating cut, but a product still needs ``min_reviews``
+reviews or a sale to rank among the products that have them; products with
+no such evidence follow, in score order, so the lists still cover the whole
+catalog.
+
+``refresh()`` re-reads ratings from the products collection and folds in
+orders newer than the last one seen; ``record_review()`` and
+``record_order()`` apply events in between refreshes.
+"""
+import logging
+import math
+import os
+import threading
+from bisect import bisect_left, insort
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_PROJECTION = {"category": 1, "rating": 1, "numReviews": 1}
+ORDER_PROJECTION = {"orderItems.product": 1, "orderItems.qty": 1}
+
+DEFAULT_REFRESH_INTERVAL = int(os.getenv("POPULARITY_REFRESH_SECONDS", "300"))
+
+
+class PopularityRanking:
+    """Bayesian-average popularity scores, sorted overall and per category."""
+
+    def __init__(self, products_collection, orders_collection, prior_weight=None, sales_weight=0.5, min_reviews=1):
+        self.products_collection = products_collection
+        self.orders_collection = orders_collection
+        self.prior_weight = prior_weight
+        self.sales_weight = sales_weight
+        self.min_reviews = min_reviews
+
+        self.category_of = {}    # product id -> category (str) or None
+        self.rating_sum = {}     # product id -> sum of review ratings
+        self.rating_count = {}   # product id -> number of reviews
+        self.units = {}          # product id -> units sold, from orders read by refresh()
+        self.pending_units = {}  # product id -> units from order events since the last refresh
+        self.scores = {}
+        self._keys = {}          # product id -> its sort key in the lists below
+        self.mean_rating = 0.0
+        self.prior = 1.0
+        self.last_order_id = None
+
+        self._overall = []       # sorted (no evidence, -score, product id)
+        self._by_category = {}   # category -> sorted (no evidence, -score, product id)
+        self._lock = threading.Lock()
+        self._building = threading.Lock()  # so concurrent ensure_built() calls build once
+        self._stop = threading.Event()
+        self._thread = None
+        self.ready = False
+
+    def build(self):
+        """Read every product and order and rank from scratch."""
+        self._load(full=True)
+        logger.info("Popularity ranking built: %d products, %d categories",
+                    len(self.scores), len(self._by_category))
+
+    def ensure_built(self):
+        if not self.ready:
+            with self._building:
+                if not self.ready:
+                    self.build()
+
+    def refresh(self):
+        """Re-read ratings and fold in new orders, then re-rank everything."""
+        self._load(full=not self.ready)
+
+    def _load(self, full):
+        # Mongo is read without the lock so top() keeps serving the old lists.
+        with self._lock:
+            pending_at_start = dict(self.pending_units)
+        category_of, rating_sum, rating_count = {}, {}, {}
+        for product in self.products_collection.find({}, PRODUCT_PROJECTION):
+            pid = str(product["_id"])
+            category = product.get("category")
+            category_of[pid] = str(category) if category is not None else None
+            count = _number(product.get("numReviews"))
+            rating_count[pid] = count
+            rating_sum[pid] = _number(product.get("rating")) * count
+
+        units = {} if full else dict(self.units)
+        last_order_id = None if full else self.last_order_id
+        query = {"_id": {"$gt": last_order_id}} if last_order_id is not None else {}
+        for order in self.orders_collection.find(query, ORDER_PROJECTION).sort("_id", 1):
+            last_order_id = order["_id"]
+            for item in order.get("orderItems", []):
+                if item.get("product") is not None:
+                    pid = str(item["product"])
+                    units[pid] = units.get(pid, 0) + (_number(item.get("qty")) or 1)
+
+        with self._lock:
+            # Orders reported before the load started are now in ``units``
+            # (or will be on the next refresh), so their provisional counts
+            # are dropped. Events that arrived during the load are kept.
+            self.pending_units = {
+                pid: qty - pending_at_start.get(pid, 0)
+                for pid, qty in self.pending_units.items()
+                if qty > pending_at_start.get(pid, 0)
+            }
+            self.units = units
+            self.last_order_id = last_order_id
+            self.category_of = category_of
+            self.rating_sum = rating_sum
+            self.rating_count = rating_count
+            self._rescore_all()
+            self.ready = True
+
+    def _rescore_all(self):
+        total_count = sum(self.rating_count.values())
+        self.mean_rating = sum(self.rating_sum.values()) / total_count if total_count else 0.0
+        if self.prior_weight is not None:
+            self.prior = float(self.prior_weight)
+        else:
+            # Median review count of reviewed products: a typical product's
+            # own ratings and the catalog mean get equal say.
+            reviewed = sorted(c for c in self.rating_count.values() if c > 0)
+            self.prior = float(reviewed[len(reviewed) // 2]) if reviewed else 1.0
+
+        self.scores = {pid: self._score(pid) for pid in self.category_of}
+        self._keys = {pid: self._key(pid) for pid in self.scores}
+        self._overall = sorted(self._keys.values())
+        by_category = {}
+        for entry in self._overall:
+            by_category.setdefault(self.category_of[entry[-1]], []).append(entry)
+        self._by_category = by_category
+
+    def _score(self, pid):
+        count = self.rating_count.get(pid, 0)
+        bayesian = (self.prior * self.mean_rating + self.rating_sum.get(pid, 0.0)) / (self.prior + count)
+        sold = self.units.get(pid, 0) + self.pending_units.get(pid, 0)
+        return bayesian + self.sales_weight * math.log1p(sold)
+
+    def _key(self, pid):
+        has_evidence = (self.rating_count.get(pid, 0) >= self.min_reviews
+                        or self.units.get(pid, 0) + self.pending_units.get(pid, 0) > 0)
+        return (not has_evidence, -self.scores[pid], pid)
+
+    def _rescore(self, pid):
+        """Move one product to its new position in the sorted lists."""
+        self.scores[pid] = self._score(pid)
+        old, new = self._keys.get(pid), self._key(pid)
+        if old == new:
+            return
+        category = self.category_of.get(pid)
+        lists = [self._overall, self._by_category.setdefault(category, [])]
+        for entries in lists:
+            if old is not None:
+                index = bisect_left(entries, old)
+                if index < len(entries) and entries[index] == old:
+                    del entries[index]
+            insort(entries, new)
+        self._keys[pid] = new
+
+    def record_review(self, product_id, rating, category=None):
+        """Apply one new review; the next refresh re-reads the stored ratings."""
+        pid = str(product_id)
+        with self._lock:
+            if pid not in self.category_of:
+                self.category_of[pid] = str(category) if category is not None else None
+            self.rating_sum[pid] = self.rating_sum.get(pid, 0.0) + float(rating)
+            self.rating_count[pid] = self.rating_count.get(pid, 0) + 1
+            self._rescore(pid)
+
+    def record_order(self, product_quantities):
+        """Apply one new order given as ``{product_id: qty}``."""
+        with self._lock:
+            for product_id, qty in product_quantities.items():
+                pid = str(product_id)
+                if pid not in self.category_of:
+                    # Unknown until the next refresh reads the product.
+                    continue
+                self.pending_units[pid] = self.pending_units.get(pid, 0) + qty
+                self._rescore(pid)
+
+    def top(self, limit=8, category=None, exclude=()):
+        """Ids of the ``limit`` most popular products, optionally in one category."""
+        exclude = {str(pid) for pid in exclude}
+        result = []
+        with self._lock:
+            entries = self._overall if category is None else self._by_category.get(str(category), [])
+            for *_, pid in entries:
+                if pid not in exclude:
+                    result.append(pid)
+                    if len(result) == limit:
+                        break
+        return result
+
+    def start_background_refresh(self, interval=DEFAULT_REFRESH_INTERVAL):
+        """Refresh every ``interval`` seconds."""
+        if self._thread and self._thread.is_alive():
+            return self._thread
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception:
+                    logger.exception("Popularity refresh failed")
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name="popularity-refresh", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop_background_refresh(self):
+        self._stop.set()
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
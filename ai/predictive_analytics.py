@@ -1,11 +1,14 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from response_encoding import install_json_provider
+from metrics import install_metrics
+from query_profiler import install_query_profiler
+from startup import StartupReport, install_startup
+from user_listing import users_response
+from order_history import OrderHistory, ORDER_HISTORY_PROJECTION
+from analytics_queries import category_sales as get_category_sales, popular_categories as get_popular_categories
 from pymongo import MongoClient
 from bson import ObjectId
-import pandas as pd
-import numpy as np
-from sklearn.preprocessing import StandardScaler
-from sklearn.ensemble import RandomForestClassifier
 from datetime import datetime, timedelta
 import logging
 import random
@@ -17,6 +20,11 @@ load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
+install_json_provider(app)
+install_metrics(app, "predictive_analytics")
+install_query_profiler(app)
+
+logger = logging.getLogger(__name__)
 
 # MongoDB connection
 try:
@@ -25,84 +33,44 @@ try:
     orders_collection = db['orders']
     users_collection = db['users']
     products_collection = db['products']
-    print("✅ MongoDB connection successful")
+    logger.info("MongoDB connection successful")
 except Exception as e:
-    print(f"❌ MongoDB connection error: {str(e)}")
+    logger.error("MongoDB connection error: %s", e)
     raise e
 
-def get_user_features(user_id):
-    """Extract features for user behavior analysis"""
-    user = users_collection.find_one({"_id": ObjectId(user_id)})
+def get_order_history(user_id):
+    """The user's orders from one projected fetch, or None if the user does not exist."""
+    user = users_collection.find_one({"_id": ObjectId(user_id)}, {"_id": 1})
     if not user:
         return None
+    return OrderHistory(orders_collection.find({"user": ObjectId(user_id)}, ORDER_HISTORY_PROJECTION))
 
-    # Get user's order history
-    orders = list(orders_collection.find({"user": ObjectId(user_id)}))
-    
-    features = {
-        'total_orders': len(orders),
-        'total_spent': sum(order.get('totalPrice', 0) for order in orders),
-        'avg_order_value': sum(order.get('totalPrice', 0) for order in orders) / len(orders) if orders else 0,
-        'days_since_last_order': (datetime.now() - orders[-1]['createdAt']).days if orders else 365,
-        'unique_categories': len(set(item.get('category') for order in orders for item in order.get('orderItems', []))),
-        'preferred_payment_method': max(set(order.get('paymentMethod') for order in orders), key=lambda x: list(order.get('paymentMethod') for order in orders).count(x)) if orders else None
-    }
-    
-    return features
+def get_user_features(user_id):
+    """Extract features for user behavior analysis"""
+    history = get_order_history(user_id)
+    return history.features() if history is not None else None
 
 def predict_next_purchase(user_id):
     """Predict next purchase category and timing"""
-    features = get_user_features(user_id)
-    if not features:
-        print(f"Predictive Analytics: No features found for user {user_id}")
+    history = get_order_history(user_id)
+    if history is None:
+        logger.info("No features found for user %s", user_id)
         return None
-
-    # Get historical purchase patterns
-    orders = list(orders_collection.find({"user": ObjectId(user_id)}))
-    print(f"Predictive Analytics: Found {len(orders)} orders for user {user_id}")
-    if not orders:
-        print(f"Predictive Analytics: No orders found for user {user_id}")
+    if not len(history):
+        logger.info("No orders found for user %s", user_id)
         return None
 
-    # Calculate purchase frequency
-    order_dates = [order['createdAt'] for order in orders]
-    order_dates.sort()
-    print(f"Predictive Analytics: Order dates for user {user_id}: {order_dates}")
-    time_diffs = [(order_dates[i] - order_dates[i-1]).days for i in range(1, len(order_dates))]
-    print(f"Predictive Analytics: Time differences for user {user_id}: {time_diffs}")
-    avg_purchase_frequency = sum(time_diffs) / len(time_diffs) if time_diffs else 30
-
-    # Predict next purchase date
-    last_order_date = order_dates[-1]
-    predicted_next_purchase = last_order_date + timedelta(days=avg_purchase_frequency)
-
-    # Predict category
-    category_counts = {}
-    for order in orders:
-        for item in order.get('orderItems', []):
-            category = item.get('category')
-            if category:
-                category_counts[category] = category_counts.get(category, 0) + 1
-
-    print(f"Predictive Analytics: Category counts for user {user_id}: {category_counts}")
-    predicted_category = max(category_counts.items(), key=lambda x: x[1])[0] if category_counts else None
-    if not predicted_category:
-         print(f"Predictive Analytics: No categories found in order items for user {user_id}")
-
-    # Prepare historical purchase data for frontend
-    purchase_history = [
-        {
-            'date': order['createdAt'].isoformat(),
-            'total': order.get('totalPrice', 0)
-        }
-        for order in orders
-    ]
+    predicted_category = history.top_category()
+    logger.info("Next purchase predicted", extra={"fields": {
+        "userId": str(user_id), "orders": len(history), "categories": len(history.category_counts),
+        "predictedCategory": predicted_category,
+    }})
 
     return {
-        'predicted_next_purchase_date': predicted_next_purchase.isoformat(),
+        'predicted_next_purchase_date': history.predicted_next_purchase().isoformat(),
         'predicted_category': predicted_category,
-        'confidence_score': 0.8 if len(orders) > 5 else 0.6,
-        'purchase_history': purchase_history
+        'confidence_score': 0.8 if len(history) > 5 else 0.6,
+        'purchase_history': history.purchase_history()
     }
 
 @app.route('/predict', methods=['POST'])
@@ -121,7 +89,7 @@ def predict():
         return jsonify(prediction)
 
     except Exception as e:
-        logging.exception("Prediction error:")
+        logger.exception("Prediction error")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/analytics/seller/<seller_id>', methods=['GET'])
@@ -164,7 +132,7 @@ def seller_analytics(seller_id):
         })
 
     except Exception as e:
-        logging.exception("Seller analytics error:")
+        logger.exception("Seller analytics error")
         return jsonify({"error": str(e)}), 500
 
 def get_analytics(time_range):
@@ -184,7 +152,7 @@ def get_analytics(time_range):
         # Get orders within date range
         orders = list(orders_collection.find({
             "createdAt": {"$gte": start_date, "$lte": end_date}
-        }))
+        }, {"totalPrice": 1, "user": 1}))
         
         # Calculate total sales
         total_sales = sum(order.get("totalPrice", 0) for order in orders)
@@ -197,7 +165,7 @@ def get_analytics(time_range):
                     "$gte": start_date - (end_date - start_date),
                     "$lt": start_date
                 }
-            })
+            }, {"user": 1})
         ))
         
         customer_growth = (
@@ -206,20 +174,8 @@ def get_analytics(time_range):
         )
         
         # Get popular categories
-        category_sales = {}
-        for order in orders:
-            for item in order.get("orderItems", []):
-                product = products_collection.find_one({"_id": item.get("product")})
-                if product:
-                    category = product.get("category")
-                    category_sales[category] = category_sales.get(category, 0) + item.get("price", 0)
-        
-        # Calculate category percentages
-        total_category_sales = sum(category_sales.values())
-        popular_categories = [
-            {"name": category, "percentage": round((sales / total_category_sales) * 100)}
-            for category, sales in sorted(category_sales.items(), key=lambda x: x[1], reverse=True)
-        ][:5]
+        category_sales = get_category_sales(orders_collection, start_date, end_date)
+        popular_categories = get_popular_categories(category_sales)
         
         # Generate sales trend
         sales_trend = random.uniform(-10, 20)  # Simulated trend between -10% and 20%
@@ -232,7 +188,7 @@ def get_analytics(time_range):
         }
         
     except Exception as e:
-        print(f"Error in get_analytics: {str(e)}")
+        logger.exception("Error in get_analytics")
         # Return default values if there's an error
         return {
             "totalSales": 0,
@@ -285,34 +241,30 @@ def get_sales_forecast(time_range):
         return forecast
         
     except Exception as e:
-        print(f"Error in get_sales_forecast: {str(e)}")
+        logger.exception("Error in get_sales_forecast")
         return []
 
 @app.route('/users', methods=['GET'])
 def list_users():
-    """List users with their IDs for testing purposes"""
-    print("Accessing /users endpoint") # Debug print statement
+    """List users with their IDs, a page at a time (or streamed as NDJSON)"""
     try:
-        users = list(users_collection.find({}, {
-            '_id': 1,
-            'name': 1,
-            'email': 1
-        }))
-        
-        # Convert ObjectId to string for JSON serialization
-        formatted_users = [{
-            'id': str(user['_id']),
-            'name': user.get('name', 'N/A'),
-            'email': user.get('email', 'N/A')
-        } for user in users]
-        
-        return jsonify(formatted_users)
+        return users_response(
+            users_collection, request.args, request.headers, ("name", "email"), missing='N/A'
+        )
     except Exception as e:
-        logging.exception("Error listing users:")
+        logger.exception("Error listing users")
         return jsonify({"error": str(e)}), 500
 
-if __name__ == '__main__':
-    print("Flask app routes:")
+def log_routes():
     for rule in app.url_map.iter_rules():
-        print(f"Endpoint: {rule.endpoint}, Methods: {rule.methods}, Rule: {rule.rule}")
+        logger.info("Route %s", rule.rule, extra={"fields": {
+            "endpoint": rule.endpoint, "methods": sorted(rule.methods)}})
+
+# Logging (and the route table) for every process serving ``app``: called by
+# gunicorn.conf.py in each worker, and by __main__ below.
+startup_report = StartupReport("predictive_analytics")
+start = install_startup(app, startup_report, on_ready=log_routes)
+
+if __name__ == '__main__':
+    start(wait=True)
     app.run(host='0.0.0.0', port=5004)
@@ -0,0 +1,83 @@
+"""
+Bounded LRU + TTL cache of per-user preference vectors.
+
+Entries are keyed by user id and stamped with a "history version" - the time
+of the user's latest order plus the length of their ``viewed_products`` array.
+A lookup only hits when the stored version still matches, so a new order or
+view can never be served stale; order/view events patch cached entries in
+place so the next request hits without re-scanning the history.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class PreferenceCache:
+    def __init__(self, maxsize=10000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # user_id -> (version, preferences, stored_at)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, user_id, version):
+        """Cached preferences for ``user_id`` at ``version``, or None."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != version or time.time() - entry[2] > self.ttl:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, user_id, version, preferences):
+        with self._lock:
+            self._entries[user_id] = (version, dict(preferences), time.time())
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def record_order(self, user_id, product_ids, created_at=None, weight=2):
+        """Patch a cached entry with a new order, or drop it if the order time is unknown.
+
+        An order no newer than the entry's latest order may already be in the
+        cached vector (the entry was built after it reached Mongo), so the
+        entry is dropped rather than counting it twice.
+        """
+        if created_at is None:
+            self.invalidate(user_id)
+            return
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+            (latest_order, view_count), preferences, stored_at = entry
+            if latest_order is not None and created_at <= latest_order:
+                del self._entries[user_id]
+                return
+            for product_id in product_ids:
+                product_id = str(product_id)
+                preferences[product_id] = preferences.get(product_id, 0) + weight
+            self._entries[user_id] = ((created_at, view_count), preferences, stored_at)
+
+    def record_view(self, user_id, product_id, weight=1):
+        """Patch a cached entry with one more viewed product."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+            (latest_order, view_count), preferences, stored_at = entry
+            product_id = str(product_id)
+            preferences[product_id] = preferences.get(product_id, 0) + weight
+            self._entries[user_id] = ((latest_order, view_count + 1), preferences, stored_at)
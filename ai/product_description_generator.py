@@ -1,5 +1,9 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from response_encoding import install_json_provider
+from metrics import install_metrics, outbound_http
+from query_profiler import install_query_profiler
+from startup import StartupReport, install_startup
 # import openai # Removing OpenAI import
 from pymongo import MongoClient
 import os
@@ -19,9 +23,10 @@ GEMINI_API_KEY = ""
 
 app = Flask(__name__)
 CORS(app)
+install_json_provider(app)
+install_metrics(app, "product_description_generator")
+install_query_profiler(app)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # MongoDB connection
@@ -29,13 +34,16 @@ client = MongoClient(os.getenv('MONGODB_URI'))
 db = client['test']
 products_collection = db['products']
 
-def generate_product_description(product_data):
-    """
-    Generate an AI-enhanced product description using Google Gemini API
-    """
-    try:
-        # Create a prompt for the AI
-        prompt_text = f"""
+# Gemini API endpoint; overridable so load tests can point at a local stand-in.
+GEMINI_API_URL = os.getenv(
+    "GEMINI_API_URL",
+    "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent",
+)
+
+def gemini_request(product_data):
+    """URL and JSON payload for one description request (shared with async_service)."""
+    # Create a prompt for the AI
+    prompt_text = f"""
 Create a compelling product description for the following product:
 Name: {product_data.get('name', '')}
 Category: {product_data.get('category', '')}
@@ -49,38 +57,50 @@ Generate a new description that:
 4. Is between 100-150 words
 5. Maintains a professional tone
 """
+    gemini_api_url = f"{GEMINI_API_URL}?key={GEMINI_API_KEY}"
+
+    # Request payload for Gemini API
+    payload = {
+        "contents": [
+            {
+                "parts": [
+                    {
+                        "text": prompt_text
+                    }
+                ]
+            }
+        ]
+    }
+    return gemini_api_url, payload
+
+def parse_gemini_response(response_data):
+    """The generated text; raises KeyError/IndexError if the response has none."""
+    # Assuming the response structure is like the documentation
+    return response_data['candidates'][0]['content']['parts'][0]['text']
 
-        # Gemini API Endpoint
-        gemini_api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
-
-        # Request payload for Gemini API
-        payload = {
-            "contents": [
-                {
-                    "parts": [
-                        {
-                            "text": prompt_text
-                        }
-                    ]
-                }
-            ]
-        }
+def generate_product_description(product_data):
+    """
+    Generate an AI-enhanced product description using Google Gemini API
+    """
+    response_data = None
+    try:
+        gemini_api_url, payload = gemini_request(product_data)
 
         # Call Gemini API using requests
-        response = requests.post(gemini_api_url, json=payload)
-        response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
+        with outbound_http("gemini"):
+            response = requests.post(gemini_api_url, json=payload)
+            response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
 
         # Extract the generated description from the response
         response_data = response.json()
-        # Assuming the response structure is like the documentation
-        new_description = response_data['candidates'][0]['content']['parts'][0]['text']
+        new_description = parse_gemini_response(response_data)
 
         return new_description
 
     except requests.exceptions.RequestException as req_err:
         logger.error(f"Error calling Gemini API: {req_err}")
         return None
-    except KeyError as key_err:
+    except (KeyError, IndexError) as key_err:
         logger.error(f"Error parsing Gemini API response (missing key): {key_err}")
         logger.error(f"Full response: {response_data}")
         return None
@@ -96,14 +116,13 @@ def generate_description():
     try:
         data = request.get_json()
         product_id = data.get('productId')
-        logger.info(f"Received request data: {data}")
+        logger.info("Description requested", extra={"fields": {"productId": product_id}})
 
         if not product_id:
             return jsonify({"error": "Product ID is required"}), 400
 
         # Get product data from MongoDB
         product = products_collection.find_one({"_id": ObjectId(product_id)})
-        logger.info(f"Retrieved product data: {product}")
         if not product:
             return jsonify({"error": "Product not found"}), 404
 
@@ -198,5 +217,11 @@ def health_check():
         "service": "AI Product Description Generator"
     })
 
+# Logging for every process serving ``app``: called by gunicorn.conf.py in
+# each worker, and by __main__ below.
+startup_report = StartupReport("product_description_generator")
+start = install_startup(app, startup_report)
+
 if __name__ == '__main__':
+    start(wait=True)
     app.run(host='0.0.0.0', port=5002)
@@ -0,0 +1,231 @@
+"""
+Long-lived TF-IDF index over product descriptions.
+
+The index is fitted once from the products collection and then kept current by
+re-reading only the products whose ``updatedAt`` moved past the last refresh,
+so the recommendation endpoints never refit the vectorizer on the request path.
+Deleted products are dropped when a refresh finds the index holding more
+products than the collection. Requests that meet an unknown id may ask for a
+refresh with ``request_refresh()``, which runs at most once per
+``REQUEST_REFRESH_SECONDS`` and never makes a request wait for another's.
+"""
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+# Only the fields the index needs; keeps the embedded reviews off the wire.
+INDEX_PROJECTION = {"_id": 1, "description": 1, "updatedAt": 1}
+
+IndexSnapshot = namedtuple("IndexSnapshot", ["matrix", "product_ids", "row_of"])
+
+REQUEST_REFRESH_SECONDS = float(os.getenv("PRODUCT_INDEX_REQUEST_REFRESH_SECONDS", "5"))
+
+
+class ProductTextIndex:
+    """TF-IDF matrix of product descriptions with an id -> row map.
+
+    Rows are L2-normalised by the vectorizer, so the cosine similarity between
+    two products is the dot product of their rows.
+    """
+
+    def __init__(self, collection, refit_ratio=0.2):
+        self.collection = collection
+        # Fraction of the catalog that may change before the vocabulary and
+        # idf weights are refitted from scratch instead of patched.
+        self.refit_ratio = refit_ratio
+        self.vectorizer = None
+        self.matrix = None
+        self.product_ids = []
+        self.row_of = {}
+        self.last_updated = None
+        self._changed_since_fit = 0
+        self._last_request_refresh = 0.0
+        # ``_lock`` is held only to read or swap the published fields, so
+        # snapshot() never waits on Mongo; ``_updating`` admits one writer
+        # (build, refresh, apply_changes, remove) at a time.
+        self._lock = threading.Lock()
+        self._updating = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self.matrix is not None
+
+    def snapshot(self):
+        """Return a consistent view of the index for one request."""
+        with self._lock:
+            return IndexSnapshot(self.matrix, self.product_ids, self.row_of)
+
+    def build(self):
+        """Fit the vectorizer over the whole catalog."""
+        with self._updating:
+            return self._build()
+
+    def _build(self):
+        # scikit-learn takes most of a second to import; only building needs it.
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        docs = list(self.collection.find({}, INDEX_PROJECTION))
+        vectorizer = TfidfVectorizer()
+        try:
+            matrix = vectorizer.fit_transform(_descriptions(docs)).tocsr()
+        except ValueError:
+            # Empty catalog or no usable terms in any description.
+            vectorizer = None
+            matrix = sparse.csr_matrix((len(docs), 0))
+
+        product_ids = [str(doc["_id"]) for doc in docs]
+        with self._lock:
+            self.vectorizer = vectorizer
+            self.matrix = matrix
+            self.product_ids = product_ids
+            self.row_of = {pid: row for row, pid in enumerate(product_ids)}
+            self.last_updated = _latest_update(docs, None)
+            self._changed_since_fit = 0
+        logger.info("Product index built: %d products, %d terms", *matrix.shape)
+        return len(product_ids)
+
+    def ensure_built(self):
+        if not self.ready:
+            with self._updating:
+                if not self.ready:
+                    self._build()
+
+    def refresh(self):
+        """Pull products updated since the last build or refresh, and drop deleted ones."""
+        with self._updating:
+            if not self.ready or self.last_updated is None:
+                return self._build()
+            changed = list(self.collection.find(
+                {"updatedAt": {"$gt": self.last_updated}}, INDEX_PROJECTION
+            ))
+            count = self.apply_changes(changed)
+            # Every current product has a row by now, so extra rows mean deletions.
+            if len(self.product_ids) > self.collection.estimated_document_count():
+                existing = {str(doc["_id"]) for doc in self.collection.find({}, {"_id": 1})}
+                count += self.remove([pid for pid in self.product_ids if pid not in existing])
+            return count
+
+    def request_refresh(self, min_interval=REQUEST_REFRESH_SECONDS):
+        """``refresh()`` for a request that met an unknown id; 0 if one ran too recently or is running."""
+        if time.time() - self._last_request_refresh < min_interval:
+            return 0
+        if not self._updating.acquire(blocking=False):
+            return 0
+        try:
+            self._last_request_refresh = time.time()
+            return self.refresh()
+        finally:
+            self._updating.release()
+
+    def apply_changes(self, docs):
+        """Patch the matrix with changed or new product documents.
+
+        This is also the entry point for a change-stream consumer, which can
+        hand over the full documents it receives.
+        """
+        if not docs:
+            return 0
+        with self._updating:
+            if not self.ready or self.vectorizer is None:
+                return self._build()
+            n_rows = self.matrix.shape[0]
+            if self._changed_since_fit + len(docs) > self.refit_ratio * max(n_rows, 1):
+                return self._build()
+
+            # The new matrix is computed outside ``_lock``; readers keep the old one meanwhile.
+            new_rows = self.vectorizer.transform(_descriptions(docs)).tocsr()
+            stacked = sparse.vstack([self.matrix, new_rows], format="csr")
+
+            order = np.arange(n_rows)
+            product_ids = list(self.product_ids)
+            row_of = dict(self.row_of)
+            appended = []
+            for offset, doc in enumerate(docs):
+                pid = str(doc["_id"])
+                if pid in row_of:
+                    order[row_of[pid]] = n_rows + offset
+                else:
+                    row_of[pid] = len(product_ids)
+                    product_ids.append(pid)
+                    appended.append(n_rows + offset)
+            matrix = stacked[np.concatenate([order, appended]).astype(np.intp)]
+
+            with self._lock:
+                self.matrix = matrix
+                self.product_ids = product_ids
+                self.row_of = row_of
+            self.last_updated = _latest_update(docs, self.last_updated)
+            self._changed_since_fit += len(docs)
+        logger.info("Product index refreshed with %d changed products", len(docs))
+        return len(docs)
+
+    def remove(self, product_ids):
+        """Drop the rows of deleted products; also the entry point for change-stream deletes."""
+        with self._updating:
+            gone = {str(pid) for pid in product_ids} & self.row_of.keys()
+            if not gone:
+                return 0
+            keep = np.array([pid not in gone for pid in self.product_ids], dtype=bool)
+            matrix = self.matrix[np.flatnonzero(keep)]
+            kept_ids = [pid for pid in self.product_ids if pid not in gone]
+            with self._lock:
+                self.matrix = matrix
+                self.product_ids = kept_ids
+                self.row_of = {pid: row for row, pid in enumerate(kept_ids)}
+            self._changed_since_fit += len(gone)
+        logger.info("Product index dropped %d deleted products", len(gone))
+        return len(gone)
+
+    def similarities(self, row, snapshot=None):
+        """Cosine similarity of one indexed product against every product."""
+        snapshot = snapshot or self.snapshot()
+        matrix = snapshot.matrix
+        return (matrix @ matrix[row].T).toarray().ravel()
+
+    def start_background_refresh(self, interval=60, on_refresh=None):
+        """Poll for updated products every ``interval`` seconds.
+
+        ``on_refresh()`` is called in the same thread after each refresh, for
+        structures derived from the index.
+        """
+        if self._thread and self._thread.is_alive():
+            return self._thread
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh()
+                    if on_refresh is not None:
+                        on_refresh()
+                except Exception:
+                    logger.exception("Product index refresh failed")
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name="product-index-refresh", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop_background_refresh(self):
+        self._stop.set()
+
+
+def _descriptions(docs):
+    return [doc.get("description") or "" for doc in docs]
+
+
+def _latest_update(docs, current):
+    latest = current
+    for doc in docs:
+        updated = doc.get("updatedAt")
+        if updated is not None and (latest is None or updated > latest):
+            latest = updated
+    return latest
@@ -0,0 +1,76 @@
+"""
+Bulk product resolution for order histories.
+
+Recommendation helpers used to call ``find_one()`` for every order item. The
+resolver collects all product ids up front, serves what it can from the
+in-process catalog snapshot and fetches the rest with a single ``$in`` query,
+counting the queries it issues so tests can hold it to one per request.
+"""
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+def collect_product_ids(order_history):
+    """Product ids (as strings, duplicates kept) from an order history.
+
+    Accepts full orders (``{"orderItems": [{"product": ...}]}``) as well as the
+    flat item list the Node backend sends (``[{"product": ...}]``).
+    """
+    product_ids = []
+    for entry in order_history or []:
+        items = entry.get("orderItems") if "orderItems" in entry else [entry]
+        for item in items or []:
+            product = item.get("product") or item.get("productId")
+            if product is not None:
+                product_ids.append(str(product))
+    return product_ids
+
+
+class ProductResolver:
+    """Resolves many product ids with at most one Mongo query per call."""
+
+    def __init__(self, collection, projection=None, catalog=None):
+        self.collection = collection
+        self.projection = projection
+        self.catalog = catalog
+        self.query_count = 0
+        self.hits = 0    # ids served from the catalog snapshot
+        self.misses = 0  # ids that had to be queried
+
+    def resolve(self, product_ids):
+        """Return ``{product_id: product}`` for the ids that exist."""
+        wanted = list(dict.fromkeys(str(pid) for pid in product_ids))
+        resolved = {}
+        if self.catalog is not None and wanted:
+            snapshot = self.catalog.get()
+            known = [pid for pid in wanted if pid in snapshot.row_of]
+            resolved.update(zip(known, snapshot.get_records(snapshot.rows(known))))
+
+        missing = []
+        for pid in wanted:
+            if pid not in resolved:
+                try:
+                    missing.append(ObjectId(pid))
+                except (InvalidId, TypeError):
+                    continue
+        self.hits += len(resolved)
+        self.misses += len(missing)
+        if missing:
+            self.query_count += 1
+            for product in self.collection.find({"_id": {"$in": missing}}, self.projection):
+                resolved[str(product["_id"])] = product
+        return resolved
+
+
+def category_price_profile(order_history, resolver):
+    """Categories and per-item prices of the products in an order history."""
+    product_ids = collect_product_ids(order_history)
+    products = resolver.resolve(product_ids)
+    categories = set()
+    prices = []
+    for pid in product_ids:
+        product = products.get(pid)
+        if product:
+            categories.add(product.get("category"))
+            prices.append(product.get("price", 0))
+    return categories, prices
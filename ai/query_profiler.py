@@ -0,0 +1,246 @@
+"""
+Opt-in Mongo query profiler with N+1 detection.
+
+Every Mongo command a request sends is reduced to a shape - command,
+collection and the filter (or pipeline) with every value replaced by ``?`` -
+and timed. A shape that repeats ``N_PLUS_ONE_THRESHOLD`` or more times in one
+request is almost always a query issued inside a loop, and is reported as an
+N+1 candidate.
+
+Set ``QUERY_PROFILER=1`` and every service that called
+``install_query_profiler(app)`` answers with an ``X-Query-Profile`` header
+
+    X-Query-Profile: queries=12; mongo_ms=8.4; n+1=find products {"_id":"?"} x10
+
+and logs a warning with the full report when it finds N+1 candidates.
+Without the variable, requests are not profiled at all.
+
+Tests hold endpoints to a query budget with ``profile_queries()``:
+
+    with profile_queries() as profile:
+        client.get("/analytics/seller/...")
+    profile.assert_budget(max_queries=2, max_repeats=1)
+
+The pymongo listener sees real clients; mongomock collections can be wrapped
+in ``ProfiledCollection`` to be counted the same way.
+"""
+import contextvars
+import json
+import logging
+import os
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+N_PLUS_ONE_THRESHOLD = int(os.getenv("QUERY_PROFILER_N_PLUS_ONE", "3"))
+
+# Where each command keeps the part of the query that varies per call.
+_FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "aggregate": "pipeline",
+    "findAndModify": "query",
+}
+_STATEMENT_FIELDS = {"update": ("updates", "q"), "delete": ("deletes", "q")}
+
+# Cursor batches, not new queries; counted but never N+1 candidates.
+_CONTINUATIONS = {"getMore", "killCursors"}
+
+
+def _normalize(value):
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if all(not isinstance(item, (dict, list, tuple)) for item in value):
+            return "?"  # $in lists and the like: one shape whatever their length
+        return [_normalize(item) for item in value]
+    return "?"
+
+
+def command_shape(command_name, command):
+    """``"find products {"_id": "?"}"`` - the query with its values stripped."""
+    collection = command.get(command_name)
+    if command_name == "getMore":
+        collection = command.get("collection")
+    if not isinstance(collection, str):
+        collection = ""
+    query = None
+    if command_name in _FILTER_FIELDS:
+        query = command.get(_FILTER_FIELDS[command_name])
+    elif command_name in _STATEMENT_FIELDS:
+        statements_field, query_field = _STATEMENT_FIELDS[command_name]
+        statements = command.get(statements_field) or [{}]
+        query = statements[0].get(query_field)
+    shape = f"{command_name} {collection}".rstrip()
+    if query is not None:
+        shape += " " + json.dumps(_normalize(query), sort_keys=True, separators=(",", ":"))
+    return shape
+
+
+class QueryProfile:
+    """Shapes and timings of the queries issued while it was active."""
+
+    def __init__(self):
+        self.queries = []  # (shape, seconds)
+        self._pending = {}
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def seconds(self):
+        return sum(seconds for _, seconds in self.queries)
+
+    def record(self, shape, seconds=0.0):
+        self.queries.append((shape, seconds))
+
+    def shapes(self):
+        """``{shape: (count, seconds)}`` in first-seen order."""
+        totals = {}
+        for shape, seconds in self.queries:
+            count, total = totals.get(shape, (0, 0.0))
+            totals[shape] = (count + 1, total + seconds)
+        return totals
+
+    def n_plus_one(self, threshold=None):
+        """Shapes repeated at least ``threshold`` times, most repeated first."""
+        threshold = N_PLUS_ONE_THRESHOLD if threshold is None else threshold
+        candidates = [
+            (shape, count, seconds) for shape, (count, seconds) in self.shapes().items()
+            if count >= threshold and shape.split(" ", 1)[0] not in _CONTINUATIONS
+        ]
+        return sorted(candidates, key=lambda c: -c[1])
+
+    def summary(self):
+        """One-line form for the response header."""
+        parts = [f"queries={self.count}", f"mongo_ms={self.seconds * 1000:.1f}"]
+        parts += [f"n+1={shape} x{count}" for shape, count, _ in self.n_plus_one()]
+        return "; ".join(parts)
+
+    def report(self):
+        return {
+            "queries": self.count,
+            "mongoMs": round(self.seconds * 1000, 2),
+            "shapes": [{"shape": shape, "count": count, "ms": round(seconds * 1000, 2)}
+                       for shape, (count, seconds) in self.shapes().items()],
+            "nPlusOne": [shape for shape, _, _ in self.n_plus_one()],
+        }
+
+    def assert_budget(self, max_queries, max_repeats=None):
+        """Fail with the per-shape report if the budget was exceeded."""
+        repeats = max(((count, shape) for shape, (count, _) in self.shapes().items()), default=(0, None))
+        if self.count > max_queries or (max_repeats is not None and repeats[0] > max_repeats):
+            lines = [f"{count:>4} x {shape}" for shape, (count, _) in self.shapes().items()]
+            budget = f"max {max_queries} queries" + (f", {max_repeats} per shape" if max_repeats is not None else "")
+            raise AssertionError(f"Query budget exceeded ({self.count} queries; {budget}):\n" + "\n".join(lines))
+
+
+_active = contextvars.ContextVar("query_profile", default=None)
+
+
+@contextmanager
+def profile_queries():
+    """Profile the Mongo queries issued in this context (thread or task)."""
+    profile = QueryProfile()
+    token = _active.set(profile)
+    try:
+        yield profile
+    finally:
+        _active.reset(token)
+
+
+def current_profile():
+    return _active.get()
+
+
+class _ProfilerListener(monitoring.CommandListener):
+    def started(self, event):
+        profile = _active.get()
+        if profile is not None:
+            profile._pending[(event.connection_id, event.request_id)] = command_shape(
+                event.command_name, event.command)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        profile = _active.get()
+        if profile is not None:
+            shape = profile._pending.pop((event.connection_id, event.request_id), event.command_name)
+            profile.record(shape, event.duration_micros / 1e6)
+
+
+monitoring.register(_ProfilerListener())
+
+
+class ProfiledCollection:
+    """Records a wrapped (e.g. mongomock) collection's queries into the active profile."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.name = collection.name
+
+    def _record(self, command_name, query):
+        profile = _active.get()
+        if profile is not None:
+            profile.record(command_shape(command_name, {command_name: self.name, **query}))
+
+    def find(self, filter=None, *args, **kwargs):
+        self._record("find", {"filter": filter or {}})
+        return self.collection.find(filter, *args, **kwargs)
+
+    def find_one(self, filter=None, *args, **kwargs):
+        self._record("find", {"filter": filter or {}})
+        return self.collection.find_one(filter, *args, **kwargs)
+
+    def aggregate(self, pipeline, *args, **kwargs):
+        self._record("aggregate", {"pipeline": pipeline})
+        return self.collection.aggregate(pipeline, *args, **kwargs)
+
+    def count_documents(self, filter, *args, **kwargs):
+        self._record("aggregate", {"pipeline": [{"$match": filter}, {"$group": {"_id": 1, "n": {"$sum": 1}}}]})
+        return self.collection.count_documents(filter, *args, **kwargs)
+
+    def update_one(self, filter, *args, **kwargs):
+        self._record("update", {"updates": [{"q": filter}]})
+        return self.collection.update_one(filter, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+def install_query_profiler(app, enabled=None):
+    """Profile every request of ``app`` when ``QUERY_PROFILER`` is set (or ``enabled``)."""
+    if enabled is None:
+        enabled = os.getenv("QUERY_PROFILER", "").lower() in ("1", "true", "yes")
+    if not enabled:
+        return app
+
+    from flask import g, request
+
+    @app.before_request
+    def _start_profile():
+        profile = QueryProfile()
+        g._query_profile = (profile, _active.set(profile))
+
+    @app.after_request
+    def _finish_profile(response):
+        entry = g.pop("_query_profile", None)
+        if entry is None:
+            return response
+        profile, token = entry
+        _active.reset(token)
+        response.headers["X-Query-Profile"] = profile.summary()
+        if profile.n_plus_one():
+            endpoint = request.url_rule.rule if request.url_rule is not None else request.path
+            logger.warning("N+1 query candidates", extra={"fields": {"endpoint": endpoint, **profile.report()}})
+        return response
+
+    return app
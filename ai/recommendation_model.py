@@ -1,17 +1,28 @@
+from startup import StartupReport, install_startup, readiness_response
+startup_report = StartupReport("recommendation_model")
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from response_encoding import install_json_provider
+from metrics import install_metrics, register_cache
+from query_profiler import install_query_profiler
 from pymongo import MongoClient
 from bson import ObjectId
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
-import pandas as pd
 from datetime import datetime, timedelta
+from collections import namedtuple
 import logging
 import random
+import threading
+import time
 
 app = Flask(__name__)
 CORS(app)
+install_json_provider(app)
+install_metrics(app, "recommendation_model")
+install_query_profiler(app)
+
+logger = logging.getLogger(__name__)
 
 # logging.basicConfig(level=logging.INFO)
 
@@ -58,6 +69,17 @@ CORS(app)
 
 from pymongo import MongoClient
 from bson.objectid import ObjectId
+from product_index import ProductTextIndex
+from ann_index import ExactSearch, make_engine
+from catalog import CatalogCache, CATALOG_PROJECTION
+from copurchase import CoPurchaseMatrix
+from popularity import PopularityRanking
+from als_model import ALSModelStore
+from product_lookup import ProductResolver, category_price_profile
+from preference_cache import PreferenceCache
+from batch_recommend import batch_top_k, parse_batch_request
+from neighbor_table import NeighborTableStore
+startup_report.mark("imports")
 
 client = MongoClient("")
 db = client["test"]
@@ -65,6 +87,88 @@ products_collection = db["products"]
 users_collection = db["users"]
 orders_collection = db["orders"]
 
+# Built on first use (or at startup below) and refreshed from updatedAt changes.
+product_index = ProductTextIndex(products_collection)
+
+# Columnar snapshot shared by the filtering helpers below; reloaded every 5 minutes.
+catalog = CatalogCache(products_collection, ttl=300)
+
+# Per-user preference vectors, validated against the user's history version.
+preference_cache = PreferenceCache(maxsize=10000, ttl=300)
+
+# Resolves order-history products from the catalog, else with one $in query.
+product_resolver = ProductResolver(products_collection, CATALOG_PROJECTION, catalog)
+
+# Item-item co-purchase counts from orders; grows as new orders arrive.
+copurchase = CoPurchaseMatrix(orders_collection)
+
+# Bayesian-average popularity, overall and per category; refreshed in the background.
+popularity = PopularityRanking(products_collection, orders_collection)
+
+# Latest ALS factors written by als_trainer.py, memory-mapped and hot-swapped.
+als_models = ALSModelStore()
+
+# Precomputed top-K neighbours for content-only queries, built by
+# ``python neighbor_table.py`` and reloaded when the file changes.
+neighbor_tables = NeighborTableStore()
+
+register_cache("catalog", catalog)
+register_cache("preferences", preference_cache)
+register_cache("product_resolver", product_resolver)
+startup_report.mark("clients and models")
+
+# Rows the engine returns per query before collaborative re-ranking.
+CANDIDATE_POOL_SIZE = 50
+
+# The index snapshot and the engine built over its matrix, swapped together
+# so a request never pairs rows of one snapshot with an engine of another.
+SearchState = namedtuple("SearchState", ["snapshot", "engine"])
+_search_state = None
+_search_lock = threading.Lock()
+
+def rebuild_search_engine():
+    """Build the engine for the current index snapshot, if it changed, and swap both in.
+
+    Runs at warmup and in the product index refresh thread, never per request.
+    """
+    global _search_state
+    with _search_lock:
+        product_index.ensure_built()
+        snapshot = product_index.snapshot()
+        state = _search_state
+        if state is None or state.snapshot.matrix is not snapshot.matrix:
+            state = SearchState(snapshot, make_engine(snapshot.matrix))
+            _search_state = state
+        return state
+
+def search_state():
+    """The current (snapshot, engine) pair, built on first use before warmup."""
+    return _search_state or rebuild_search_engine()
+
+# Everything the request path would otherwise build on its first call.
+WARMUP_STEPS = [
+    ("catalog", catalog.get),
+    ("product_index", product_index.ensure_built),
+    ("search_engine", rebuild_search_engine),
+    ("copurchase", copurchase.ensure_built),
+    ("popularity", popularity.ensure_built),
+    ("als_model", als_models.get),
+    ("neighbor_table", neighbor_tables.get),
+]
+
+def warm_up():
+    """Build the indexes and caches before serving; see startup.py."""
+    return startup_report.warm_up(WARMUP_STEPS)
+
+def start_background_refresh():
+    product_index.start_background_refresh(on_refresh=rebuild_search_engine)
+    copurchase.start_background_refresh()
+    popularity.start_background_refresh()
+
+# Warmup and refreshers for every process serving ``app``: called by
+# gunicorn.conf.py in each worker, and by __main__ below.
+start = install_startup(app, startup_report, WARMUP_STEPS, on_ready=start_background_refresh)
+
 def get_user_purchase_history(user_id):
     """Get user's purchase history"""
     orders = list(orders_collection.find({"user": ObjectId(user_id)}))
@@ -75,9 +179,28 @@ def get_user_view_history(user_id):
     user = users_collection.find_one({"_id": ObjectId(user_id)})
     return user.get('viewed_products', []) if user else []
 
+def get_history_version(user_id):
+    """(latest order time, number of views) - changes whenever the user's history does."""
+    latest = orders_collection.find_one(
+        {"user": ObjectId(user_id)}, {"createdAt": 1}, sort=[("createdAt", -1)]
+    )
+    views = list(users_collection.aggregate([
+        {"$match": {"_id": ObjectId(user_id)}},
+        {"$project": {"count": {"$size": {"$ifNull": ["$viewed_products", []]}}}}
+    ]))
+    return (
+        latest.get("createdAt") if latest else None,
+        views[0]["count"] if views else 0
+    )
+
 def calculate_user_preferences(user_id):
     """Calculate user preferences based on purchase and view history"""
-    purchases = get_user_purchase_history(user_id)
+    version = get_history_version(user_id)
+    cached = preference_cache.get(user_id, version)
+    if cached is not None:
+        return cached
+
+    purchases = orders_collection.find({"user": ObjectId(user_id)}, {"orderItems.product": 1})
     views = get_user_view_history(user_id)
     
     # Combine purchase and view data
@@ -91,18 +214,63 @@ def calculate_user_preferences(user_id):
         product_id = str(view)
         preferences[product_id] = preferences.get(product_id, 0) + 1
     
+    preference_cache.put(user_id, version, preferences)
     return preferences
 
-def serialize_objectids(data):
-    """Recursively convert ObjectId instances to strings in a dictionary or list."""
-    if isinstance(data, dict):
-        return {key: serialize_objectids(value) for key, value in data.items()}
-    elif isinstance(data, list):
-        return [serialize_objectids(element) for element in data]
-    elif isinstance(data, ObjectId):
-        return str(data)
-    else:
-        return data
+@app.route('/events/order', methods=['POST'])
+def order_event():
+    """Called when an order is placed: {userId, productIds, createdAt (ISO, optional)}."""
+    data = request.get_json()
+    user_id = data.get('userId')
+    if not user_id:
+        return jsonify({"error": "Missing userId"}), 400
+    created_at = data.get('createdAt')
+    if created_at:
+        created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00')).replace(tzinfo=None)
+    product_ids = data.get('productIds', [])
+    preference_cache.record_order(user_id, product_ids, created_at)
+    quantities = {}
+    for product_id in product_ids:
+        quantities[product_id] = quantities.get(product_id, 0) + 1
+    popularity.record_order(quantities)
+    return jsonify({"success": True})
+
+@app.route('/events/view', methods=['POST'])
+def view_event():
+    """Called when a logged-in user views a product: {userId, productId}."""
+    data = request.get_json()
+    user_id = data.get('userId')
+    product_id = data.get('productId')
+    if not user_id or not product_id:
+        return jsonify({"error": "Missing userId or productId"}), 400
+    preference_cache.record_view(user_id, product_id)
+    return jsonify({"success": True})
+
+@app.route('/events/review', methods=['POST'])
+def review_event():
+    """Called when a review is posted: {productId, rating}."""
+    data = request.get_json()
+    product_id = data.get('productId')
+    rating = data.get('rating')
+    if not product_id or rating is None:
+        return jsonify({"error": "Missing productId or rating"}), 400
+    popularity.record_review(product_id, float(rating))
+    return jsonify({"success": True})
+
+def fetch_products_in_order(product_ids):
+    """Return products in the given order, from the catalog snapshot where possible.
+
+    Products newer than the snapshot are fetched with a single query.
+    """
+    snapshot = catalog.get()
+    known = [pid for pid in product_ids if pid in snapshot.row_of]
+    by_id = dict(zip(known, snapshot.get_records(snapshot.rows(known))))
+    missing = [ObjectId(pid) for pid in product_ids if pid not in by_id]
+    if missing:
+        for doc in products_collection.find({"_id": {"$in": missing}}, CATALOG_PROJECTION):
+            # ObjectIds are left for the JSON provider to encode
+            by_id[str(doc["_id"])] = doc
+    return [by_id[pid] for pid in product_ids if pid in by_id]
 
 @app.route('/recommend', methods=['POST'])
 def recommend():
@@ -114,58 +282,174 @@ def recommend():
         if not product_id:
             return jsonify({"error": "Missing productId"}), 400
 
-        # Get all products
-        all_products = list(products_collection.find({}))
-        if not all_products:
+        # Content-only queries are answered from the precomputed table when
+        # it knows the product; brand-new products fall through to live scoring.
+        table = neighbor_tables.get()
+        if not user_id and table is not None and product_id in table:
+            similar_ids = [pid for pid, _ in table.lookup(product_id, 6)]
+            return jsonify(fetch_products_in_order(similar_ids))
+
+        snapshot, engine = search_state()
+        target_index = snapshot.row_of.get(product_id)
+        if target_index is None and ObjectId.is_valid(product_id):
+            # The product may have been created after the last refresh;
+            # unknown ids refresh the index at most every few seconds.
+            product_index.request_refresh()
+            snapshot = product_index.snapshot()
+            target_index = snapshot.row_of.get(product_id)
+            if snapshot.matrix is not engine.matrix:
+                # The refresh thread rebuilds the configured engine; until
+                # then the new snapshot is scored exactly.
+                engine = make_engine(snapshot.matrix, ExactSearch.name)
+        if not snapshot.product_ids:
             return jsonify([])
-
-        # Get target product
-        target_product = next((p for p in all_products if str(p['_id']) == product_id), None)
-        if not target_product:
+        if target_index is None:
             return jsonify({"error": "Product not found"}), 404
 
-        # Content-based filtering
-        descriptions = [p.get('description', '') for p in all_products]
-        vectorizer = TfidfVectorizer()
-        tfidf_matrix = vectorizer.fit_transform(descriptions)
-        
-        target_index = all_products.index(target_product)
-        content_similarities = cosine_similarity(tfidf_matrix[target_index], tfidf_matrix).flatten()
+        # Content-based candidates from the configured search engine
+        query = snapshot.matrix[target_index]
+        candidate_rows, content_similarities = engine.search(
+            query, CANDIDATE_POOL_SIZE, exclude=target_index
+        )
 
         # Collaborative filtering (if user_id provided)
         if user_id:
-            user_preferences = calculate_user_preferences(user_id)
-            collaborative_scores = np.zeros(len(all_products))
-            
-            for i, product in enumerate(all_products):
-                product_id = str(product['_id'])
-                if product_id in user_preferences:
-                    collaborative_scores[i] = user_preferences[product_id]
+            preferred_rows = user_preference_rows(user_id, snapshot)
+            preferred_rows.pop(target_index, None)
+
+            # Products the user or co-purchasers interacted with are scored
+            # even when the engine did not return them as content candidates.
+            candidate_set = set(candidate_rows.tolist())
+            extra_rows = np.array(
+                [row for row in preferred_rows if row not in candidate_set],
+                dtype=candidate_rows.dtype,
+            )
+            if len(extra_rows):
+                extra_scores = (snapshot.matrix[extra_rows] @ query.T).toarray().ravel()
+                candidate_rows = np.concatenate([candidate_rows, extra_rows])
+                content_similarities = np.concatenate([content_similarities, extra_scores])
+            collaborative_scores = np.array(
+                [preferred_rows.get(row, 0) for row in candidate_rows.tolist()], dtype=float
+            )
 
             # Combine content and collaborative scores
             final_scores = 0.7 * content_similarities + 0.3 * collaborative_scores
         else:
             final_scores = content_similarities
 
-        # Get top 6 similar products excluding current product
-        similar_indices = final_scores.argsort()[-7:][::-1]
-        recommended = []
-        for i in similar_indices:
-            if i != target_index:
-                product = all_products[i].copy()  # Create a copy to avoid modifying the original
-                serialized_product = serialize_objectids(product) # Recursively serialize ObjectIds
-                recommended.append(serialized_product)
+        # Get top 6 similar products (the engine already excluded the current one)
+        top = np.argsort(-final_scores, kind="stable")[:6]
+        similar_ids = [snapshot.product_ids[candidate_rows[i]] for i in top]
+        recommended = fetch_products_in_order(similar_ids)
 
         return jsonify(recommended)
 
     except Exception as e:
-        logging.exception("Recommendation error:")
+        logger.exception("Recommendation error")
         return jsonify({"error": str(e)}), 500
 
-def serialize_product(product):
-    """Serialize MongoDB document to JSON"""
-    product['_id'] = str(product['_id'])
-    return product
+# A product bought most often alongside the user's history counts like one purchase.
+COPURCHASE_WEIGHT = 2.0
+
+def user_preference_rows(user_id, snapshot):
+    """Collaborative weight per index row for a user.
+
+    Users covered by the current ALS model are scored with one factor dot
+    product. Everyone else gets their own purchase/view weights plus what
+    other customers bought together with those products (once the
+    co-purchase matrix has been built at warmup). Either way the strongest
+    signal is scaled to ``COPURCHASE_WEIGHT``.
+    """
+    model = als_models.get()
+    if model is not None and model.has_user(user_id):
+        return _scaled_rows(model.recommend(user_id, CANDIDATE_POOL_SIZE), snapshot)
+
+    user_preferences = calculate_user_preferences(user_id)
+    preferred_rows = {}
+    for preferred_id, weight in user_preferences.items():
+        row = snapshot.row_of.get(preferred_id)
+        if row is not None:
+            preferred_rows[row] = weight
+
+    # Built at warmup; until then there is simply no co-purchase signal.
+    if copurchase.ready:
+        for row, weight in _scaled_rows(copurchase.score(user_preferences).items(), snapshot).items():
+            preferred_rows[row] = preferred_rows.get(row, 0) + weight
+    return preferred_rows
+
+def _scaled_rows(scored_ids, snapshot):
+    """Map ``(product_id, score)`` pairs to index rows, scaled to ``COPURCHASE_WEIGHT``."""
+    scored_ids = [(pid, score) for pid, score in scored_ids if score > 0]
+    if not scored_ids:
+        return {}
+    scale = COPURCHASE_WEIGHT / max(score for _, score in scored_ids)
+    return {
+        snapshot.row_of[pid]: score * scale
+        for pid, score in scored_ids
+        if pid in snapshot.row_of
+    }
+
+def get_als_recommendations(user_id, limit=8, exclude=()):
+    """Products for a user straight from the ALS factors, or None if the model does not know them.
+
+    Products the user had bought by training time are left out, as are the
+    ids in ``exclude`` (e.g. the order history the client sent).
+    """
+    model = als_models.get()
+    if model is None or not user_id or not model.has_user(user_id):
+        return None
+    exclude = model.purchased(user_id) + [str(pid) for pid in exclude]
+    return fetch_products_in_order([pid for pid, _ in model.recommend(user_id, limit, exclude)])
+
+@app.route('/recommend/batch', methods=['POST'])
+def recommend_batch():
+    """Similar products for many products at once.
+
+    Body: ``{"productIds": [...], "userId": optional, "limit": optional (default 6)}``.
+    Returns ``{"recommendations": {productId: [product, ...]}, "notFound": [...]}``.
+    """
+    try:
+        product_ids, user_id, limit = parse_batch_request(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        product_index.ensure_built()
+        snapshot = product_index.snapshot()
+        if any(pid not in snapshot.row_of and ObjectId.is_valid(pid) for pid in product_ids):
+            product_index.request_refresh()
+            snapshot = product_index.snapshot()
+        found = [pid for pid in product_ids if pid in snapshot.row_of]
+        not_found = [pid for pid in product_ids if pid not in snapshot.row_of]
+
+        bias = None
+        if user_id and found:
+            bias = np.zeros(len(snapshot.product_ids))
+            for row, weight in user_preference_rows(user_id, snapshot).items():
+                bias[row] = weight
+
+        rows = np.array([snapshot.row_of[pid] for pid in found], dtype=np.intp)
+        top = batch_top_k(snapshot.matrix, rows, limit, bias) if found else []
+
+        # One product fetch for the union of all result lists.
+        neighbour_ids = {
+            pid: [snapshot.product_ids[row] for row in top_rows]
+            for pid, top_rows in zip(found, top)
+        }
+        unique_ids = list(dict.fromkeys(nid for ids in neighbour_ids.values() for nid in ids))
+        products = {str(p['_id']): p for p in fetch_products_in_order(unique_ids)}
+
+        return jsonify({
+            "recommendations": {
+                pid: [products[nid] for nid in ids if nid in products]
+                for pid, ids in neighbour_ids.items()
+            },
+            "notFound": not_found
+        })
+
+    except Exception as e:
+        logger.exception("Batch recommendation error")
+        return jsonify({"error": str(e)}), 500
 
 @app.route('/health', methods=['GET'])
 def health():
@@ -174,121 +458,91 @@ def health():
         "message": "Recommendation service is running"
     }), 200
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """503 until warm_up() has succeeded; the startup report either way."""
+    return readiness_response(startup_report)
+
 def get_recommendations(recent_orders):
     """
     Generate personalized product recommendations based on user's order history.
     """
     try:
-        print("Starting get_recommendations...")
         # If no order history, return popular products
         if not recent_orders:
-            print("No recent orders, getting popular products...")
             popular_products = get_popular_products()
-            print(f"Found {len(popular_products)} popular products")
+            logger.info("No recent orders, returning popular products",
+                        extra={"fields": {"returned": len(popular_products)}})
             return popular_products
-        
-        print(f"Processing {len(recent_orders)} recent orders...")
-        # Extract categories and price ranges from recent orders
-        categories = set()
-        price_ranges = []
-        
-        for order in recent_orders:
-            for item in order.get("orderItems", []):
-                product = products_collection.find_one({"_id": ObjectId(item.get("product"))})
-                if product:
-                    categories.add(product.get("category"))
-                    price_ranges.append(product.get("price", 0))
-        
-        print(f"Found categories: {categories}")
-        print(f"Price ranges: {price_ranges}")
-        
+
+        # Extract categories and price ranges from recent orders (one bulk lookup)
+        categories, price_ranges = category_price_profile(recent_orders, product_resolver)
+
         # Calculate average price range
         avg_price = sum(price_ranges) / len(price_ranges) if price_ranges else 0
         price_min = avg_price * 0.7
         price_max = avg_price * 1.3
-        
-        print(f"Price range: {price_min} - {price_max}")
-        
+
         # Get recommendations based on categories and price range
-        recommendations = list(products_collection.find({
-            "category": {"$in": list(categories)},
-            "price": {"$gte": price_min, "$lte": price_max}
-        }).limit(8))
-        
-        print(f"Found {len(recommendations)} recommendations based on categories and price")
-        
+        snapshot = catalog.get()
+        rows = snapshot.price_band_rows(snapshot.codes_for(categories), price_min, price_max, limit=8)
+        recommendations = snapshot.get_records(rows)
+        matched = len(recommendations)
+
         # If not enough recommendations, add popular products
         if len(recommendations) < 8:
-            print("Not enough recommendations, adding popular products...")
             popular_products = get_popular_products()
             recommendations.extend(popular_products[:8 - len(recommendations)])
-            print(f"Total recommendations after adding popular products: {len(recommendations)}")
-        
-        # Serialize ObjectId to string for each recommendation
-        serialized_recommendations = []
-        for product in recommendations:
-            product['_id'] = str(product['_id'])
-            serialized_recommendations.append(product)
-        
-        print(f"Returning {len(serialized_recommendations)} serialized recommendations")
-        return serialized_recommendations
-        
-    except Exception as e:
-        print(f"Error in get_recommendations: {str(e)}")
-        print("Falling back to popular products...")
-        popular_products = get_popular_products()
-        print(f"Found {len(popular_products)} fallback popular products")
-        return popular_products
 
-def get_popular_products():
+        logger.info("Order-history recommendations", extra={"fields": {
+            "orders": len(recent_orders), "categories": len(categories),
+            "priceMin": round(price_min, 2), "priceMax": round(price_max, 2),
+            "matched": matched, "returned": len(recommendations),
+        }})
+        return recommendations
+
+    except Exception:
+        logger.exception("Error in get_recommendations; falling back to popular products")
+        return get_popular_products()
+
+def get_popular_products(limit=8, category=None):
     """
-    Get popular products based on ratings and number of reviews.
+    Get popular products from the in-memory popularity ranking.
+
+    Until warmup has built the ranking, products rated at least 4 with at
+    least 10 reviews are served from the catalog snapshot instead.
     """
     try:
-        products = list(products_collection.find({
-            "rating": {"$gte": 4.0},
-            "numReviews": {"$gte": 10}
-        }).sort("rating", -1).limit(8))
-        
-        # Serialize ObjectId to string for each product
-        serialized_products = []
-        for product in products:
-            product['_id'] = str(product['_id'])
-            serialized_products.append(product)
-        
-        return serialized_products
-    except Exception as e:
-        print(f"Error in get_popular_products: {str(e)}")
+        snapshot = catalog.get()
+        if not popularity.ready:
+            mask = snapshot.popular_mask()
+            if category is not None:
+                mask &= snapshot.category_mask([category])
+            return snapshot.get_records(snapshot.top_rows(mask, limit, order_by=snapshot.rating))
+        # Over-fetch ids in case the newest products are not in the snapshot yet.
+        rows = snapshot.rows(popularity.top(limit * 2, category))[:limit]
+        return snapshot.get_records(rows)
+    except Exception:
+        logger.exception("Error in get_popular_products")
         # Fallback to random products if there's an error
-        fallback_products = list(products_collection.find().limit(8))
-        # Serialize fallback products too
-        serialized_fallback = []
-        for product in fallback_products:
-            product['_id'] = str(product['_id'])
-            serialized_fallback.append(product)
-        return serialized_fallback
+        return list(products_collection.find({}, CATALOG_PROJECTION).limit(8))
 
 def get_similar_products(product_id):
     """
     Get similar products based on a specific product.
     """
     try:
-        product = products_collection.find_one({"_id": ObjectId(product_id)})
-        if not product:
+        snapshot = catalog.get()
+        row = snapshot.row_of.get(str(product_id))
+        if row is None:
             return get_popular_products()
-        
-        category = product.get("category")
-        price = product.get("price", 0)
-        
-        return list(products_collection.find({
-            "_id": {"$ne": ObjectId(product_id)},
-            "category": category,
-            "price": {"$gte": price * 0.8, "$lte": price * 1.2}
-        }).limit(8))
-        
-    except Exception as e:
-        print(f"Error in get_similar_products: {str(e)}")
+
+        return snapshot.get_records(snapshot.similar_rows(row, 8, band=0.2))
+
+    except Exception:
+        logger.exception("Error in get_similar_products")
         return get_popular_products()
 
 if __name__ == '__main__':
+    start(wait=True)
     app.run(host='0.0.0.0', port=5001)
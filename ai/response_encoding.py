@@ -0,0 +1,105 @@
+"""
+Shared JSON response layer for the Flask services.
+
+``install_json_provider(app)`` swaps Flask's JSON provider for one backed by
+orjson (C-accelerated, native datetime/NumPy support) that also encodes
+ObjectId, so handlers can ``jsonify`` Mongo documents without walking them
+first. ``format_product_cards`` is the single place recommendation responses
+are shaped, fed by ``PRODUCT_CARD_PROJECTION`` so Mongo only sends the fields
+a card needs.
+"""
+import json
+from datetime import date, datetime
+
+from bson import ObjectId
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson installed
+    orjson = None
+
+# Fields the recommendation cards read; everything else stays in Mongo.
+PRODUCT_CARD_PROJECTION = {
+    "name": 1,
+    "description": 1,
+    "price": 1,
+    "image": 1,
+    "rating": 1,
+    "numReviews": 1,
+}
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "tolist"):  # NumPy scalars/arrays on the stdlib path
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(payload):
+        return orjson.dumps(payload, default=_default, option=_OPTIONS)
+
+    loads = orjson.loads
+else:
+    def dumps_bytes(payload):
+        return json.dumps(payload, default=_default, separators=(",", ":")).encode()
+
+    loads = json.loads
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider that encodes ObjectId, datetime and NumPy values."""
+
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        payload = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(payload), mimetype=self.mimetype)
+
+
+def install_json_provider(app):
+    """Make ``jsonify`` in ``app`` use the fast encoder."""
+    app.json = FastJSONProvider(app)
+    return app
+
+
+def format_product_cards(products, prices=None, currency="USD", default_rating=4.0, default_reviews=5):
+    """Shape products into the card dicts the frontend renders.
+
+    ``prices`` lines up with ``products`` and holds prices already converted
+    to ``currency``; without it the stored USD prices are used. Products
+    without an ``_id`` or price are skipped. ``default_reviews`` may be a
+    callable, evaluated per product.
+    """
+    if prices is None:
+        currency = "USD"
+    cards = []
+    for i, product in enumerate(products):
+        if "_id" not in product or "price" not in product:
+            continue
+        cards.append({
+            "id": str(product["_id"]),
+            "name": product.get("name"),
+            "description": product.get("description"),
+            "price": prices[i] if prices is not None else product["price"],
+            "image": product.get("image"),
+            "rating": product.get("rating", default_rating),
+            "reviews": product["numReviews"] if "numReviews" in product else (
+                default_reviews() if callable(default_reviews) else default_reviews
+            ),
+            "currency": currency,
+        })
+    return cards
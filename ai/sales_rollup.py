@@ -0,0 +1,386 @@
+"""
+Daily sales rollups per (day, category, seller).
+
+The ``daily_sales`` collection holds one document per day x category x seller
+with the revenue and units sold, written only by this module's job:
+
+    python sales_rollup.py --backfill          # stream every order once
+    python sales_rollup.py --follow            # then keep up with new orders
+
+The job rebuilds whole days from their orders, so re-running it after a crash
+never double counts; ``rollup_state`` records the last order it has folded in,
+and a ``version`` the job bumps before and after writing cells (odd while a
+write is in progress). Readers load the cells between two reads of the state
+and retry unless both saw the same even version, so a load never pairs cells
+with another pass's watermark.
+
+``SalesRollup`` is the serving side. It loads the collection into a dense
+days x cells NumPy array (a cell is one category/seller pair), folds in
+orders newer than the job's watermark in memory, and answers week/month/year
+views by slicing rows and summing columns.
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from pymongo import MongoClient
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = "daily_sales"
+STATE_COLLECTION = "rollup_state"
+STATE_ID = "daily_sales"
+
+ORDER_PROJECTION = {
+    "createdAt": 1,
+    "orderItems.product": 1,
+    "orderItems.qty": 1,
+    "orderItems.price": 1,
+    "orderItems.category": 1,
+}
+
+# Items whose product no longer exists still count, under these keys.
+UNKNOWN = "unknown"
+
+# How often SalesRollup.load re-reads while the job is writing, and how long it waits between tries.
+LOAD_ATTEMPTS = 20
+LOAD_RETRY_SECONDS = 0.5
+
+
+def resolve_products(products_collection, product_ids, known=None):
+    """``{product_id: (category, seller)}`` for ``product_ids``, with one ``$in`` query."""
+    known = {} if known is None else known
+    missing = list({pid for pid in product_ids if pid is not None and str(pid) not in known})
+    if missing:
+        for product in products_collection.find({"_id": {"$in": missing}}, {"category": 1, "user": 1}):
+            known[str(product["_id"])] = (
+                str(product.get("category") or UNKNOWN),
+                str(product.get("user") or UNKNOWN),
+            )
+    return known
+
+
+def order_cells(orders, product_info):
+    """Sum order items into ``{(day, category, seller): [revenue, units]}``."""
+    cells = {}
+    for order in orders:
+        created_at = order.get("createdAt")
+        if created_at is None:
+            continue
+        day = created_at.date()
+        for item in order.get("orderItems", []):
+            category, seller = product_info.get(str(item.get("product")), (UNKNOWN, UNKNOWN))
+            if item.get("category"):
+                category = str(item["category"])
+            qty = item.get("qty") or 1
+            totals = cells.setdefault((day, category, seller), [0.0, 0])
+            totals[0] += (item.get("price") or 0) * qty
+            totals[1] += qty
+    return cells
+
+
+def stream_cells(db, query, batch_size=1000, product_info=None):
+    """Cells for every order matching ``query``, plus the highest order ``_id`` seen.
+
+    Orders are read in batches and each batch's products are resolved with one
+    query, so memory stays bounded by the batch and the product map.
+    """
+    product_info = {} if product_info is None else product_info
+    cells = {}
+    last_id = None
+    batch = []
+    cursor = db["orders"].find(query, ORDER_PROJECTION).sort("_id", 1).batch_size(batch_size)
+    for order in cursor:
+        batch.append(order)
+        if len(batch) == batch_size:
+            last_id = _fold_batch(db, batch, product_info, cells)
+            batch = []
+    if batch:
+        last_id = _fold_batch(db, batch, product_info, cells)
+    return cells, last_id
+
+
+def _fold_batch(db, batch, product_info, cells):
+    resolve_products(
+        db["products"],
+        [item.get("product") for order in batch for item in order.get("orderItems", [])],
+        product_info,
+    )
+    for key, (revenue, units) in order_cells(batch, product_info).items():
+        totals = cells.setdefault(key, [0.0, 0])
+        totals[0] += revenue
+        totals[1] += units
+    return batch[-1]["_id"]
+
+
+def _cell_documents(cells):
+    return [
+        {"day": day.isoformat(), "category": category, "seller": seller,
+         "revenue": revenue, "units": units}
+        for (day, category, seller), (revenue, units) in cells.items()
+    ]
+
+
+# --- job -----------------------------------------------------------------
+
+def _begin_write(db):
+    """Make the state's version odd, so readers retry until ``_end_write``; returns it.
+
+    A version left odd by a pass that died is kept as it is.
+    """
+    state = db[STATE_COLLECTION].find_one({"_id": STATE_ID}) or {}
+    version = state.get("version", 0) | 1
+    db[STATE_COLLECTION].update_one({"_id": STATE_ID}, {"$set": {"version": version}}, upsert=True)
+    return version
+
+
+def _end_write(db, last_id, version):
+    db[STATE_COLLECTION].update_one(
+        {"_id": STATE_ID}, {"$set": {"lastOrderId": last_id, "version": version + 1}}, upsert=True
+    )
+
+
+def backfill(db, batch_size=1000):
+    """Rebuild the whole rollup collection by streaming every order once."""
+    cells, last_id = stream_cells(db, {}, batch_size)
+    rollup = db[ROLLUP_COLLECTION]
+    version = _begin_write(db)
+    rollup.delete_many({})
+    documents = _cell_documents(cells)
+    if documents:
+        rollup.insert_many(documents)
+    rollup.create_index([("day", 1)])
+    _end_write(db, last_id, version)
+    logger.info("Backfilled %d rollup cells up to order %s", len(documents), last_id)
+    return len(documents)
+
+
+def catch_up(db, batch_size=1000):
+    """Fold orders newer than the watermark into the collection.
+
+    Every day those orders touch is recomputed from all of its orders and
+    replaced, so a run that dies half way is simply repeated.
+    """
+    state = db[STATE_COLLECTION].find_one({"_id": STATE_ID}) or {}
+    last_id = state.get("lastOrderId")
+    query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+    new_days = set()
+    for order in db["orders"].find(query, {"createdAt": 1}).sort("_id", 1):
+        last_id = order["_id"]
+        if order.get("createdAt") is not None:
+            new_days.add(order["createdAt"].date())
+    if last_id is None or last_id == state.get("lastOrderId"):
+        return 0
+    version = _begin_write(db)
+    for day in sorted(new_days):
+        start = datetime.combine(day, datetime.min.time())
+        cells, _ = stream_cells(db, {"createdAt": {"$gte": start, "$lt": start + timedelta(days=1)}}, batch_size)
+        db[ROLLUP_COLLECTION].delete_many({"day": day.isoformat()})
+        documents = _cell_documents(cells)
+        if documents:
+            db[ROLLUP_COLLECTION].insert_many(documents)
+    _end_write(db, last_id, version)
+    return len(new_days)
+
+
+# --- serving -------------------------------------------------------------
+
+class SalesRollup:
+    """Dense revenue/units arrays indexed by [day - first_day, cell]."""
+
+    def __init__(self, db, batch_size=1000):
+        self.db = db
+        self.batch_size = batch_size
+        self.first_day = None
+        self.revenue = np.zeros((0, 0), dtype=np.float64)
+        self.units = np.zeros((0, 0), dtype=np.int64)
+        self.cells = []          # (category, seller) per column
+        self.cell_of = {}
+        self.last_order_id = None
+        self._product_info = {}
+        self._lock = threading.Lock()        # guards the arrays
+        self._refreshing = threading.Lock()  # one load/refresh at a time
+        self._stop = threading.Event()
+        self._thread = None
+        self.ready = False
+
+    def load(self):
+        """Load the persisted rollup, then fold in orders the job has not seen yet."""
+        with self._refreshing:
+            cells, state = self._read_consistent()
+            with self._lock:
+                self.first_day = None
+                self.revenue = np.zeros((0, 0), dtype=np.float64)
+                self.units = np.zeros((0, 0), dtype=np.int64)
+                self.cells, self.cell_of = [], {}
+                self._add(cells)
+                self.last_order_id = state.get("lastOrderId")
+                self.ready = True
+        logger.info("Sales rollup loaded: %d days x %d cells", *self.revenue.shape)
+        return self.refresh()
+
+    def _read_consistent(self):
+        """Cells plus the watermark they were written with (see the module docstring)."""
+        states = self.db[STATE_COLLECTION]
+        for _ in range(LOAD_ATTEMPTS):
+            state = states.find_one({"_id": STATE_ID}) or {}
+            version = state.get("version", 0)
+            if version % 2 == 0:
+                cells = self._read_cells()
+                if (states.find_one({"_id": STATE_ID}) or {}).get("version", 0) == version:
+                    return cells, state
+            time.sleep(LOAD_RETRY_SECONDS)
+        # A job that died mid-write leaves the version odd until its next run.
+        logger.warning("Sales rollup is still being rewritten; loading it as it is")
+        state = states.find_one({"_id": STATE_ID}) or {}
+        return self._read_cells(), state
+
+    def _read_cells(self):
+        cells = {}
+        for doc in self.db[ROLLUP_COLLECTION].find({}, {"_id": 0}):
+            key = (date.fromisoformat(doc["day"]), doc["category"], doc["seller"])
+            cells[key] = (doc.get("revenue", 0.0), doc.get("units", 0))
+        return cells
+        if not self.ready:
+            self.load()
+
+    def refresh(self):
+        """Fold orders newer than the last one seen into the arrays (in memory only)."""
+        if not self.ready:
+            return self.load()
+        with self._refreshing:
+            query = {"_id": {"$gt": self.last_order_id}} if self.last_order_id is not None else {}
+            cells, last_id = stream_cells(self.db, query, self.batch_size, self._product_info)
+            if last_id is None:
+                return 0
+            with self._lock:
+                self._add(cells)
+                self.last_order_id = last_id
+            return len(cells)
+
+    def _add(self, cells):
+        if not cells:
+            return
+        days = [key[0] for key in cells]
+        self._ensure_days(min(days), max(days))
+        for category_seller in {key[1:] for key in cells}:
+            if category_seller not in self.cell_of:
+                self.cell_of[category_seller] = len(self.cells)
+                self.cells.append(category_seller)
+        self._ensure_cells(len(self.cells))
+        for (day, category, seller), (revenue, units) in cells.items():
+            row = day.toordinal() - self.first_day
+            col = self.cell_of[(category, seller)]
+            self.revenue[row, col] += revenue
+            self.units[row, col] += units
+
+    def _ensure_days(self, low, high):
+        low, high = low.toordinal(), high.toordinal()
+        if self.first_day is None:
+            self.first_day = low
+        before = max(self.first_day - low, 0)
+        after = max(high - (self.first_day + self.revenue.shape[0] - 1), 0)
+        if before or after:
+            # Grow by at least a month at the end so daily appends rarely copy.
+            after = max(after, 31) if after else 0
+            pad = ((before, after), (0, 0))
+            self.revenue = np.pad(self.revenue, pad)
+            self.units = np.pad(self.units, pad)
+            self.first_day -= before
+
+    def _ensure_cells(self, n):
+        extra = n - self.revenue.shape[1]
+        if extra > 0:
+            pad = ((0, 0), (0, max(extra, 16)))
+            self.revenue = np.pad(self.revenue, pad)
+            self.units = np.pad(self.units, pad)
+
+    def _rows(self, start_day, end_day):
+        """Slice bounds for [start_day, end_day] clipped to the stored days."""
+        if self.first_day is None:
+            return 0, 0
+        n = self.revenue.shape[0]
+        low = min(max(start_day.toordinal() - self.first_day, 0), n)
+        high = min(max(end_day.toordinal() - self.first_day + 1, 0), n)
+        return low, high
+
+    def daily_revenue(self, start_day, end_day, category=None, seller=None):
+        """Revenue per day from ``start_day`` to ``end_day`` inclusive (zeros for empty days)."""
+        length = (end_day - start_day).days + 1
+        result = np.zeros(max(length, 0), dtype=np.float64)
+        with self._lock:
+            low, high = self._rows(start_day, end_day)
+            if high > low:
+                columns = self._columns(category, seller)
+                offset = self.first_day + low - start_day.toordinal()
+                result[offset:offset + high - low] = self.revenue[low:high, columns].sum(axis=1)
+        return result
+
+    def category_revenue(self, start_day, end_day):
+        """``{category: revenue}`` between ``start_day`` and ``end_day`` inclusive."""
+        with self._lock:
+            low, high = self._rows(start_day, end_day)
+            per_cell = self.revenue[low:high, :len(self.cells)].sum(axis=0)
+            cells = list(self.cells)
+        totals = {}
+        for (category, _), revenue in zip(cells, per_cell.tolist()):
+            if revenue:
+                totals[category] = totals.get(category, 0.0) + revenue
+        return totals
+
+    def _columns(self, category, seller):
+        if category is None and seller is None:
+            return slice(0, len(self.cells))
+        return [
+            col for col, (cell_category, cell_seller) in enumerate(self.cells)
+            if (category is None or cell_category == str(category))
+            and (seller is None or cell_seller == str(seller))
+        ]
+
+    def start_background_refresh(self, interval=60):
+        """Fold in new orders every ``interval`` seconds."""
+        if self._thread and self._thread.is_alive():
+            return self._thread
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception:
+                    logger.exception("Sales rollup refresh failed")
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name="sales-rollup-refresh", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop_background_refresh(self):
+        self._stop.set()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Maintain the daily_sales rollup collection")
+    parser.add_argument("--backfill", action="store_true", help="rebuild from every order first")
+    parser.add_argument("--follow", action="store_true", help="keep folding in new orders")
+    parser.add_argument("--interval", type=int, default=60, help="seconds between --follow passes")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+    db = MongoClient(os.getenv("MONGODB_URI", ""))["test"]
+    if args.backfill:
+        started = time.perf_counter()
+        written = backfill(db, args.batch_size)
+        print(f"Backfilled {written} rollup cells in {time.perf_counter() - started:.1f}s")
+    else:
+        print(f"Recomputed {catch_up(db, args.batch_size)} days")
+    while args.follow:
+        time.sleep(args.interval)
+        catch_up(db, args.batch_size)
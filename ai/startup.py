@@ -0,0 +1,193 @@
+"""
+Startup timing, warmup and readiness for the Flask services.
+
+A service records how long its module-level imports and connections took with
+``StartupReport.mark()``, then runs ``warm_up()`` with the caches and indexes
+it serves from (TF-IDF index, catalog, popularity, ...) before it starts
+accepting traffic. ``/ready`` answers 503 until warmup has succeeded and
+returns the report either way, so a load balancer can hold traffic back and
+an operator can see where the startup time went:
+
+    {"service": "app", "ready": true, "importSeconds": 0.41, "warmupSeconds": 2.3,
+     "phases": [{"name": "imports", "kind": "import", "seconds": 0.38}, ...]}
+
+Steps that fail (Mongo briefly down at boot, say) are retried every
+``WARMUP_RETRY_SECONDS`` until they succeed; the ones that already succeeded
+are not run again. ``StartupReport.start()`` does all of this once per process
+in a background thread and then starts the service's background refreshers.
+``install_startup()`` registers it on the Flask app, where gunicorn.conf.py's
+``post_worker_init`` hook finds it, so every gunicorn worker switches to the
+JSON logging of structured_logging.py and warms itself up. Services with
+nothing to warm up register an empty list of steps for the logging alone:
+
+    gunicorn -w 4 app:app        # run from ai/, which holds gunicorn.conf.py
+
+For a per-module breakdown of the import phase use ``python -X importtime``.
+The same report is printed without starting a server by
+
+    python startup.py app
+"""
+import argparse
+import importlib
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from structured_logging import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds between attempts at the warmup steps that failed.
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "30"))
+
+
+class StartupReport:
+    """Named import and warmup phases with their durations."""
+
+    def __init__(self, service, started=None):
+        self.service = service
+        self.started = time.perf_counter() if started is None else started
+        self.phases = []
+        self.ready = False
+        self.warming = False
+        self._last_mark = self.started
+        self._done = set()
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._started_pid = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def mark(self, name):
+        """Close an import phase: everything since the previous mark."""
+        now = time.perf_counter()
+        self.phases.append({"name": name, "kind": "import", "seconds": round(now - self._last_mark, 4)})
+        self._last_mark = now
+
+    @contextmanager
+    def phase(self, name, kind="warmup"):
+        started = time.perf_counter()
+        entry = {"name": name, "kind": kind}
+        try:
+            yield entry
+        except Exception as e:
+            entry["error"] = str(e)
+            raise
+        finally:
+            entry["seconds"] = round(time.perf_counter() - started, 4)
+            self.phases.append(entry)
+
+    def warm_up(self, steps):
+        """Run the ``(name, callable)`` steps that have not succeeded yet; ready once all have.
+
+        A failed step is logged and recorded and the rest still run, so the
+        report shows every problem at once. Calling again retries only the
+        failed steps.
+        """
+        with self._lock:
+            if self.ready:
+                return True
+            self.warming = True
+            failed = False
+            for name, step in steps:
+                if name in self._done:
+                    continue
+                try:
+                    with self.phase(name):
+                        step()
+                except Exception:
+                    logger.exception("Warmup step %s failed", name)
+                    failed = True
+                else:
+                    self._done.add(name)
+            self.warming = False
+            self.ready = not failed
+        self.log_report()
+        return self.ready
+
+    def start(self, steps, on_ready=None, retry_interval=None, wait=False):
+        """Warm up once per process, retrying failed steps until ready, then call ``on_ready``.
+
+        Runs in a background thread (``/ready`` answers 503 meanwhile) unless
+        ``wait``. Keyed on the pid, so a worker forked from a process that
+        already started gets its own warmup and refresher threads.
+        """
+        retry_interval = WARMUP_RETRY_SECONDS if retry_interval is None else retry_interval
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return self._thread
+            self._started_pid = os.getpid()
+
+            def run():
+                while not self.warm_up(steps):
+                    if self._stop.wait(retry_interval):
+                        return
+                if on_ready is not None:
+                    on_ready()
+
+            if wait:
+                run()
+                return None
+            self._thread = threading.Thread(target=run, name=f"{self.service}-warmup", daemon=True)
+            self._thread.start()
+            return self._thread
+
+    def stop(self):
+        """Stop retrying a warmup that has not succeeded yet."""
+        self._stop.set()
+
+    def seconds(self, kind):
+        return round(sum(p["seconds"] for p in self.phases if p["kind"] == kind), 4)
+
+    def as_dict(self):
+        return {
+            "service": self.service,
+            "ready": self.ready,
+            "warming": self.warming,
+            "importSeconds": self.seconds("import"),
+            "warmupSeconds": self.seconds("warmup"),
+            "phases": list(self.phases),
+        }
+
+    def log_report(self):
+        logger.info("%s startup: imports %.2fs, warmup %.2fs, ready=%s", self.service,
+                    self.seconds("import"), self.seconds("warmup"), self.ready)
+        for p in self.phases:
+            logger.info("  %-8s %-28s %7.3fs%s", p["kind"], p["name"], p["seconds"],
+                        f"  FAILED: {p['error']}" if "error" in p else "")
+
+
+def install_startup(app, report, steps=(), on_ready=None):
+    """Register ``start(wait=False)`` for ``app``; gunicorn.conf.py calls it per worker.
+
+    ``start`` configures logging for ``report.service`` and then runs the warmup.
+    """
+    def start(wait=False):
+        configure_logging(report.service)
+        return report.start(steps, on_ready=on_ready, wait=wait)
+
+    app.extensions["startup"] = start
+    return start
+
+
+def readiness_response(report):
+    """Body and status for a ``/ready`` route."""
+    from flask import jsonify
+
+    return jsonify(report.as_dict()), 200 if report.ready else 503
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a service, warm it up and print its startup report")
+    parser.add_argument("service", help="module name, e.g. app or recommendation_model")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    started = time.perf_counter()
+    module = importlib.import_module(args.service)
+    imported = time.perf_counter()
+    module.warm_up()
+    print(f"import {imported - started:.2f}s (module-level phases: {module.startup_report.seconds('import'):.2f}s)")
+    print(f"warmup {module.startup_report.seconds('warmup'):.2f}s, ready={module.startup_report.ready}")
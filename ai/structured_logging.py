@@ -0,0 +1,75 @@
+"""
+JSON-lines logging with per-request sampling.
+
+``configure_logging(service)`` sends every record to stderr as one JSON
+object: time, level, logger, message, service, the fields passed as
+``extra={"fields": {...}}`` and the formatted traceback if there is one.
+
+Records at INFO and below are sampled per request. The decision is made
+once when the request starts (``LOG_SAMPLE_RATE``, default 0.05), so a
+sampled request keeps all of its lines. Warnings and errors always pass, and
+so does everything logged outside a request (startup, background refreshes).
+"""
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+DEFAULT_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.05"))
+
+# True/False while serving a request, None outside one.
+_sampled = contextvars.ContextVar("log_sampled", default=None)
+
+
+def start_request(rate=None):
+    """Decide whether this request's INFO/DEBUG records are kept; returns a reset token."""
+    rate = DEFAULT_SAMPLE_RATE if rate is None else rate
+    return _sampled.set(random.random() < rate)
+
+
+def finish_request(token):
+    _sampled.reset(token)
+
+
+class SamplingFilter(logging.Filter):
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        return _sampled.get() is not False
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "service": self.service,
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(service, level=None, stream=None):
+    """Replace the root handlers with one sampled JSON handler."""
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter(service))
+    handler.addFilter(SamplingFilter())
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level or os.getenv("LOG_LEVEL", "INFO"))
+    return handler
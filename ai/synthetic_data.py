@@ -0,0 +1,275 @@
+"""
+Synthetic users, products (with reviews) and orders at a chosen scale.
+
+Documents follow the backend's Mongoose schemas. The distributions are
+skewed the way shop data is, so caches, rankings and the per-user paths are
+exercised realistically:
+
+- product popularity and users' order counts follow Zipf-like laws;
+- prices are log-normal around a per-category median;
+- review ratings lean towards 4 and 5, and a product's ``rating`` and
+  ``numReviews`` match its embedded reviews;
+- descriptions draw from per-category vocabularies, so TF-IDF neighbours
+  are meaningful;
+- orders are spread over the last year with more on weekends.
+
+A scale is a number of orders; users and products scale with it
+(``scale_counts``). Generation is seeded and streamed in batches, so the
+1M scale never holds all orders in memory.
+
+    python synthetic_data.py --scale 100k --mongo-uri mongodb://localhost:27017
+
+bench_endpoints.py loads the same data into an in-process mongomock.
+Products carry a ``seller`` field equal to their ``user``, which is what the
+seller analytics endpoint queries.
+"""
+import argparse
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1M": 1_000_000}
+
+CATEGORIES = {
+    # name: (median price in USD, vocabulary)
+    "electronics": (180.0, "wireless bluetooth battery fast charging display hd smart noise cancelling "
+                           "portable usb compact processor gaming speaker headphones"),
+    "clothing": (35.0, "cotton slim fit breathable casual summer winter denim jacket shirt soft stretch "
+                       "classic everyday tailored"),
+    "shoes": (70.0, "running leather sneakers cushioned sole lightweight waterproof trainers grip "
+                    "comfortable breathable walking"),
+    "home": (45.0, "kitchen ceramic storage decor cozy lamp wooden cushion durable modern minimalist "
+                   "handmade organiser"),
+    "beauty": (20.0, "organic skin care moisturising serum fragrance natural vegan gentle hydrating "
+                     "cream matte long lasting"),
+    "sports": (55.0, "fitness yoga training resistance outdoor cycling durable grip adjustable "
+                     "lightweight hydration gym"),
+    "books": (15.0, "paperback bestseller novel guide illustrated edition hardcover author classic "
+                    "thriller history cookbook"),
+    "toys": (25.0, "kids educational building blocks puzzle colourful safe creative plush remote "
+                   "control wooden learning"),
+}
+BRANDS = ["Acme", "Northwind", "Globex", "Initech", "Umbrella", "Hooli", "Vandelay", "Stark", "Wayne", "Soylent"]
+CITIES = [("Karachi", "Pakistan"), ("Lahore", "Pakistan"), ("London", "United Kingdom"),
+          ("Sydney", "Australia"), ("Berlin", "Germany"), ("New York", "United States")]
+PAYMENT_METHODS = ["PayPal", "Stripe", "Cash on Delivery"]
+REVIEW_COMMENTS = ["Great value", "Works as described", "Would buy again", "Not bad",
+                   "Could be better", "Excellent quality", "Arrived late but fine"]
+
+
+def scale_counts(orders):
+    """Users and products for ``orders`` orders (5 orders per user, 10 per product)."""
+    return {"users": max(orders // 5, 10), "products": max(orders // 10, 50), "orders": orders}
+
+
+def _object_id(rng):
+    # Drawn from the seeded generator, unlike ObjectId(), so a seed always gives the same ids.
+    return ObjectId(rng.bytes(12))
+
+
+def _zipf_weights(n, exponent, rng):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)  # so popularity is not correlated with insertion order
+    return weights / weights.sum()
+
+
+class SyntheticData:
+    """Seeded generator; ``users()``, ``products()`` and ``orders()`` yield documents in batches."""
+
+    def __init__(self, orders, users=None, products=None, seed=42, now=None, batch_size=5000):
+        counts = scale_counts(orders)
+        self.n_users = users or counts["users"]
+        self.n_products = products or counts["products"]
+        self.n_orders = orders
+        self.seed = seed
+        self.now = now or datetime(2026, 1, 1)
+        self.batch_size = batch_size
+        rng = np.random.default_rng(seed)
+        self.user_ids = [_object_id(rng) for _ in range(self.n_users)]
+        self.product_ids = [_object_id(rng) for _ in range(self.n_products)]
+        self.categories = list(CATEGORIES)
+        # Category per product (a few large categories), then log-normal prices around its median.
+        self.product_category = rng.choice(len(self.categories), self.n_products,
+                                           p=_zipf_weights(len(self.categories), 0.8, rng))
+        medians = np.array([CATEGORIES[c][0] for c in self.categories])[self.product_category]
+        self.product_price = np.round(medians * rng.lognormal(0.0, 0.5, self.n_products), 2)
+        self.product_popularity = _zipf_weights(self.n_products, 1.1, rng)
+        self.user_activity = _zipf_weights(self.n_users, 0.9, rng)
+        # About one user in twenty sells.
+        self.sellers = self.user_ids[: max(self.n_users // 20, 1)]
+        self.product_seller = rng.integers(0, len(self.sellers), self.n_products)
+
+    def _rng(self, stream):
+        return np.random.default_rng([self.seed, stream])
+
+    def _batches(self, documents):
+        batch = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def users(self):
+        rng = self._rng(1)
+        product_count = self.n_products
+
+        def documents():
+            for i, user_id in enumerate(self.user_ids):
+                created = self.now - timedelta(days=int(rng.integers(30, 730)))
+                views = rng.choice(product_count, int(rng.integers(0, 8)), p=self.product_popularity)
+                yield {
+                    "_id": user_id,
+                    "username": f"user{i}",
+                    "name": f"User {i}",
+                    "email": f"user{i}@example.com",
+                    # bcrypt-shaped placeholder; never a real hash.
+                    "password": "$2a$10$" + "x" * 53,
+                    "isAdmin": i == 0,
+                    "viewed_products": [self.product_ids[j] for j in views],
+                    "createdAt": created,
+                    "updatedAt": created,
+                }
+        return self._batches(documents())
+
+    def products(self):
+        rng = self._rng(2)
+
+        def documents():
+            for i, product_id in enumerate(self.product_ids):
+                category = self.categories[self.product_category[i]]
+                words = CATEGORIES[category][1].split()
+                # Popular products get more reviews.
+                n_reviews = int(min(rng.poisson(2 + self.product_popularity[i] * self.n_products * 3), 40))
+                ratings = rng.choice([1, 2, 3, 4, 5], n_reviews, p=[0.04, 0.06, 0.15, 0.35, 0.40])
+                created = self.now - timedelta(days=int(rng.integers(1, 500)))
+                seller = self.sellers[self.product_seller[i]]
+                reviewers = rng.integers(0, self.n_users, n_reviews)
+                yield {
+                    "_id": product_id,
+                    "user": seller,
+                    "seller": seller,
+                    "name": f"{BRANDS[i % len(BRANDS)]} {category.title()} {i}",
+                    "image": f"/uploads/image-{1700000000000 + i}.jpg",
+                    "brand": BRANDS[i % len(BRANDS)],
+                    "category": category,
+                    "description": " ".join(rng.choice(words, int(rng.integers(8, 16)))),
+                    "reviews": [
+                        {"_id": _object_id(rng), "name": f"User {int(u)}", "rating": int(r),
+                         "comment": REVIEW_COMMENTS[int(u) % len(REVIEW_COMMENTS)],
+                         "user": self.user_ids[int(u)], "createdAt": created, "updatedAt": created}
+                        for u, r in zip(reviewers, ratings)
+                    ],
+                    "rating": round(float(ratings.mean()), 2) if n_reviews else 0,
+                    "numReviews": n_reviews,
+                    "price": float(self.product_price[i]),
+                    "countInStock": int(rng.integers(0, 100)),
+                    "quantity": int(rng.integers(0, 100)),
+                    "discountPercentage": int(rng.choice([0, 0, 0, 10, 20])),
+                    "isFreeDelivery": bool(rng.random() < 0.3),
+                    "createdAt": created,
+                    "updatedAt": created,
+                }
+        return self._batches(documents())
+
+    def orders(self):
+        rng = self._rng(3)
+
+        def documents():
+            # Days back from now, weekends twice as likely.
+            days = np.arange(365)
+            weekday = np.array([(self.now - timedelta(days=int(d))).weekday() for d in days])
+            day_weights = np.where(weekday >= 5, 2.0, 1.0)
+            day_weights /= day_weights.sum()
+            for start in range(0, self.n_orders, self.batch_size):
+                n = min(self.batch_size, self.n_orders - start)
+                buyers = rng.choice(self.n_users, n, p=self.user_activity)
+                order_days = rng.choice(days, n, p=day_weights)
+                item_counts = rng.choice([1, 2, 3, 4], n, p=[0.5, 0.3, 0.15, 0.05])
+                products = rng.choice(self.n_products, int(item_counts.sum()), p=self.product_popularity)
+                offset = 0
+                for j in range(n):
+                    chosen = products[offset:offset + item_counts[j]]
+                    offset += item_counts[j]
+                    created = self.now - timedelta(days=int(order_days[j]), seconds=int(rng.integers(0, 86400)))
+                    items = []
+                    for p in chosen:
+                        items.append({
+                            "name": f"{BRANDS[p % len(BRANDS)]} {self.categories[self.product_category[p]].title()} {p}",
+                            "qty": int(rng.choice([1, 1, 1, 2, 3])),
+                            "image": f"/uploads/image-{1700000000000 + int(p)}.jpg",
+                            "price": float(self.product_price[p]),
+                            "category": self.categories[self.product_category[p]],
+                            "product": self.product_ids[p],
+                        })
+                    items_price = round(sum(item["price"] * item["qty"] for item in items), 2)
+                    tax_price = round(items_price * 0.15, 2)
+                    shipping_price = 0.0 if items_price > 100 else 10.0
+                    city, country = CITIES[int(buyers[j]) % len(CITIES)]
+                    paid = bool(rng.random() < 0.9)
+                    delivered = paid and bool(order_days[j] > 5)
+                    yield {
+                        "_id": _object_id(rng),
+                        "user": self.user_ids[buyers[j]],
+                        "orderItems": items,
+                        "shippingAddress": {"address": f"{int(buyers[j])} Main Street", "city": city,
+                                            "postalCode": f"{10000 + int(buyers[j]) % 90000}", "country": country},
+                        "paymentMethod": PAYMENT_METHODS[int(rng.integers(0, len(PAYMENT_METHODS)))],
+                        "itemsPrice": items_price,
+                        "taxPrice": tax_price,
+                        "shippingPrice": shipping_price,
+                        "totalPrice": round(items_price + tax_price + shipping_price, 2),
+                        "isPaid": paid,
+                        "paidAt": created if paid else None,
+                        "isDelivered": delivered,
+                        "deliveredAt": created + timedelta(days=5) if delivered else None,
+                        "createdAt": created,
+                        "updatedAt": created,
+                    }
+        return self._batches(documents())
+
+
+def load(db, data, drop=True):
+    """Insert ``data`` into ``db``; returns ``{collection: count}``."""
+    counts = {}
+    for name, batches in (("users", data.users()), ("products", data.products()), ("orders", data.orders())):
+        collection = db[name]
+        if drop:
+            collection.delete_many({})
+        counts[name] = 0
+        started = time.perf_counter()
+        for batch in batches:
+            collection.insert_many(batch, ordered=False)
+            counts[name] += len(batch)
+        logger.info("Loaded %d %s in %.1fs", counts[name], name, time.perf_counter() - started)
+    return counts
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description="Load synthetic users, products and orders into MongoDB")
+    parser.add_argument("--scale", choices=SCALES, default="10k", help="number of orders")
+    parser.add_argument("--orders", type=int, help="exact order count (overrides --scale)")
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--products", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo-uri", default=None, help="defaults to MONGODB_URI, then localhost")
+    parser.add_argument("--db", default="test")
+    parser.add_argument("--keep", action="store_true", help="append instead of replacing the collections")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+    uri = args.mongo_uri or os.getenv("MONGODB_URI") or "mongodb://localhost:27017"
+    data = SyntheticData(args.orders or SCALES[args.scale], args.users, args.products, seed=args.seed)
+    print(load(MongoClient(uri)[args.db], data, drop=not args.keep))
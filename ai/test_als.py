@@ -0,0 +1,69 @@
+import numpy as np
+from scipy import sparse
+
+from als_model import ALSModelStore
+from als_trainer import save_model, train_als
+
+
+def make_interactions():
+    # Two user groups with disjoint tastes; each user has seen most of their group's items.
+    rows, cols = [], []
+    for user in range(20):
+        items = range(0, 10) if user < 10 else range(10, 20)
+        for item in items:
+            if (user + item) % 4:
+                rows.append(user)
+                cols.append(item)
+    return sparse.csr_matrix((np.full(len(rows), 2.0), (rows, cols)), shape=(20, 20))
+
+
+def test_als_prefers_items_from_the_users_group():
+    interactions = make_interactions()
+    user_factors, item_factors = train_als(interactions, factors=4, iterations=8)
+
+    assert user_factors.dtype == np.float32
+    scores = item_factors @ user_factors[0]
+    assert scores[:10].mean() > scores[10:].mean()
+
+
+def test_store_hot_swaps_versions(tmp_path):
+    interactions = make_interactions()
+    user_factors, item_factors = train_als(interactions, factors=4, iterations=2)
+    user_ids = [f"u{i}" for i in range(20)]
+    item_ids = [f"p{i}" for i in range(20)]
+    root = str(tmp_path)
+
+    store = ALSModelStore(root, check_interval=0)
+    assert store.get() is None
+
+    save_model(root, "v1", user_factors, item_factors, user_ids, item_ids, {"version": "v1"})
+    model = store.get()
+    assert model.version == "v1"
+    assert isinstance(model.item_factors, np.memmap)
+    top = model.recommend("u0", 3, exclude=["p1"])
+    assert len(top) == 3 and "p1" not in [pid for pid, _ in top]
+    assert model.recommend("unknown", 3) == []
+
+    save_model(root, "v2", user_factors, item_factors, user_ids, item_ids, {"version": "v2"})
+    assert store.get().version == "v2"
+
+
+def test_purchases_are_excluded_and_versions_can_be_retrained(tmp_path):
+    interactions = make_interactions()
+    user_factors, item_factors = train_als(interactions, factors=4, iterations=2)
+    user_ids = [f"u{i}" for i in range(20)]
+    item_ids = [f"p{i}" for i in range(20)]
+    purchased = sparse.csr_matrix(([True, True], ([0, 0], [1, 2])), shape=(20, 20))
+    root = str(tmp_path)
+
+    save_model(root, "v1", user_factors, item_factors, user_ids, item_ids, {"version": "v1"})
+    assert ALSModelStore(root, check_interval=0).get().purchased("u0") == []
+
+    # Same version name again: the directory is replaced, not an error.
+    save_model(root, "v1", user_factors, item_factors, user_ids, item_ids, {"version": "v1"}, purchased)
+    model = ALSModelStore(root, check_interval=0).get()
+    assert model.purchased("u0") == ["p1", "p2"]
+    assert model.purchased("u1") == [] and model.purchased("unknown") == []
+    top = model.recommend("u0", 20, exclude=model.purchased("u0") + ["p2", "p3"])
+    assert len(top) == 17
+    assert not {"p1", "p2", "p3"} & {pid for pid, _ in top}
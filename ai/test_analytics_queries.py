@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from analytics_queries import category_sales, popular_categories
+from query_profiler import ProfiledCollection, profile_queries
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def test_category_sales_is_one_query_regardless_of_order_count():
+    db = mongomock.MongoClient().db
+    products = [{"_id": ObjectId(), "category": c} for c in ("audio", "books", "audio")]
+    db.products.insert_many(products)
+    deleted = ObjectId()
+    orders = [
+        {"createdAt": datetime(2026, 5, day % 28 + 1), "orderItems": [
+            {"product": products[day % 3]["_id"], "price": 10.0, "qty": 1 + day % 2},
+            {"product": deleted, "price": 99.0},
+        ]}
+        for day in range(300)
+    ]
+    orders.append({"createdAt": datetime(2025, 1, 1), "orderItems": [{"product": products[1]["_id"], "price": 1e6}]})
+    db.orders.insert_many(orders)
+
+    with profile_queries() as profile:
+        sales = category_sales(ProfiledCollection(db.orders), datetime(2026, 5, 1), datetime(2026, 5, 31))
+
+    assert profile.count == 1
+    assert sales == {"audio": 3000.0, "books": 1500.0}  # price x qty
+    assert popular_categories(sales) == [
+        {"name": "audio", "percentage": 67},
+        {"name": "books", "percentage": 33},
+    ]
+    assert popular_categories({}) == []
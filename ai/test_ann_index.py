@@ -0,0 +1,44 @@
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from ann_index import ExactSearch, LSHSearch, make_engine
+from bench_ann import synthetic_descriptions
+
+
+def make_matrix(n=2000):
+    return TfidfVectorizer().fit_transform(synthetic_descriptions(n)).tocsr()
+
+
+def test_exact_search_excludes_query_and_sorts():
+    matrix = make_matrix(300)
+    rows, scores = ExactSearch(matrix).search(matrix[5], 10, exclude=5)
+
+    expected = (matrix @ matrix[5].T).toarray().ravel()
+    expected[5] = -np.inf
+    assert 5 not in rows
+    assert list(scores) == sorted(scores, reverse=True)
+    np.testing.assert_allclose(scores, np.sort(expected)[::-1][:10])
+
+
+def test_lsh_recall_against_exact():
+    matrix = make_matrix()
+    exact = ExactSearch(matrix)
+    lsh = LSHSearch(matrix, n_tables=32, n_bits=8, n_probes=8)
+
+    recalls = []
+    for row in range(0, matrix.shape[0], 40):
+        truth = set(exact.search(matrix[row], 10, exclude=row)[0].tolist())
+        found = set(lsh.search(matrix[row], 10, exclude=row)[0].tolist())
+        assert row not in found
+        recalls.append(len(found & truth) / len(truth))
+    assert np.mean(recalls) > 0.8
+
+
+def test_make_engine_reads_environment(monkeypatch):
+    matrix = make_matrix(100)
+    monkeypatch.setenv("RECOMMENDER_ENGINE", "lsh")
+    monkeypatch.setenv("LSH_TABLES", "3")
+
+    engine = make_engine(matrix)
+    assert isinstance(engine, LSHSearch)
+    assert engine.n_tables == 3
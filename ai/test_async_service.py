@@ -0,0 +1,137 @@
+import json
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("starlette")
+pytest.importorskip("a2wsgi")
+
+from flask import Flask, jsonify
+from starlette.routing import Route
+from starlette.applications import Starlette
+from starlette.testclient import TestClient
+
+from async_service import create_description_app, users_response_async
+
+
+class AsyncCursor:
+    """Just enough of motor's cursor over a mongomock cursor."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def sort(self, *args):
+        self.cursor = self.cursor.sort(*args)
+        return self
+
+    def limit(self, n):
+        self.cursor = self.cursor.limit(n)
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    async def to_list(self, length):
+        return list(self.cursor)[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.cursor:
+            yield doc
+
+
+class AsyncCollection:
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def find_one(self, *args, **kwargs):
+        return self.collection.find_one(*args, **kwargs)
+
+    async def update_one(self, *args, **kwargs):
+        return self.collection.update_one(*args, **kwargs)
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self.collection.find(*args, **kwargs))
+
+
+def gemini_stub(calls):
+    def handle(request):
+        calls.append(json.loads(request.content))
+        return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": "Shiny new copy"}]}}]})
+    return httpx.MockTransport(handle)
+
+
+@pytest.fixture
+def products():
+    collection = mongomock.MongoClient().db.products
+    collection.insert_many([{"name": "Lamp", "category": "Home", "price": 20},
+                            {"name": "Mug", "category": "Kitchen", "price": 8}])
+    return collection
+
+
+def description_client(products, calls):
+    flask_app = Flask(__name__)
+
+    @flask_app.route("/health")
+    def health():
+        return jsonify({"status": "healthy"})
+
+    http = httpx.AsyncClient(transport=gemini_stub(calls))
+    return TestClient(create_description_app(AsyncCollection(products), http, flask_app))
+
+
+def test_generate_description_updates_product(products):
+    calls = []
+    product = products.find_one({"name": "Lamp"})
+    with description_client(products, calls) as client:
+        response = client.post("/generate-description", json={"productId": str(product["_id"])})
+
+    assert response.status_code == 200
+    assert response.json() == {"success": True, "product_id": str(product["_id"]),
+                               "new_description": "Shiny new copy"}
+    assert "Name: Lamp" in calls[0]["contents"][0]["parts"][0]["text"]
+    assert products.find_one({"_id": product["_id"]})["ai_enhanced_description"] == "Shiny new copy"
+
+
+def test_batch_keeps_request_order_and_reports_failures(products):
+    calls = []
+    ids = [str(p["_id"]) for p in products.find().sort("_id", 1)]
+    with description_client(products, calls) as client:
+        response = client.post("/batch-generate-descriptions",
+                               json={"productIds": [ids[1], "not-an-id", ids[0], "0" * 24]})
+
+    results = response.json()["results"]
+    assert [r["product_id"] for r in results] == [ids[1], "not-an-id", ids[0], "0" * 24]
+    assert [r["success"] for r in results] == [True, False, True, False]
+    assert results[1]["error"] == "Invalid Product ID format"
+    assert results[3]["error"] == "Product not found in database"
+    assert len(calls) == 2
+
+
+def test_other_routes_fall_through_to_flask(products):
+    with description_client(products, []) as client:
+        assert client.get("/health").json() == {"status": "healthy"}
+        assert client.post("/generate-description", json={}).status_code == 400
+
+
+def test_users_page_matches_sync_listing():
+    users = mongomock.MongoClient().db.users
+    users.insert_many([{"name": f"user{i}", "email": f"u{i}@x.io", "password": "hash"} for i in range(5)])
+    collection = AsyncCollection(users)
+
+    async def endpoint(request):
+        return await users_response_async(collection, request, ("name", "email"))
+
+    with TestClient(Starlette(routes=[Route("/users", endpoint)])) as client:
+        first = client.get("/users?limit=3")
+        second = client.get(f"/users?limit=3&after={first.headers['X-Next-Cursor']}")
+        streamed = client.get("/users?format=ndjson")
+
+    assert [u["name"] for u in first.json()] == ["user0", "user1", "user2"]
+    assert [u["name"] for u in second.json()] == ["user3", "user4"]
+    assert "X-Next-Cursor" not in second.headers
+    assert "password" not in first.json()[0]
+    assert [json.loads(line)["name"] for line in streamed.text.splitlines()] == [f"user{i}" for i in range(5)]
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from batch_recommend import MAX_BATCH_SIZE, batch_top_k, parse_batch_request
+
+
+def make_matrix(n=40, terms=25, seed=0):
+    rng = np.random.default_rng(seed)
+    return normalize(sparse.random(n, terms, density=0.3, random_state=rng, format="csr")).tocsr()
+
+
+def exact_top_k(matrix, row, k, bias=None):
+    scores = (matrix[row] @ matrix.T).toarray().ravel()
+    if bias is not None:
+        scores = 0.7 * scores + 0.3 * bias
+    scores[row] = -np.inf
+    return np.sort(scores)[::-1][:k], scores
+
+
+@pytest.mark.parametrize("block_elements", [40, 7 * 40, 10 ** 6])
+def test_batch_matches_per_product_exact_top_k(block_elements):
+    matrix = make_matrix()
+    rng = np.random.default_rng(1)
+    bias = rng.random(matrix.shape[0])
+    rows = np.array([3, 0, 17, 39, 3, 22], dtype=np.intp)
+
+    for row_bias in (None, bias):
+        top = batch_top_k(matrix, rows, 5, row_bias, block_elements=block_elements)
+        assert top.shape == (len(rows), 5)
+        for row, top_rows in zip(rows, top):
+            expected, scores = exact_top_k(matrix, row, 5, row_bias)
+            np.testing.assert_allclose(scores[top_rows], expected)
+            assert row not in top_rows
+
+
+def test_k_is_capped_by_the_catalog():
+    matrix = make_matrix(n=4)
+    assert batch_top_k(matrix, np.array([0, 1]), 10).shape == (2, 3)
+    assert batch_top_k(make_matrix(n=1), np.array([0]), 5).shape == (1, 0)
+
+
+def test_parse_deduplicates_ids_in_order():
+    batch = parse_batch_request({"productIds": ["b", "a", "b", 7, "7"], "userId": "u", "limit": "3"})
+    assert batch.product_ids == ["b", "a", "7"]
+    assert batch.user_id == "u"
+    assert batch.limit == 3
+    assert parse_batch_request({"productIds": ["a"]}).limit == 6
+
+
+def test_parse_caps_the_batch_size():
+    ids = [f"{i:024x}" for i in range(MAX_BATCH_SIZE)]
+    assert len(parse_batch_request({"productIds": ids}).product_ids) == MAX_BATCH_SIZE
+    with pytest.raises(ValueError, match=f"At most {MAX_BATCH_SIZE}"):
+        parse_batch_request({"productIds": ids + ["extra"]})
+
+
+@pytest.mark.parametrize("data", [None, [], {}, {"productIds": []}, {"productIds": "abc"}])
+def test_parse_rejects_missing_ids(data):
+    with pytest.raises(ValueError, match="Missing productIds"):
+        parse_batch_request(data)
+
+
+@pytest.mark.parametrize("limit", ["six", None, 2.5, True, [3], 0, -1, "0"])
+def test_parse_rejects_bad_limits(limit):
+    with pytest.raises(ValueError, match="limit"):
+        parse_batch_request({"productIds": ["a"], "limit": limit})
@@ -0,0 +1,108 @@
+import numpy as np
+from bson import ObjectId
+
+from catalog import CatalogSnapshot
+
+
+def make_products():
+    return [
+        {"_id": ObjectId(), "name": "Shirt", "category": "clothing", "price": 20.0,
+         "rating": 4.5, "numReviews": 12, "countInStock": 3, "reviews": [{"rating": 5}]},
+        {"_id": ObjectId(), "name": "Jeans", "category": "clothing", "price": 23.0,
+         "rating": 4.1, "numReviews": 30, "countInStock": 0},
+        {"_id": ObjectId(), "name": "Coat", "category": "clothing", "price": 90.0,
+         "rating": 4.8, "numReviews": 4, "countInStock": 1},
+        {"_id": ObjectId(), "name": "Laptop", "category": "electronics", "price": 21.0,
+         "rating": 3.0, "numReviews": 50, "countInStock": 7},
+        {"_id": ObjectId(), "name": "Cable", "price": None},
+    ]
+
+
+def names(snapshot, rows):
+    return [record["name"] for record in snapshot.get_records(rows)]
+
+
+def test_columns_and_records():
+    products = make_products()
+    snapshot = CatalogSnapshot(products)
+
+    assert len(snapshot) == 5
+    assert snapshot.price.tolist() == [20.0, 23.0, 90.0, 21.0, 0.0]
+    assert snapshot.category_codes.tolist() == [0, 0, 0, 1, -1]
+    assert snapshot.row_of[str(products[3]["_id"])] == 3
+    record = snapshot.get_records([0])[0]
+    assert record["_id"] == str(products[0]["_id"])
+    assert "reviews" in record  # the projection, not the snapshot, drops reviews
+
+
+def test_vectorized_filters():
+    snapshot = CatalogSnapshot(make_products())
+
+    assert names(snapshot, snapshot.top_rows(snapshot.similar_mask(0, 0.2), 8)) == ["Jeans"]
+    popular = snapshot.top_rows(snapshot.popular_mask(4.0, 10), 8, order_by=snapshot.rating)
+    assert names(snapshot, popular) == ["Shirt", "Jeans"]
+    mask = snapshot.category_mask({"electronics", "toys"}) & snapshot.price_mask(15, 30)
+    assert names(snapshot, snapshot.top_rows(mask, 8)) == ["Laptop"]
+    assert names(snapshot, snapshot.top_rows(snapshot.in_stock_mask(), 8)) == ["Shirt", "Coat", "Laptop"]
+
+
+def test_history_rows_tops_up_with_popular_products():
+    products = make_products()
+    snapshot = CatalogSnapshot(products)
+
+    rows = snapshot.history_rows([products[1]["_id"]], limit=3)
+    # Jeans at 23 -> clothing between 16.1 and 29.9, then no popular product left to add.
+    assert names(snapshot, rows) == ["Shirt", "Jeans"]
+    assert names(snapshot, snapshot.history_rows([], limit=3)) == ["Shirt", "Jeans"]
+
+
+def test_price_index_matches_masks():
+    rng = np.random.default_rng(3)
+    products = [
+        {"_id": ObjectId(), "category": f"c{rng.integers(6)}", "price": float(rng.integers(1, 200))}
+        for _ in range(500)
+    ] + [{"_id": ObjectId(), "price": 50.0}]
+    snapshot = CatalogSnapshot(products)
+
+    for row in rng.integers(0, len(products), size=50):
+        expected = snapshot.top_rows(snapshot.similar_mask(row, 0.2), 8)
+        assert snapshot.similar_rows(row, 8, band=0.2).tolist() == expected.tolist()
+
+    codes = snapshot.codes_for(["c1", "c4", "missing"])
+    mask = snapshot.category_mask(["c1", "c4"]) & snapshot.price_mask(35.0, 65.0)
+    assert snapshot.price_band_rows(codes, 35.0, 65.0).tolist() == np.flatnonzero(mask).tolist()
+    assert snapshot.price_band_rows(codes, 35.0, 65.0, limit=8).tolist() == np.flatnonzero(mask)[:8].tolist()
+    assert len(snapshot.price_band_rows([], 0, 100)) == 0
+
+
+def test_uncategorised_products_are_similar_to_each_other():
+    products = [
+        {"_id": ObjectId(), "name": "Cable", "price": 10.0},
+        {"_id": ObjectId(), "name": "Adapter", "price": 11.0},
+        {"_id": ObjectId(), "name": "Charger", "category": "electronics", "price": 10.5},
+        {"_id": ObjectId(), "name": "Dock", "price": 90.0},
+    ]
+    snapshot = CatalogSnapshot(products)
+
+    assert names(snapshot, snapshot.similar_rows(0, 8, band=0.2)) == ["Adapter"]
+    assert snapshot.similar_rows(0, 8).tolist() == snapshot.top_rows(snapshot.similar_mask(0), 8).tolist()
+    assert names(snapshot, snapshot.price_band_rows([-1], 0, 100)) == ["Cable", "Adapter", "Dock"]
+
+
+def test_price_columns_are_converted_once_per_rates():
+    products = make_products()
+    snapshot = CatalogSnapshot(products)
+    rates = {"PKR": 1.0, "USD": 0.004, "EUR": 0.0032, "GBP": 0.0028}
+
+    columns = snapshot.price_columns(rates)
+    assert sorted(columns) == ["EUR", "GBP", "PKR", "USD"]  # no AUD rate
+    assert columns["PKR"].tolist() == [5000.0, 5750.0, 22500.0, 5250.0, 0.0]
+    assert columns["EUR"][0] == 16.0
+    assert snapshot.price_columns(rates) is columns
+    assert snapshot.price_columns(dict(rates)) is not columns
+
+    newer = {"_id": ObjectId(), "price": 2.0}
+    prices = snapshot.convert_prices([snapshot.get_records([2])[0], newer], "PKR", rates)
+    assert prices == [22500.0, 500.0]
+    assert snapshot.convert_prices(products, "AUD", rates) is None
+    assert snapshot.convert_prices(products, "PKR", None) is None
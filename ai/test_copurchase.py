@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+from bson import ObjectId
+
+from copurchase import CoPurchaseMatrix
+
+mongomock = pytest.importorskip("mongomock")
+
+A, B, C, D = (str(ObjectId()) for _ in range(4))
+
+
+def order(*products):
+    return {"_id": ObjectId(), "orderItems": [{"product": ObjectId(p)} for p in products]}
+
+
+def test_build_counts_pairs_once_per_order():
+    orders = mongomock.MongoClient().db.orders
+    orders.insert_many([order(A, B), order(A, B, C), order(A, A), order(D)])
+    matrix = CoPurchaseMatrix(orders, flush_pairs=2)
+    assert matrix.build() == 4
+
+    dense = matrix.matrix.toarray()
+    col = matrix.col_of
+    assert dense[col[A], col[B]] == 2
+    assert dense[col[B], col[C]] == 1
+    assert dense[col[A], col[A]] == 0
+    assert (dense == dense.T).all()
+
+
+def test_refresh_adds_only_new_orders():
+    orders = mongomock.MongoClient().db.orders
+    orders.insert_one(order(A, B))
+    matrix = CoPurchaseMatrix(orders)
+    matrix.build()
+
+    orders.insert_many([order(A, B), order(C, D)])
+    assert matrix.refresh() == 2
+    assert matrix.refresh() == 0
+    assert matrix.matrix[matrix.col_of[A], matrix.col_of[B]] == 2
+    assert matrix.matrix[matrix.col_of[C], matrix.col_of[D]] == 1
+
+
+def test_score_is_weighted_co_purchase_count():
+    matrix = CoPurchaseMatrix(orders_collection=None)
+    matrix.add_orders([order(A, B), order(A, C), order(B, C), order(A, C)])
+    matrix.ready = True
+
+    scores = matrix.score({A: 2, "unknown": 5})
+    assert scores == {B: 2.0, C: 4.0}
+    assert matrix.score({}) == {}
+
+
+def test_concurrent_first_callers_build_once():
+    orders = mongomock.MongoClient().db.orders
+    orders.insert_many([order(A, B), order(C, D)])
+    matrix = CoPurchaseMatrix(orders)
+    builds = []
+    original = matrix.build
+    matrix.build = lambda: builds.append(1) or original()
+
+    threads = [threading.Thread(target=matrix.ensure_built) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert builds == [1] and matrix.ready
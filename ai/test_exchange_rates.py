@@ -0,0 +1,130 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from exchange_rates import ExchangeRateCache
+
+
+class StubRateServer:
+    """Local stand-in for the rates API: serves ``rates`` after ``delay`` seconds."""
+
+    def __init__(self, rates):
+        self.rates = rates
+        self.delay = 0.0
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(stub.delay)
+                body = json.dumps({"result": "success", "base_code": "PKR", "rates": stub.rates}).encode()
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client timed out first, as the timeout tests intend
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v6/latest/PKR"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubRateServer({"PKR": 1.0, "USD": 0.0036, "EUR": 0.0033})
+    yield server
+    server.close()
+
+
+def test_fetch_converts_and_persists_snapshot(stub, tmp_path):
+    path = str(tmp_path / "rates.json")
+    cache = ExchangeRateCache(url=stub.url, snapshot_path=path)
+    assert cache.get_rate("USD", "PKR") == pytest.approx(1 / 0.0036)
+    assert cache.get_rate("USD", "EUR") == pytest.approx(0.0033 / 0.0036)
+    assert cache.get_rate("USD", "XYZ") is None
+
+    # A fresh process with the API down still converts from the snapshot.
+    stub.close()
+    offline = ExchangeRateCache(url=stub.url, timeout=0.2, snapshot_path=path)
+    assert offline.get_rate("USD", "PKR") == pytest.approx(1 / 0.0036)
+
+
+def test_concurrent_snapshot_saves_publish_a_whole_file(tmp_path):
+    path = str(tmp_path / "rates.json")
+    caches = []
+    for i in range(4):
+        cache = ExchangeRateCache(url=None, snapshot_path=path)
+        cache._set({"PKR": 1.0, "USD": i, "pad": "x" * 100_000}, float(i))
+        caches.append(cache)
+    threads = [threading.Thread(target=cache.save_snapshot) for cache in caches * 3]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with open(path) as f:
+        assert json.load(f)["rates"]["USD"] in range(4)
+    assert [p.name for p in tmp_path.iterdir()] == ["rates.json"]
+
+
+def test_stale_rates_are_served_while_revalidating(stub, tmp_path):
+    cache = ExchangeRateCache(url=stub.url, ttl=60, snapshot_path=str(tmp_path / "rates.json"))
+    cache.get_rates()
+    cache.fetched_at -= 120  # expire
+    cache._last_attempt -= 120
+    stub.rates = {"PKR": 1.0, "USD": 0.004}
+    stub.delay = 0.5
+
+    started = time.perf_counter()
+    assert cache.get_rate("USD", "PKR") == pytest.approx(1 / 0.0036)
+    assert cache.get_rate("USD", "PKR") == pytest.approx(1 / 0.0036)
+    assert time.perf_counter() - started < 0.25
+
+    deadline = time.time() + 5
+    while cache.get_rate("USD", "PKR") != pytest.approx(250.0) and time.time() < deadline:
+        time.sleep(0.05)
+    assert cache.get_rate("USD", "PKR") == pytest.approx(250.0)
+    assert stub.requests == 2  # one initial fetch, one revalidation
+
+
+def test_slow_api_on_cold_cache_times_out(stub, tmp_path):
+    stub.delay = 1.0
+    cache = ExchangeRateCache(url=stub.url, timeout=0.2, snapshot_path=str(tmp_path / "rates.json"))
+    started = time.perf_counter()
+    assert cache.get_rate("USD", "PKR") is None
+    assert cache.get_rate("USD", "PKR") is None  # no retry within retry_interval
+    assert time.perf_counter() - started < 0.9
+    assert stub.requests == 1
+
+
+def test_failed_revalidation_backs_off(stub, tmp_path):
+    cache = ExchangeRateCache(url=stub.url, ttl=60, timeout=0.2, retry_interval=30,
+                              snapshot_path=str(tmp_path / "rates.json"))
+    cache.get_rates()
+    cache.fetched_at -= 120
+    cache._last_attempt -= 120
+    stub.close()  # the API goes down
+
+    assert cache.revalidate()
+    deadline = time.time() + 5
+    while cache._refreshing.locked() and time.time() < deadline:
+        time.sleep(0.01)
+    # Still stale, but the failed attempt was just now: no new fetch per request.
+    assert cache.is_stale()
+    assert cache.get_rate("USD", "PKR") == pytest.approx(1 / 0.0036)
+    assert not cache.revalidate()
+    assert stub.requests == 1
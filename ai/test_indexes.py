@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import pytest
+
+from indexes import (
+    INDEXES, QUERY_SHAPES, CollectionScanError, assert_no_collection_scans, ensure_indexes, plan_stages,
+)
+
+mongomock = pytest.importorskip("mongomock")
+
+# Trimmed explain() output in the shapes mongod returns them.
+FIND_IXSCAN = {"queryPlanner": {
+    "winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "seller_1"}},
+    "rejectedPlans": [{"stage": "COLLSCAN"}],
+}}
+SBE_COLLSCAN = {"queryPlanner": {"winningPlan": {"queryPlan": {"stage": "COLLSCAN"}, "slotBasedPlan": {}}}}
+AGGREGATE_IXSCAN = {"stages": [
+    {"$cursor": {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}}},
+    {"$lookup": {"from": "products"}},
+]}
+EMPTY = {"queryPlanner": {"winningPlan": {"stage": "EOF"}}}
+
+
+def shape(name, explain_output):
+    return SimpleNamespace(name=name, explain=lambda db: explain_output)
+
+
+def test_plan_stages_reads_only_winning_plans():
+    assert plan_stages(FIND_IXSCAN) == ["FETCH", "IXSCAN"]
+    assert plan_stages(SBE_COLLSCAN) == ["COLLSCAN"]
+    assert plan_stages(AGGREGATE_IXSCAN) == ["FETCH", "IXSCAN"]
+
+
+def test_collection_scans_fail_loudly():
+    shapes = [shape("by seller", FIND_IXSCAN), shape("in window", AGGREGATE_IXSCAN), shape("empty", EMPTY)]
+    results = assert_no_collection_scans(None, shapes)
+    assert {name: verdict for name, (verdict, _) in results.items()} == {
+        "by seller": "ok", "in window": "ok", "empty": "unverified"}
+
+    with pytest.raises(CollectionScanError, match="by category: COLLSCAN"):
+        assert_no_collection_scans(None, shapes + [shape("by category", SBE_COLLSCAN)])
+
+
+def shape_fields(query_shape):
+    """Filtered fields (any order) then sort fields (in order) of a query shape."""
+    if query_shape.pipeline is not None:
+        return set(query_shape.pipeline[0]["$match"]), []
+    return set(query_shape.filter), [field for field, _ in query_shape.sort or []]
+
+
+def test_every_shape_is_a_prefix_of_a_declared_index():
+    for query_shape in QUERY_SHAPES:
+        filtered, sorted_by = shape_fields(query_shape)
+        for index in INDEXES[query_shape.collection]:
+            keys = [field for field, _ in index.document["key"].items()]
+            if (set(keys[:len(filtered)]) == filtered
+                    and keys[len(filtered):len(filtered) + len(sorted_by)] == sorted_by):
+                break
+        else:
+            pytest.fail(f"{query_shape.name}: no index starts with {sorted(filtered)} + {sorted_by}")
+
+
+def test_ensure_indexes_is_idempotent():
+    db = mongomock.MongoClient().db
+    assert ensure_indexes(db) == ensure_indexes(db)
+    for collection, indexes in INDEXES.items():
+        assert {index.document["name"] for index in indexes} <= set(db[collection].index_information())
@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+from bson import ObjectId
+
+import materialized_recommendations
+from catalog import CatalogSnapshot
+from materialized_recommendations import (
+    GENERATIONS_COLLECTION, RESULTS_COLLECTION, MaterializedRecommendations, compute_chunk, run, utcnow,
+)
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def make_db():
+    client = mongomock.MongoClient()
+    db = client.test
+    products = [
+        {"_id": ObjectId(), "name": "Shirt", "category": "clothing", "price": 20.0, "rating": 4.5, "numReviews": 12},
+        {"_id": ObjectId(), "name": "Jeans", "category": "clothing", "price": 22.0, "rating": 4.1, "numReviews": 30},
+        {"_id": ObjectId(), "name": "Coat", "category": "clothing", "price": 90.0, "rating": 4.8, "numReviews": 40},
+        {"_id": ObjectId(), "name": "Laptop", "category": "electronics", "price": 21.0, "rating": 3.0, "numReviews": 5},
+    ]
+    db.products.insert_many(products)
+    ids = {p["name"]: p["_id"] for p in products}
+    users = [ObjectId(), ObjectId()]
+    now = utcnow()
+    db.orders.insert_many([
+        {"user": users[0], "createdAt": now - timedelta(days=3), "orderItems": [{"product": ids["Shirt"]}]},
+        {"user": users[1], "createdAt": now - timedelta(days=200), "orderItems": [{"product": ids["Laptop"]}]},
+    ])
+    return client, db, ids, [str(u) for u in users]
+
+
+def test_compute_chunk_writes_one_entry_per_user():
+    _, db, ids, users = make_db()
+    snapshot = CatalogSnapshot.load(db.products)
+
+    assert compute_chunk(db, snapshot, users, generation=7, limit=3) == 2
+    first = db[RESULTS_COLLECTION].find_one({"_id": users[0]})
+    # Same category and price band as the shirt, then topped up with popular products.
+    assert first["productIds"] == [str(ids["Shirt"]), str(ids["Jeans"]), str(ids["Coat"])]
+    assert first["historyProductIds"] == [str(ids["Shirt"])]
+    assert first["generation"] == 7
+
+
+def test_run_scores_active_users_and_publishes_the_generation(monkeypatch):
+    client, db, _, users = make_db()
+    monkeypatch.setattr(materialized_recommendations, "MongoClient", lambda uri: client)
+    monkeypatch.setattr(materialized_recommendations, "ProcessPoolExecutor", ThreadPoolExecutor)
+
+    generation, done = run("mongodb://test", days=90, workers=1)
+    assert done == 1
+    assert [entry["_id"] for entry in db[RESULTS_COLLECTION].find()] == [users[0]]
+    assert db[GENERATIONS_COLLECTION].find_one({"_id": "current"})["generation"] == generation
+
+    table = MaterializedRecommendations(db)
+    assert len(table.get(users[0], 2)) == 2
+    assert table.get(users[1]) is None
+
+
+def test_get_rejects_old_generations_expired_entries_and_newer_histories():
+    _, db, ids, users = make_db()
+    db[GENERATIONS_COLLECTION].insert_one({"_id": "current", "generation": 5})
+    now = utcnow()
+    db[RESULTS_COLLECTION].insert_many([
+        {"_id": "fresh", "productIds": ["a", "b"], "historyProductIds": [str(ids["Shirt"])],
+         "generation": 5, "computedAt": now},
+        {"_id": "old_generation", "productIds": ["a"], "generation": 4, "computedAt": now},
+        {"_id": "expired", "productIds": ["a"], "generation": 5, "computedAt": now - timedelta(days=3)},
+    ])
+    table = MaterializedRecommendations(db, max_age=timedelta(days=2))
+
+    assert table.get("fresh", 1) == ["a"]
+    assert table.get("old_generation") is None
+    assert table.get("expired") is None
+    assert table.get("missing") is None
+    assert (table.hits, table.misses) == (1, 3)
+
+    # The client's history is what the entry was computed from...
+    assert table.get("fresh", order_history=[{"productId": str(ids["Shirt"])}]) == ["a", "b"]
+    # ...or it has moved on: a product the entry never saw, or an order placed after it.
+    assert table.get("fresh", order_history=[{"productId": str(ids["Coat"])}]) is None
+    newer = (now + timedelta(minutes=1)).isoformat() + "Z"
+    assert table.get("fresh", order_history=[
+        {"createdAt": newer, "orderItems": [{"product": str(ids["Shirt"])}]}]) is None
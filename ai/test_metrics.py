@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask, jsonify
+
+import metrics
+from metrics import Histogram, install_metrics, outbound_http, register_cache, render
+
+
+def sample(text, line_prefix):
+    """Value of the first exposition line starting with ``line_prefix``."""
+    for line in text.splitlines():
+        if line.startswith(line_prefix):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"no sample {line_prefix!r} in:\n{text}")
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "Test.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, "/x")
+
+    samples = {(name, labels): value for name, labels, value in histogram.samples()}
+    assert samples[("test_seconds_bucket", ("/x", "0.1"))] == 1
+    assert samples[("test_seconds_bucket", ("/x", "1.0"))] == 3
+    assert samples[("test_seconds_bucket", ("/x", "+Inf"))] == 4
+    assert samples[("test_seconds_count", ("/x",))] == 4
+    assert samples[("test_seconds_sum", ("/x",))] == pytest.approx(4.05)
+
+
+def test_requests_record_latency_mongo_and_outbound_time():
+    app = Flask(__name__)
+    install_metrics(app, "test_service")
+
+    @app.route("/items/<item_id>")
+    def item(item_id):
+        # What the pymongo listener sees for two commands.
+        for micros in (1500, 2500):
+            metrics.mongo_listener.succeeded(SimpleNamespace(command_name="find", duration_micros=micros))
+        with outbound_http("test_upstream"):
+            pass
+        return jsonify({"id": item_id})
+
+    client = app.test_client()
+    client.get("/items/1")
+    client.get("/items/2")
+    text = client.get("/metrics").get_data(as_text=True)
+
+    labels = 'service="test_service",endpoint="/items/<item_id>"'
+    assert sample(text, f'http_request_duration_seconds_count{{{labels},method="GET",status="200"}}') == 2
+    assert sample(text, f'http_request_mongo_queries_sum{{{labels}}}') == 4
+    assert sample(text, f'http_request_mongo_seconds_sum{{{labels}}}') == pytest.approx(0.008)
+    assert sample(text, f'http_request_outbound_seconds_count{{{labels}}}') == 2
+    assert sample(text, 'outbound_http_duration_seconds_count{target="test_upstream",outcome="ok"}') == 2
+
+
+def test_mongo_commands_outside_requests_are_not_attributed():
+    assert metrics.current_stats() is None
+    metrics.mongo_listener.failed(SimpleNamespace(command_name="test_cmd", duration_micros=10))
+    text = render()
+    assert sample(text, 'mongo_command_failures_total{command="test_cmd"}') == 1
+    assert sample(text, 'mongo_command_duration_seconds_count{command="test_cmd"}') == 1
+
+
+def test_outbound_errors_are_labelled():
+    with pytest.raises(RuntimeError):
+        with outbound_http("test_failing"):
+            raise RuntimeError("timeout")
+    assert sample(render(), 'outbound_http_duration_seconds_count{target="test_failing",outcome="error"}') == 1
+
+
+def test_registered_caches_are_read_at_scrape_time():
+    cache = SimpleNamespace(hits=3, misses=1)
+    register_cache("test_cache", cache)
+    cache.hits += 1
+    text = render()
+    assert sample(text, 'cache_hits_total{cache="test_cache"}') == 4
+    assert sample(text, 'cache_misses_total{cache="test_cache"}') == 1
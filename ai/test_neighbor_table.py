@@ -0,0 +1,93 @@
+import os
+import threading
+
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from neighbor_table import NeighborTable, NeighborTableStore
+from product_index import IndexSnapshot
+
+
+def make_snapshot(n=50, terms=30, seed=0):
+    rng = np.random.default_rng(seed)
+    matrix = sparse.random(n, terms, density=0.2, random_state=rng, format="csr")
+    matrix = normalize(matrix).tocsr()
+    product_ids = [f"{i:024x}" for i in range(n)]
+    return IndexSnapshot(matrix, product_ids, {pid: i for i, pid in enumerate(product_ids)})
+
+
+def test_build_matches_exact_top_k():
+    snapshot = make_snapshot()
+    table = NeighborTable.build(snapshot, k=5, block_size=7)
+
+    assert table.neighbors.dtype == np.int32
+    assert table.scores.dtype == np.float32
+    dense = (snapshot.matrix @ snapshot.matrix.T).toarray()
+    np.fill_diagonal(dense, -np.inf)
+    for row in range(dense.shape[0]):
+        expected = np.sort(dense[row])[::-1][:5]
+        np.testing.assert_allclose(table.scores[row], expected, rtol=1e-5)
+        assert row not in table.neighbors[row]
+
+
+def test_default_blocks_fit_the_element_budget(monkeypatch):
+    snapshot = make_snapshot()
+    expected = NeighborTable.build(snapshot, k=5, block_size=50)
+    monkeypatch.setattr("neighbor_table.BLOCK_ELEMENTS", 120)  # two rows of 50 per block
+
+    table = NeighborTable.build(snapshot, k=5)
+    np.testing.assert_array_equal(table.neighbors, expected.neighbors)
+    np.testing.assert_allclose(table.scores, expected.scores)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    snapshot = make_snapshot(n=10)
+    table = NeighborTable.build(snapshot, k=3)
+    path = str(tmp_path / "neighbors.npz")
+    table.save(path)
+
+    loaded = NeighborTable.load(path)
+    assert loaded.product_ids == table.product_ids
+    assert loaded.lookup(table.product_ids[4], 2) == table.lookup(table.product_ids[4], 2)
+    assert loaded.lookup("unknown") is None
+
+
+def test_concurrent_saves_publish_a_whole_table(tmp_path):
+    tables = [NeighborTable.build(make_snapshot(n=30, seed=seed), k=4) for seed in range(4)]
+    path = str(tmp_path / "neighbors.npz")
+    threads = [threading.Thread(target=table.save, args=(path,)) for table in tables * 3]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    loaded = NeighborTable.load(path)
+    assert any(np.array_equal(loaded.neighbors, table.neighbors) for table in tables)
+    assert os.listdir(tmp_path) == ["neighbors.npz"]
+
+
+def test_tiny_catalog_has_no_neighbours():
+    table = NeighborTable.build(make_snapshot(n=1), k=5)
+    assert table.k == 0
+    assert table.lookup(table.product_ids[0]) == []
+
+
+def test_store_reloads_only_when_the_file_changes(tmp_path):
+    path = str(tmp_path / "neighbors.npz")
+    store = NeighborTableStore(path, check_interval=0)
+    assert store.get() is None
+
+    NeighborTable.build(make_snapshot(n=10), k=3).save(path)
+    first = store.get()
+    assert first is not None
+    assert store.get() is first  # unchanged file, no reload
+
+    NeighborTable.build(make_snapshot(n=12), k=3).save(path)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10 ** 9))
+    assert len(store.get().product_ids) == 12
+
+    with open(path, "wb") as f:
+        f.write(b"torn")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 2 * 10 ** 9))
+    assert len(store.get().product_ids) == 12  # a bad file keeps the loaded table
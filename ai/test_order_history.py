@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from order_history import OrderHistory
+
+
+def order(day, total, payment, *categories):
+    return {
+        "createdAt": datetime(2026, 1, 1) + timedelta(days=day, hours=day % 5),
+        "totalPrice": total,
+        "paymentMethod": payment,
+        "orderItems": [{"category": c} for c in categories],
+    }
+
+
+# Deliberately not in date order.
+ORDERS = [
+    order(20, 30.0, "card", "home"),
+    order(0, 10.0, "paypal", "books", "home"),
+    order(45, 50.0, "card", "home", None),
+    order(9, 10.0, "card", "toys"),
+]
+
+
+def test_features_do_not_depend_on_fetch_order():
+    now = datetime(2026, 3, 1)
+    features = OrderHistory(ORDERS).features(now=now)
+    assert features == OrderHistory(reversed(ORDERS)).features(now=now)
+    assert features["total_orders"] == 4
+    assert features["total_spent"] == 100.0 and features["avg_order_value"] == 25.0
+    assert features["days_since_last_order"] == (now - ORDERS[2]["createdAt"]).days
+    assert features["unique_categories"] == 3  # items without a category are not one
+    assert features["top_category"] == "home"
+    assert features["preferred_payment_method"] == "card"
+
+
+def test_prediction_uses_whole_day_gaps_between_sorted_orders():
+    history = OrderHistory(ORDERS)
+    # Each gap is floored to whole days, as timedelta.days does.
+    dates = sorted(o["createdAt"] for o in ORDERS)
+    gaps = [(b - a).days for a, b in zip(dates, dates[1:])]
+    assert history.purchase_interval_days() == pytest.approx(sum(gaps) / len(gaps))
+    assert history.predicted_next_purchase() == dates[-1] + timedelta(days=sum(gaps) / len(gaps))
+    assert [h["total"] for h in history.purchase_history()] == [10.0, 10.0, 30.0, 50.0]
+    assert history.purchase_history()[0]["date"] == dates[0].isoformat()
+
+
+def test_empty_and_single_order_histories():
+    empty = OrderHistory([])
+    assert len(empty) == 0
+    assert empty.features()["days_since_last_order"] == 365
+    assert empty.features()["preferred_payment_method"] is None
+    assert OrderHistory(ORDERS[:1]).purchase_interval_days() == 30
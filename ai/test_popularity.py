@@ -0,0 +1,86 @@
+import pytest
+from bson import ObjectId
+
+from popularity import PopularityRanking
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def make_ranking(**kwargs):
+    db = mongomock.MongoClient().db
+    products = {
+        "veteran": {"_id": ObjectId(), "category": "audio", "rating": 4.6, "numReviews": 200},
+        "one_hit": {"_id": ObjectId(), "category": "audio", "rating": 5.0, "numReviews": 1},
+        "average": {"_id": ObjectId(), "category": "books", "rating": 3.5, "numReviews": 40},
+        "unrated": {"_id": ObjectId(), "category": "books", "rating": 0, "numReviews": 0},
+    }
+    db.products.insert_many(list(products.values()))
+    ids = {name: str(p["_id"]) for name, p in products.items()}
+    ranking = PopularityRanking(db.products, db.orders, **kwargs)
+    return db, ranking, products, ids
+
+
+def test_bayesian_average_outranks_single_perfect_review():
+    _, ranking, _, ids = make_ranking()
+    ranking.build()
+    assert ranking.top(2) == [ids["veteran"], ids["one_hit"]]
+    # The catalog mean would beat a well-reviewed 3.5, but no reviews and no
+    # sales is not enough evidence to rank above it.
+    assert ranking.scores[ids["unrated"]] > ranking.scores[ids["average"]]
+    assert ranking.top(8, category="books") == [ids["average"], ids["unrated"]]
+    assert ranking.top(8, category="audio", exclude=[ids["veteran"]]) == [ids["one_hit"]]
+
+
+def test_order_and_review_events_reorder_without_mongo():
+    _, ranking, _, ids = make_ranking(sales_weight=1.0)
+    ranking.build()
+    ranking.products_collection = ranking.orders_collection = None  # any query would fail
+
+    ranking.record_order({ids["average"]: 50})
+    assert ranking.top(1, category="books") == [ids["average"]]
+
+    for _ in range(100):
+        ranking.record_review(ids["one_hit"], 5)
+    assert ranking.top(8, category="audio") == [ids["one_hit"], ids["veteran"]]
+    assert len(ranking.top(10)) == 4
+
+
+def test_refresh_folds_in_new_orders_and_drops_event_counts():
+    db, ranking, products, ids = make_ranking(sales_weight=1.0)
+    ranking.build()
+    ranking.record_order({ids["unrated"]: 3})
+    db.orders.insert_one({"_id": ObjectId(), "orderItems": [
+        {"product": products["unrated"]["_id"], "qty": 3},
+    ]})
+    ranking.refresh()
+    assert ranking.pending_units == {}
+    assert ranking.units == {ids["unrated"]: 3}
+
+    db.orders.insert_one({"_id": ObjectId(), "orderItems": [{"product": products["unrated"]["_id"]}]})
+    ranking.refresh()
+    assert ranking.units == {ids["unrated"]: 4}
+
+
+def test_first_sale_lifts_a_product_into_the_ranked_tier():
+    _, ranking, _, ids = make_ranking(sales_weight=0.0)
+    ranking.build()
+    assert ranking.top(8, category="books") == [ids["average"], ids["unrated"]]
+    ranking.record_order({ids["unrated"]: 1})
+    assert ranking.top(8, category="books") == [ids["unrated"], ids["average"]]
+
+
+def test_events_during_a_refresh_are_carried_over():
+    db, ranking, products, ids = make_ranking(sales_weight=1.0)
+    ranking.build()
+    ranking.record_order({ids["average"]: 2})
+    find = db.orders.find
+
+    def find_and_record(*args, **kwargs):
+        # Reported while the refresh is reading orders, not yet in its scan.
+        ranking.record_order({ids["average"]: 1, ids["veteran"]: 5})
+        return find(*args, **kwargs)
+
+    ranking.orders_collection = type("Orders", (), {"find": staticmethod(find_and_record)})()
+    ranking.refresh()
+    assert ranking.pending_units == {ids["average"]: 1, ids["veteran"]: 5}
+    assert ranking.scores[ids["veteran"]] == ranking._score(ids["veteran"])
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+from preference_cache import PreferenceCache
+
+V1 = (datetime(2024, 1, 1), 3)
+
+
+def test_hit_requires_matching_version():
+    cache = PreferenceCache()
+    cache.put("u1", V1, {"p1": 2})
+
+    assert cache.get("u1", V1) == {"p1": 2}
+    assert cache.get("u1", (datetime(2024, 1, 2), 3)) is None
+    assert cache.get("u1", V1) is None  # the stale entry was dropped
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    cache = PreferenceCache(maxsize=2, ttl=10)
+    cache.put("u1", V1, {})
+    cache.put("u2", V1, {})
+    cache.get("u1", V1)
+    cache.put("u3", V1, {})
+    assert cache.get("u2", V1) is None
+    assert cache.get("u1", V1) == {}
+
+    now = 1_000_000.0
+    monkeypatch.setattr("preference_cache.time.time", lambda: now)
+    cache.put("u4", V1, {})
+    now += 11
+    assert cache.get("u4", V1) is None
+
+
+def test_events_patch_entries_to_the_new_version():
+    cache = PreferenceCache()
+    cache.put("u1", V1, {"p1": 2})
+
+    cache.record_order("u1", ["p1", "p2"], datetime(2024, 2, 1))
+    cache.record_view("u1", "p3")
+    assert cache.get("u1", (datetime(2024, 2, 1), 4)) == {"p1": 4, "p2": 2, "p3": 1}
+
+    cache.record_order("u1", ["p9"])
+    assert len(cache) == 0
+
+
+def test_replayed_order_is_not_counted_twice():
+    # Built after the order was already in Mongo: V1's latest order is that order.
+    cache = PreferenceCache()
+    cache.put("u1", V1, {"p1": 2})
+
+    cache.record_order("u1", ["p1"], V1[0])
+    assert cache.get("u1", V1) is None
+
+    cache.put("u1", V1, {"p1": 2})
+    cache.record_order("u1", ["p1"], datetime(2023, 12, 1))
+    assert len(cache) == 0
@@ -0,0 +1,131 @@
+import threading
+from datetime import datetime
+
+import numpy as np
+import pytest
+from bson import ObjectId
+from sklearn.metrics.pairwise import cosine_similarity
+
+from product_index import ProductTextIndex
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def make_collection():
+    collection = mongomock.MongoClient().db.products
+    collection.insert_many([
+        {"_id": ObjectId(), "description": "bright red cotton shirt", "updatedAt": datetime(2024, 1, 1)},
+        {"_id": ObjectId(), "description": "comfortable blue jeans", "updatedAt": datetime(2024, 1, 1)},
+        {"_id": ObjectId(), "description": "gaming laptop with fast gpu", "updatedAt": datetime(2024, 1, 2)},
+        {"_id": ObjectId(), "description": "noise cancelling wireless headphones", "updatedAt": datetime(2024, 1, 2)},
+    ])
+    return collection
+
+
+def test_similarities_match_cosine_similarity():
+    collection = make_collection()
+    index = ProductTextIndex(collection)
+    index.build()
+
+    expected = cosine_similarity(index.matrix[2], index.matrix).ravel()
+    np.testing.assert_allclose(index.similarities(2), expected)
+    assert index.last_updated == datetime(2024, 1, 2)
+
+
+def test_refresh_patches_changed_and_new_products():
+    collection = make_collection()
+    index = ProductTextIndex(collection, refit_ratio=1.0)
+    index.build()
+    vocabulary = dict(index.vectorizer.vocabulary_)
+
+    shirt = collection.find_one({"description": "bright red cotton shirt"})
+    collection.update_one(
+        {"_id": shirt["_id"]},
+        {"$set": {"description": "blue cotton jeans", "updatedAt": datetime(2024, 2, 1)}},
+    )
+    new_id = collection.insert_one(
+        {"description": "red wireless headphones", "updatedAt": datetime(2024, 2, 2)}
+    ).inserted_id
+
+    assert index.refresh() == 2
+    assert index.vectorizer.vocabulary_ == vocabulary
+    assert index.matrix.shape[0] == 5
+    assert index.row_of[str(new_id)] == 4
+    assert index.last_updated == datetime(2024, 2, 2)
+
+    patched = index.matrix[index.row_of[str(shirt["_id"])]].toarray()
+    expected = index.vectorizer.transform(["blue cotton jeans"]).toarray()
+    np.testing.assert_allclose(patched, expected)
+    assert index.refresh() == 0
+
+
+def test_large_change_set_triggers_refit():
+    collection = make_collection()
+    index = ProductTextIndex(collection, refit_ratio=0.2)
+    index.build()
+
+    collection.insert_one({"description": "leather walking shoes", "updatedAt": datetime(2024, 3, 1)})
+    index.refresh()
+
+    assert "leather" in index.vectorizer.vocabulary_
+    assert index.matrix.shape[0] == 5
+
+
+def test_background_refresh_rebuilds_derived_structures_in_its_thread():
+    collection = make_collection()
+    index = ProductTextIndex(collection, refit_ratio=1.0)
+    index.build()
+    seen = threading.Event()
+    matrices = []
+
+    def on_refresh():
+        matrices.append((threading.current_thread().name, index.snapshot().matrix.shape[0]))
+        seen.set()
+
+    collection.insert_one({"description": "leather walking shoes", "updatedAt": datetime(2024, 3, 1)})
+    index.start_background_refresh(interval=0.01, on_refresh=on_refresh)
+    try:
+        assert seen.wait(5)
+    finally:
+        index.stop_background_refresh()
+    assert matrices[0] == ("product-index-refresh", 5)
+
+
+def test_refresh_drops_deleted_products():
+    collection = make_collection()
+    index = ProductTextIndex(collection, refit_ratio=1.0)
+    index.build()
+    laptop = collection.find_one({"description": "gaming laptop with fast gpu"})
+    headphones = index.matrix[index.row_of[str(collection.find_one(
+        {"description": "noise cancelling wireless headphones"})["_id"])]].toarray()
+
+    collection.delete_one({"_id": laptop["_id"]})
+    assert index.refresh() == 1
+    assert str(laptop["_id"]) not in index.row_of
+    assert index.matrix.shape[0] == len(index.product_ids) == 3
+    moved = index.matrix[index.row_of[index.product_ids[-1]]].toarray()
+    np.testing.assert_allclose(moved, headphones)
+    assert index.refresh() == 0
+
+
+def test_request_refresh_is_rate_limited_and_never_waits():
+    collection = make_collection()
+    index = ProductTextIndex(collection, refit_ratio=1.0)
+    index.build()
+
+    collection.insert_one({"description": "leather walking shoes", "updatedAt": datetime(2024, 3, 1)})
+    assert index.request_refresh(min_interval=60) == 1
+    collection.insert_one({"description": "wool winter hat", "updatedAt": datetime(2024, 3, 2)})
+    assert index.request_refresh(min_interval=60) == 0
+    assert index.matrix.shape[0] == 5
+
+    # A writer is busy (the background refresh, say): requests skip rather than queue.
+    index._last_request_refresh = 0.0
+    with index._updating:
+        result = []
+        thread = threading.Thread(target=lambda: result.append(index.request_refresh(min_interval=0)))
+        thread.start()
+        thread.join(timeout=5)
+        assert result == [0]
+        assert index.snapshot().matrix.shape[0] == 5
+    assert index.request_refresh(min_interval=0) == 1
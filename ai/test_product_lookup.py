@@ -0,0 +1,56 @@
+import pytest
+from bson import ObjectId
+
+from catalog import CatalogCache
+from product_lookup import ProductResolver, category_price_profile, collect_product_ids
+from query_profiler import ProfiledCollection, profile_queries
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def make_products(count=40):
+    collection = mongomock.MongoClient().db.products
+    products = [
+        {"_id": ObjectId(), "category": f"c{i % 3}", "price": float(i)} for i in range(count)
+    ]
+    collection.insert_many(products)
+    return ProfiledCollection(collection), products
+
+
+def test_collect_product_ids_accepts_orders_and_flat_items():
+    a, b = ObjectId(), ObjectId()
+    orders = [{"orderItems": [{"product": a}, {"product": b}]}, {"orderItems": [{"product": a}]}]
+    assert collect_product_ids(orders) == [str(a), str(b), str(a)]
+    assert collect_product_ids([{"product": a, "category": "x"}, {"productId": str(b)}]) == [str(a), str(b)]
+    assert collect_product_ids(None) == []
+
+
+def test_forty_item_history_costs_one_query():
+    collection, products = make_products()
+    history = [{"orderItems": [{"product": p["_id"]} for p in products[i:i + 4]]} for i in range(0, 40, 4)]
+    resolver = ProductResolver(collection, {"category": 1, "price": 1})
+
+    with profile_queries() as profile:
+        categories, prices = category_price_profile(history, resolver)
+
+    assert profile.count == 1
+    assert resolver.query_count == 1
+    assert categories == {"c0", "c1", "c2"}
+    assert sorted(prices) == [float(i) for i in range(40)]
+
+
+def test_catalog_hits_skip_mongo_and_invalid_ids_are_ignored():
+    collection, products = make_products(10)
+    catalog = CatalogCache(collection.collection)
+    catalog.get()
+    new_id = collection.collection.insert_one({"category": "new", "price": 1.0}).inserted_id
+    resolver = ProductResolver(collection, catalog=catalog)
+
+    with profile_queries() as profile:
+        resolved = resolver.resolve([p["_id"] for p in products])
+    assert len(resolved) == 10 and profile.count == 0
+
+    with profile_queries() as profile:
+        resolved = resolver.resolve([products[0]["_id"], new_id, "not-an-id"])
+    assert set(resolved) == {str(products[0]["_id"]), str(new_id)}
+    assert profile.count == 1
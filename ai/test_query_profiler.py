@@ -0,0 +1,124 @@
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from flask import Flask, jsonify
+
+import query_profiler
+from query_profiler import (
+    ProfiledCollection, QueryProfile, command_shape, install_query_profiler, profile_queries,
+)
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def test_shapes_strip_values_but_keep_structure():
+    first = command_shape("find", {"find": "products", "filter": {"_id": ObjectId(), "price": {"$gte": 5}}})
+    second = command_shape("find", {"find": "products", "filter": {"_id": ObjectId(), "price": {"$gte": 90}}})
+    assert first == second == 'find products {"_id":"?","price":{"$gte":"?"}}'
+
+    in_small = command_shape("find", {"find": "products", "filter": {"_id": {"$in": [1]}}})
+    in_large = command_shape("find", {"find": "products", "filter": {"_id": {"$in": [1, 2, 3]}}})
+    assert in_small == in_large
+
+    update = command_shape("update", {"update": "products", "updates": [{"q": {"_id": 1}, "u": {"$set": {"a": 1}}}]})
+    assert update == 'update products {"_id":"?"}'
+    assert command_shape("getMore", {"getMore": 123, "collection": "orders"}) == "getMore orders"
+
+
+def test_repeated_shapes_are_n_plus_one_candidates():
+    profile = QueryProfile()
+    profile.record('find orders {"user":"?"}')
+    for _ in range(4):
+        profile.record('find products {"_id":"?"}', 0.001)
+    for _ in range(5):
+        profile.record("getMore orders")
+
+    assert [(shape, count) for shape, count, _ in profile.n_plus_one()] == [('find products {"_id":"?"}', 4)]
+    assert profile.summary() == 'queries=10; mongo_ms=4.0; n+1=find products {"_id":"?"} x4'
+    with pytest.raises(AssertionError, match="Query budget exceeded"):
+        profile.assert_budget(max_queries=20, max_repeats=3)
+    profile.assert_budget(max_queries=10)
+
+
+def test_listener_attributes_commands_to_the_active_profile():
+    listener = query_profiler._ProfilerListener()
+
+    def run(request_id):
+        command = {"find": "users", "filter": {"_id": request_id}}
+        event = SimpleNamespace(command_name="find", command=command, connection_id=("h", 1),
+                                request_id=request_id, duration_micros=2000)
+        listener.started(event)
+        listener.succeeded(event)
+
+    run(1)  # no active profile: ignored
+    with profile_queries() as profile:
+        run(2)
+        run(3)
+    assert profile.count == 2
+    assert profile.shapes() == {'find users {"_id":"?"}': (2, 0.004)}
+
+
+def test_flask_header_reports_n_plus_one(caplog):
+    products = ProfiledCollection(mongomock.MongoClient().db.products)
+    ids = products.insert_many([{"name": f"p{i}"} for i in range(4)]).inserted_ids
+    app = Flask(__name__)
+    install_query_profiler(app, enabled=True)
+
+    @app.route("/loop")
+    def loop():
+        return jsonify([products.find_one({"_id": pid})["name"] for pid in ids])
+
+    response = app.test_client().get("/loop")
+    assert response.headers["X-Query-Profile"].startswith("queries=4;")
+    assert 'n+1=find products {"_id":"?"} x4' in response.headers["X-Query-Profile"]
+    assert any(r.message == "N+1 query candidates" for r in caplog.records)
+
+
+# --- per-endpoint query budgets ------------------------------------------
+
+@pytest.fixture
+def analytics(monkeypatch):
+    # Any URI will do: the module's collections are swapped for mongomock below.
+    monkeypatch.setenv("MONGODB_URI", os.getenv("MONGODB_URI") or "mongodb://localhost:27017")
+    import predictive_analytics
+
+    db = mongomock.MongoClient().db
+    seller, buyer = ObjectId(), ObjectId()
+    db.users.insert_one({"_id": buyer, "name": "Buyer", "email": "b@x.io"})
+    products = db.products.insert_many(
+        [{"name": f"p{i}", "seller": seller, "category": "home", "price": 10} for i in range(6)]).inserted_ids
+    now = datetime(2026, 1, 1)
+    db.orders.insert_many([
+        {"user": buyer, "createdAt": now - timedelta(days=10 * i), "totalPrice": 20, "paymentMethod": "card",
+         "orderItems": [{"product": products[i % 6], "category": "home", "qty": 1, "price": 10}]}
+        for i in range(12)
+    ])
+    for name in ("users", "products", "orders"):
+        monkeypatch.setattr(predictive_analytics, f"{name}_collection", ProfiledCollection(db[name]))
+    return predictive_analytics.app.test_client(), seller, buyer
+
+
+def test_seller_analytics_budget(analytics):
+    client, seller, _ = analytics
+    with profile_queries() as profile:
+        response = client.get(f"/analytics/seller/{seller}")
+    assert response.status_code == 200
+    profile.assert_budget(max_queries=2, max_repeats=1)
+
+
+def test_predict_budget(analytics):
+    client, _, buyer = analytics
+    with profile_queries() as profile:
+        response = client.post("/predict", json={"userId": str(buyer)})
+    assert response.status_code == 200
+    profile.assert_budget(max_queries=2, max_repeats=1)
+
+
+def test_user_listing_budget(analytics):
+    client, _, _ = analytics
+    with profile_queries() as profile:
+        client.get("/users?limit=1")
+    profile.assert_budget(max_queries=1)
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import numpy as np
+from bson import ObjectId
+from flask import Flask, jsonify
+
+from response_encoding import format_product_cards, install_json_provider, loads
+
+
+def make_app():
+    app = Flask(__name__)
+    install_json_provider(app)
+    return app
+
+
+def test_jsonify_encodes_mongo_and_numpy_values():
+    app = make_app()
+    oid = ObjectId()
+    with app.app_context():
+        response = jsonify({
+            "_id": oid,
+            "createdAt": datetime(2024, 5, 1, 12, 30),
+            "scores": np.array([0.5, 1.0], dtype=np.float32),
+            "nested": [{"product": oid}],
+        })
+    body = loads(response.get_data())
+    assert response.mimetype == "application/json"
+    assert body["_id"] == str(oid)
+    assert body["createdAt"].startswith("2024-05-01T12:30:00")
+    assert body["scores"] == [0.5, 1.0]
+    assert body["nested"][0]["product"] == str(oid)
+
+
+def test_request_json_round_trips_through_provider():
+    app = make_app()
+
+    @app.route("/echo", methods=["POST"])
+    def echo():
+        from flask import request
+        return jsonify(request.get_json())
+
+    response = app.test_client().post("/echo", json={"productIds": ["a", "b"], "limit": 3})
+    assert loads(response.get_data()) == {"productIds": ["a", "b"], "limit": 3}
+
+
+def test_format_product_cards_uses_given_prices_and_skips_incomplete_products():
+    oid = ObjectId()
+    products = [
+        {"_id": oid, "name": "Lamp", "description": "d", "price": 10.0, "image": "i", "rating": 4.8},
+        {"name": "no id", "price": 1.0},
+        {"_id": ObjectId(), "name": "no price"},
+    ]
+    cards = format_product_cards(products, [2801.23, 280.12, 0.0], "PKR", default_reviews=lambda: 7)
+    assert cards == [{
+        "id": str(oid), "name": "Lamp", "description": "d", "price": 2801.23,
+        "image": "i", "rating": 4.8, "reviews": 7, "currency": "PKR",
+    }]
+
+    unconverted = format_product_cards(products[:1])
+    assert unconverted[0]["price"] == 10.0
+    assert unconverted[0]["currency"] == "USD"
+    assert unconverted[0]["reviews"] == 5
@@ -0,0 +1,91 @@
+from datetime import date, datetime
+
+import pytest
+from bson import ObjectId
+
+import sales_rollup
+
+from sales_rollup import ROLLUP_COLLECTION, SalesRollup, backfill, catch_up
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def make_db():
+    db = mongomock.MongoClient().db
+    seller_a, seller_b = ObjectId(), ObjectId()
+    products = [
+        {"_id": ObjectId(), "category": "audio", "user": seller_a},
+        {"_id": ObjectId(), "category": "books", "user": seller_b},
+    ]
+    db.products.insert_many(products)
+    return db, products, (str(seller_a), str(seller_b))
+
+
+def add_order(db, day, items):
+    db.orders.insert_one({
+        "_id": ObjectId(),
+        "createdAt": datetime(2026, 3, day, 15, 30),
+        "orderItems": [{"product": p["_id"], "price": price, "qty": qty} for p, price, qty in items],
+    })
+
+
+def test_backfill_then_serve_slices():
+    db, (audio, books), (seller_a, seller_b) = make_db()
+    add_order(db, 1, [(audio, 10.0, 2), (books, 5.0, 1)])
+    add_order(db, 3, [(books, 5.0, 4)])
+    add_order(db, 3, [(audio, 30.0, 1)])
+    assert backfill(db, batch_size=2) == 4
+
+    rollup = SalesRollup(db)
+    rollup.load()
+    assert rollup.daily_revenue(date(2026, 2, 28), date(2026, 3, 4)).tolist() == [0, 25, 0, 50, 0]
+    assert rollup.daily_revenue(date(2026, 3, 1), date(2026, 3, 3), category="books").tolist() == [5, 0, 20]
+    assert rollup.daily_revenue(date(2026, 3, 1), date(2026, 3, 3), seller=seller_a).tolist() == [20, 0, 30]
+    assert rollup.category_revenue(date(2026, 3, 2), date(2026, 3, 9)) == {"books": 20.0, "audio": 30.0}
+    assert rollup.daily_revenue(date(2025, 1, 1), date(2025, 1, 2)).tolist() == [0, 0]
+
+
+def test_new_orders_fold_in_memory_and_job_catches_up_idempotently():
+    db, (audio, books), _ = make_db()
+    add_order(db, 1, [(audio, 10.0, 1)])
+    backfill(db)
+    rollup = SalesRollup(db)
+    rollup.load()
+
+    add_order(db, 20, [(books, 7.0, 1)])
+    add_order(db, 1, [(audio, 10.0, 1)])
+    assert rollup.refresh() == 2
+    assert rollup.daily_revenue(date(2026, 3, 1), date(2026, 3, 1)).tolist() == [20]
+    assert rollup.daily_revenue(date(2026, 3, 20), date(2026, 3, 20)).tolist() == [7]
+    assert rollup.refresh() == 0
+
+    assert catch_up(db) == 2
+    assert catch_up(db) == 0
+    reloaded = SalesRollup(db)
+    reloaded.load()
+    assert reloaded.daily_revenue(date(2026, 3, 1), date(2026, 3, 20)).sum() == 27
+    assert db[ROLLUP_COLLECTION].count_documents({}) == 2
+
+
+def test_load_retries_when_the_job_commits_between_its_reads(monkeypatch):
+    db, (audio, books), _ = make_db()
+    add_order(db, 1, [(audio, 10.0, 1)])
+    backfill(db)
+    add_order(db, 2, [(books, 5.0, 2)])
+    monkeypatch.setattr(sales_rollup, "LOAD_RETRY_SECONDS", 0)
+
+    rollup = SalesRollup(db)
+    read_cells = rollup._read_cells
+    passes = []
+
+    def read_then_commit():
+        cells = read_cells()
+        if not passes:
+            passes.append(catch_up(db))  # cells from before, watermark from after
+        return cells
+
+    monkeypatch.setattr(rollup, "_read_cells", read_then_commit)
+    rollup.load()
+    assert passes == [1]
+    assert rollup.daily_revenue(date(2026, 3, 1), date(2026, 3, 2)).tolist() == [10, 10]
+    assert rollup.refresh() == 0
@@ -0,0 +1,103 @@
+import logging
+
+import pytest
+from flask import Flask
+
+import structured_logging
+from startup import StartupReport, install_startup, readiness_response
+
+
+@pytest.fixture
+def root_logging():
+    # start() replaces the root handlers; put the test runner's back afterwards.
+    root = logging.getLogger()
+    saved_handlers, saved_level = list(root.handlers), root.level
+    yield root
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in saved_handlers:
+        root.addHandler(handler)
+    root.setLevel(saved_level)
+
+
+def test_report_splits_import_and_warmup_phases():
+    report = StartupReport("svc")
+    report.mark("imports")
+    built = []
+    assert report.warm_up([("index", lambda: built.append("index")), ("cache", lambda: built.append("cache"))])
+
+    data = report.as_dict()
+    assert built == ["index", "cache"]
+    assert data["ready"] is True
+    assert [(p["name"], p["kind"]) for p in data["phases"]] == [
+        ("imports", "import"), ("index", "warmup"), ("cache", "warmup")]
+    assert data["importSeconds"] >= 0 and data["warmupSeconds"] >= 0
+
+
+def test_failed_step_keeps_service_unready_but_runs_the_rest():
+    report = StartupReport("svc")
+    ran = []
+
+    def broken():
+        raise RuntimeError("mongo down")
+
+    assert not report.warm_up([("index", broken), ("cache", lambda: ran.append("cache"))])
+    assert ran == ["cache"]
+    assert report.phases[0]["error"] == "mongo down"
+
+    with Flask(__name__).app_context():
+        response, status = readiness_response(report)
+    assert status == 503
+    assert response.get_json()["ready"] is False
+
+
+def test_readiness_turns_green_after_warmup():
+    report = StartupReport("svc")
+    with Flask(__name__).app_context():
+        assert readiness_response(report)[1] == 503
+        report.warm_up([])
+        assert readiness_response(report)[1] == 200
+
+
+def test_failed_steps_are_retried_until_ready():
+    report = StartupReport("svc")
+    calls = {"index": 0, "cache": 0}
+    refreshed = []
+
+    def flaky_index():
+        calls["index"] += 1
+        if calls["index"] < 3:
+            raise RuntimeError("mongo down")
+
+    def cache():
+        calls["cache"] += 1
+
+    report.start([("index", flaky_index), ("cache", cache)], on_ready=lambda: refreshed.append(True),
+                 retry_interval=0, wait=True)
+    assert report.ready and refreshed == [True]
+    # The step that succeeded the first time is not run again.
+    assert calls == {"index": 3, "cache": 1}
+
+
+def test_start_runs_once_per_process_in_the_background(root_logging):
+    report = StartupReport("svc")
+    app = Flask(__name__)
+    started = []
+    start = install_startup(app, report, [("index", lambda: started.append("index"))])
+
+    assert app.extensions["startup"] is start
+    thread = start()
+    thread.join(timeout=5)
+    assert start() is thread
+    assert started == ["index"] and report.ready
+
+
+def test_start_configures_json_logging_for_the_service(root_logging):
+    report = StartupReport("svc")
+    start = install_startup(Flask(__name__), report)
+
+    assert start(wait=True) is None
+    assert report.ready
+    [handler] = root_logging.handlers
+    assert isinstance(handler.formatter, structured_logging.JsonFormatter)
+    assert handler.formatter.service == "svc"
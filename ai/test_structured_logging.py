@@ -0,0 +1,54 @@
+import io
+import json
+import logging
+
+import pytest
+
+import structured_logging
+
+
+@pytest.fixture
+def log_stream():
+    root = logging.getLogger()
+    saved_handlers, saved_level = list(root.handlers), root.level
+    stream = io.StringIO()
+    structured_logging.configure_logging("svc", level="INFO", stream=stream)
+    yield stream
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in saved_handlers:
+        root.addHandler(handler)
+    root.setLevel(saved_level)
+
+
+def lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_records_are_json_with_fields_and_traceback(log_stream):
+    logger = logging.getLogger("test.json")
+    logger.info("Recommendations", extra={"fields": {"returned": 8}})
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("Failed")
+
+    info, error = lines(log_stream)
+    assert info["msg"] == "Recommendations" and info["returned"] == 8
+    assert info["service"] == "svc" and info["level"] == "INFO"
+    assert error["level"] == "ERROR" and "ValueError: boom" in error["exc"]
+
+
+def test_unsampled_requests_keep_only_warnings(log_stream):
+    logger = logging.getLogger("test.sampling")
+    token = structured_logging.start_request(rate=0.0)
+    logger.info("dropped")
+    logger.warning("kept")
+    structured_logging.finish_request(token)
+
+    token = structured_logging.start_request(rate=1.0)
+    logger.info("sampled request")
+    structured_logging.finish_request(token)
+
+    logger.info("outside a request")
+    assert [line["msg"] for line in lines(log_stream)] == ["kept", "sampled request", "outside a request"]
@@ -0,0 +1,40 @@
+import pytest
+
+from synthetic_data import SyntheticData, load, scale_counts
+
+mongomock = pytest.importorskip("mongomock")
+
+
+@pytest.fixture(scope="module")
+def db():
+    db = mongomock.MongoClient().db
+    load(db, SyntheticData(300, seed=7, batch_size=64))
+    return db
+
+
+def test_counts_follow_the_scale(db):
+    counts = scale_counts(300)
+    assert db.users.count_documents({}) == counts["users"]
+    assert db.products.count_documents({}) == counts["products"]
+    assert db.orders.count_documents({}) == 300
+
+
+def test_references_resolve(db):
+    user_ids = {u["_id"] for u in db.users.find({}, {"_id": 1})}
+    product_ids = {p["_id"] for p in db.products.find({}, {"_id": 1})}
+    for order in db.orders.find():
+        assert order["user"] in user_ids
+        assert {item["product"] for item in order["orderItems"]} <= product_ids
+        assert order["itemsPrice"] == pytest.approx(sum(i["price"] * i["qty"] for i in order["orderItems"]))
+    for product in db.products.find():
+        assert product["seller"] == product["user"] and product["seller"] in user_ids
+        assert product["numReviews"] == len(product["reviews"])
+        if product["reviews"]:
+            ratings = [review["rating"] for review in product["reviews"]]
+            assert product["rating"] == pytest.approx(sum(ratings) / len(ratings), abs=0.01)
+
+
+def test_same_seed_same_documents():
+    first, second = (list(SyntheticData(50, seed=3).orders())[0] for _ in range(2))
+    assert first == second
+    assert list(SyntheticData(50, seed=4).orders())[0] != first
@@ -0,0 +1,60 @@
+import pytest
+from bson import ObjectId
+from flask import Flask, request
+
+from response_encoding import install_json_provider, loads
+from user_listing import users_response
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def make_client(count=25):
+    users = mongomock.MongoClient().db.users
+    users.insert_many([
+        {"_id": ObjectId(), "username": f"user{i}", "email": f"u{i}@example.com",
+         "password": "hash", "isAdmin": i == 0, "viewed_products": [ObjectId()] * 3}
+        for i in range(count)
+    ])
+    app = Flask(__name__)
+    install_json_provider(app)
+
+    @app.route("/users")
+    def list_users():
+        return users_response(users, request.args, request.headers, ("username", "email"))
+
+    return app.test_client(), users
+
+
+def test_keyset_pages_cover_every_user_once_with_projection():
+    client, users = make_client()
+    seen = []
+    after = ""
+    while True:
+        response = client.get(f"/users?limit=10&after={after}")
+        assert response.status_code == 200
+        page = loads(response.get_data())
+        seen.extend(row["id"] for row in page)
+        assert all(set(row) == {"id", "username", "email"} for row in page)
+        after = response.headers.get("X-Next-Cursor")
+        if not after:
+            break
+    assert len(page) == 5
+    assert seen == [str(u["_id"]) for u in users.find({}, {"_id": 1}).sort("_id", 1)]
+
+
+def test_ndjson_stream_and_field_selection():
+    client, _ = make_client(count=7)
+    response = client.get("/users?format=ndjson&fields=username,isAdmin")
+    assert response.mimetype == "application/x-ndjson"
+    rows = [loads(line) for line in response.get_data().splitlines()]
+    assert len(rows) == 7
+    assert rows[0] == {"id": rows[0]["id"], "username": "user0", "isAdmin": True}
+
+    response = client.get("/users", headers={"Accept": "application/x-ndjson"}, query_string={"limit": 3})
+    assert len(response.get_data().splitlines()) == 3
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=abc", "limit=5000", "after=nope", "fields=password"])
+def test_invalid_arguments_are_rejected(query):
+    client, _ = make_client(count=1)
+    assert client.get(f"/users?{query}").status_code == 400
@@ -0,0 +1,122 @@
+"""
+Keyset-paginated and streaming user listings.
+
+The user endpoints used to load the whole collection - password hashes and
+embedded arrays included - into memory. Listings here only ever project the
+requested fields out of ``ALLOWED_FIELDS``, and page on ``_id``: a page is
+``_id > after`` sorted by ``_id``, so every page costs one indexed range scan
+no matter how deep the client has paged. The NDJSON mode writes one user per
+line straight from the cursor.
+
+Query parameters (parsed by ``parse_listing_args``):
+
+    limit   page size, 1..MAX_LIMIT (default DEFAULT_LIMIT; no cap when streaming)
+    after   id of the last user on the previous page (from X-Next-Cursor)
+    fields  comma-separated subset of ALLOWED_FIELDS
+    format  "ndjson" to stream (also chosen by Accept: application/x-ndjson)
+"""
+from collections import namedtuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import Response, jsonify, stream_with_context
+
+from response_encoding import dumps_bytes
+
+# Never includes password or the embedded arrays.
+ALLOWED_FIELDS = ("username", "name", "email", "isAdmin", "createdAt", "updatedAt")
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+ListingArgs = namedtuple("ListingArgs", ["limit", "after", "fields", "stream"])
+
+
+def parse_listing_args(args, headers, default_fields):
+    """Validate the query string; raises ValueError with a client-facing message."""
+    stream = args.get("format") == "ndjson" or NDJSON_MIMETYPE in headers.get("Accept", "")
+
+    limit = args.get("limit")
+    if limit is None:
+        limit = None if stream else DEFAULT_LIMIT
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if limit < 1 or (limit > MAX_LIMIT and not stream):
+            raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+
+    after = args.get("after")
+    if after:
+        try:
+            after = ObjectId(after)
+        except (InvalidId, TypeError):
+            raise ValueError("after must be a user id")
+
+    fields = default_fields
+    if args.get("fields"):
+        fields = tuple(f.strip() for f in args["fields"].split(",") if f.strip())
+        unknown = [f for f in fields if f not in ALLOWED_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(ALLOWED_FIELDS)}")
+
+    return ListingArgs(limit, after or None, fields, stream)
+
+
+def user_cursor(collection, after, fields, limit=None):
+    query = {"_id": {"$gt": after}} if after is not None else {}
+    cursor = collection.find(query, {field: 1 for field in fields}).sort("_id", 1)
+    if limit:
+        cursor = cursor.limit(limit)
+    return cursor
+
+
+def format_user(user, fields, missing=None):
+    row = {"id": str(user["_id"])}
+    for field in fields:
+        row[field] = user.get(field, missing)
+    return row
+
+
+def fetch_page(collection, listing, missing=None):
+    """One page of rows plus the cursor for the next page (None on the last page)."""
+    return split_page(list(user_cursor(collection, listing.after, listing.fields, listing.limit + 1)),
+                      listing, missing)
+
+
+def split_page(users, listing, missing=None):
+    """Rows and next cursor from up to ``limit + 1`` users read in ``_id`` order."""
+    next_cursor = str(users[listing.limit - 1]["_id"]) if len(users) > listing.limit else None
+    return [format_user(u, listing.fields, missing) for u in users[:listing.limit]], next_cursor
+
+
+def iter_ndjson(collection, listing, missing=None, batch_size=500):
+    """One encoded JSON line per user, read from the cursor in batches."""
+    cursor = user_cursor(collection, listing.after, listing.fields, listing.limit).batch_size(batch_size)
+    for user in cursor:
+        yield dumps_bytes(format_user(user, listing.fields, missing)) + b"\n"
+
+
+def users_response(collection, args, headers, default_fields, missing=None):
+    """Flask response for a listing request: a JSON page or an NDJSON stream.
+
+    Pages are a JSON array, as before, with the next page's cursor in the
+    ``X-Next-Cursor`` header.
+    """
+    try:
+        listing = parse_listing_args(args, headers, default_fields)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if listing.stream:
+        return Response(stream_with_context(iter_ndjson(collection, listing, missing)),
+                        mimetype=NDJSON_MIMETYPE)
+    rows, next_cursor = fetch_page(collection, listing, missing)
+    response = jsonify(rows)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+        # Let browser clients on other origins read the cursor.
+        response.headers["Access-Control-Expose-Headers"] = "X-Next-Cursor"
+    return response
@@ -60,7 +60,8 @@ router.get('/recommendations', async (req, res) => {
     console.log(`Calling Python backend at ${pythonBackendUrl}/get-personalized-recommendations`);
     const pythonResponse = await axios.post(`${pythonBackendUrl}/get-personalized-recommendations`, {
       userId: userId, // Pass user ID
-      orderHistory: orderItems // Pass processed order items
+      orderHistory: orderItems, // Pass processed order items
+      currency: req.body?.currency || req.query.currency // Client-selected currency, if any
     });
 
     const personalizedRecommendations = pythonResponse.data.recommendations; // Assuming Python returns { recommendations: [...] }
@@ -140,7 +141,8 @@ router.post('/get-personalized-recommendations', async (req, res) => {
     console.log(`Calling Python backend at ${pythonBackendUrl}/get-personalized-recommendations`);
     const pythonResponse = await axios.post(`${pythonBackendUrl}/get-personalized-recommendations`, {
       userId: userId, // Pass user ID
-      orderHistory: orderItems // Pass processed order items
+      orderHistory: orderItems, // Pass processed order items
+      currency: req.body?.currency || req.query.currency // Client-selected currency, if any
     });
 
     const personalizedRecommendations = pythonResponse.data.recommendations; // Assuming Python returns { recommendations: [...] }
@@ -126,9 +126,17 @@ const AdminDashboard = () => {
   const fetchUsers = async () => {
     setUsersLoading(true);
     try {
-      const response = await axios.get('http://localhost:5004/api/users');
-      console.log('Fetched users:', response.data); // Debug log
-      setUsers(response.data);
+      // The users endpoint is paged; follow X-Next-Cursor to the last page.
+      const allUsers = [];
+      let after;
+      do {
+        const response = await axios.get('http://localhost:5004/api/users', {
+          params: { limit: 1000, after },
+        });
+        allUsers.push(...response.data);
+        after = response.headers['x-next-cursor'];
+      } while (after);
+      setUsers(allUsers);
     } catch (error) {
       console.error('Error fetching users:', error);
     } finally {
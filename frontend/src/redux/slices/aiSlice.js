@@ -4,17 +4,18 @@ import axios from 'axios';
 // Async thunks
 export const fetchRecommendations = createAsyncThunk(
   'ai/fetchRecommendations',
-  async ({ userId, orderHistory }, { rejectWithValue }) => {
+  async ({ userId, orderHistory, currency }, { rejectWithValue }) => {
     try {
       // Now making a POST request to the personalized recommendations endpoint
       const response = await axios.post('/api/get-personalized-recommendations', {
           userId,
-          orderHistory
+          orderHistory,
+          currency // Optional; the AI service prices in PKR when omitted
       });
-      // Assuming the backend now returns prices in PKR
+      // Prices come back converted; the service reports the currency it used
       return response.data.recommendations.map(product => ({
          ...product,
-         currency: 'PKR' // Indicate currency is PKR
+         currency: product.currency || 'PKR'
       }));
     } catch (error) {
       return rejectWithValue(error.response.data);